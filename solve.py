@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 import argparse
+import sys
 
-import solver
+# The modules of the solver package are imported by the commands that need them, so the start-up
+# only pays for those, and showing the about text does not import the solver at all
 
 
 def show_about():
@@ -17,35 +19,418 @@ License: MIT License
 """)
 
 
+def add_solver_arguments(parser):
+    from solver.combinations import CAGE_PRUNING_COMBINATIONS, CAGE_PRUNINGS
+    from solver.solver import ENGINES, ORDERING_ROWMAJOR, ORDERINGS
+
+    parser.add_argument("--engine",
+                        choices=ENGINES,
+                        help=("The solving engine to use, bitmask keeps masks of used values "
+                              "rather than scanning the board for each cell, iterative does the "
+                              "same using an explicit stack rather than recursion, propagate "
+                              "propagates the constraints after each value placed, and dlx "
+                              "solves the puzzle as an exact cover problem. The default is "
+                              "classic, or bitmask with the MRV ordering"))
+    parser.add_argument("--cage-pruning",
+                        choices=CAGE_PRUNINGS,
+                        default=CAGE_PRUNING_COMBINATIONS,
+                        help=("How to limit the values of a cell by its cage, either by the "
+                              "min/max bounds of the cage, or by the combinations adding up to its "
+                              "total"))
+    parser.add_argument("--ordering",
+                        choices=ORDERINGS,
+                        default=ORDERING_ROWMAJOR,
+                        help=("The order to fill out the cells in, either row by row, or the cell "
+                              "with the fewest candidates first (not supported by the classic "
+                              "engine)"))
+
+
+def add_timeout_argument(parser):
+    parser.add_argument("--timeout",
+                        type=float,
+                        metavar="SECONDS",
+                        help=("Stop searching a puzzle after this many seconds, and report it as "
+                              "not solved"))
+
+
+def check_solver_arguments(parser, parsed_args):
+    from solver.solver import ENGINE_BITMASK, ENGINE_CLASSIC, ORDERING_MRV
+
+    # The classic engine does not support the MRV ordering, so asking for MRV alone picks the
+    # bitmask engine rather than failing
+    if parsed_args.engine is None:
+        if parsed_args.ordering == ORDERING_MRV:
+            parsed_args.engine = ENGINE_BITMASK
+        else:
+            parsed_args.engine = ENGINE_CLASSIC
+    elif parsed_args.engine == ENGINE_CLASSIC and parsed_args.ordering == ORDERING_MRV:
+        parser.error("the MRV ordering is not supported by the classic engine")
+
+
+def add_cache_arguments(parser):
+    parser.add_argument("--cache",
+                        action="store_true",
+                        help=("Cache the solutions in memory, so puzzles seen before, also when "
+                              "rotated, reflected, with bands or stacks swapped or with the values "
+                              "complemented, are not solved again"))
+    parser.add_argument("--cache-file",
+                        metavar="FILE",
+                        help="Store the cached solutions in this SQLite database, implies --cache")
+    parser.add_argument("--cache-size",
+                        type=int,
+                        default=1024,
+                        help="The number of cached solutions to keep in memory")
+
+
+def create_cache(parsed_args):
+    if not parsed_args.cache and parsed_args.cache_file is None:
+        return None
+    from solver.cache import SolutionCache
+    return SolutionCache(parsed_args.cache_size, parsed_args.cache_file)
+
+
+def bench_main(args):
+    from solver import bench
+
+    parser = argparse.ArgumentParser(prog="solve.py bench",
+                                     description=("Benchmark the solver against a corpus of "
+                                                  "puzzles, grouped by difficulty"))
+    add_solver_arguments(parser)
+    parser.add_argument("--warmup",
+                        type=int,
+                        default=1,
+                        help="The number of untimed runs of each puzzle before the timed runs")
+    parser.add_argument("--repeats",
+                        type=int,
+                        default=5,
+                        help="The number of timed runs of each puzzle")
+    parser.add_argument("--output",
+                        help="Write the results to this file as JSON")
+    parser.add_argument("--baseline",
+                        help=("Compare against the results of an earlier run, as written by "
+                              "--output, and exit with a non-zero status on a regression"))
+    parser.add_argument("--threshold",
+                        type=float,
+                        default=0.1,
+                        help="The fraction a puzzle may get slower by before it is a regression")
+    parser.add_argument("--metric",
+                        choices=bench.BENCH_METRICS,
+                        default=bench.BENCH_METRIC_MEDIAN,
+                        help="The timing to compare against the baseline")
+    parser.add_argument("--scaling",
+                        action="store_true",
+                        help=("Benchmark a generated puzzle of each board size of --sizes rather "
+                              "than a corpus"))
+    parser.add_argument("--sizes",
+                        type=int,
+                        nargs="+",
+                        default=[4, 6, 9, 12, 16],
+                        help="The board sizes to benchmark with --scaling")
+    parser.add_argument("--seed",
+                        type=int,
+                        default=0,
+                        help="The seed of the puzzles generated with --scaling")
+    parser.add_argument("--latency",
+                        metavar="FILE",
+                        help=("Compare the time to solve this puzzle file with a new process for "
+                              "each request, and with a running 'solve.py serve'"))
+    parser.add_argument("--requests",
+                        type=int,
+                        default=20,
+                        help="The number of requests to time with --latency")
+    parser.add_argument("--batch",
+                        metavar="FILE",
+                        help=("Compare solving the puzzles of this JSON, JSONL or binary file one "
+                              "by one, and all at once with the batch solver"))
+    parser.add_argument("--memory",
+                        metavar="FILE",
+                        help="Measure the memory allocated by solving this puzzle file")
+    parser.add_argument("corpus",
+                        nargs="?",
+                        help=("The corpus directory, each subdirectory holds the puzzles of one "
+                              "difficulty"))
+    parsed_args = parser.parse_args(args)
+    check_solver_arguments(parser, parsed_args)
+
+    if parsed_args.latency is not None:
+        return bench.run_latency_benchmark(filename=parsed_args.latency,
+                                           requests=parsed_args.requests,
+                                           engine=parsed_args.engine,
+                                           cage_pruning=parsed_args.cage_pruning,
+                                           ordering=parsed_args.ordering)
+    if parsed_args.memory is not None:
+        return bench.run_memory_benchmark(filename=parsed_args.memory,
+                                          engine=parsed_args.engine,
+                                          cage_pruning=parsed_args.cage_pruning,
+                                          ordering=parsed_args.ordering)
+    if parsed_args.batch is not None:
+        return bench.run_batch_benchmark(filename=parsed_args.batch,
+                                         engine=parsed_args.engine,
+                                         cage_pruning=parsed_args.cage_pruning,
+                                         ordering=parsed_args.ordering,
+                                         repeats=parsed_args.repeats)
+    if parsed_args.scaling:
+        return bench.run_scaling_benchmark(sizes=parsed_args.sizes,
+                                           engine=parsed_args.engine,
+                                           cage_pruning=parsed_args.cage_pruning,
+                                           ordering=parsed_args.ordering,
+                                           warmup=parsed_args.warmup,
+                                           repeats=parsed_args.repeats,
+                                           seed=parsed_args.seed,
+                                           output=parsed_args.output)
+    if parsed_args.corpus is None:
+        parser.error("the corpus is required unless --scaling, --latency, --batch or --memory is "
+                     "given")
+    return bench.run_benchmark(corpus=parsed_args.corpus,
+                               engine=parsed_args.engine,
+                               cage_pruning=parsed_args.cage_pruning,
+                               ordering=parsed_args.ordering,
+                               warmup=parsed_args.warmup,
+                               repeats=parsed_args.repeats,
+                               output=parsed_args.output,
+                               baseline=parsed_args.baseline,
+                               threshold=parsed_args.threshold,
+                               metric=parsed_args.metric)
+
+
+def stream_main(args):
+    from solver import stream
+
+    parser = argparse.ArgumentParser(prog="solve.py stream",
+                                     description=("Solve puzzles read one per line as JSON, and "
+                                                  "write one result per line as JSON to stdout"))
+    add_solver_arguments(parser)
+    add_timeout_argument(parser)
+    add_cache_arguments(parser)
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=1,
+                        help="The number of worker processes to spread the puzzles across")
+    parser.add_argument("input",
+                        nargs="?",
+                        default="-",
+                        help="The JSONL-file to read the puzzles from, or - to read from stdin")
+    parsed_args = parser.parse_args(args)
+    check_solver_arguments(parser, parsed_args)
+
+    if parsed_args.input == "-":
+        input_file = sys.stdin
+    else:
+        input_file = open(parsed_args.input)
+    with input_file:
+        results = stream.solve_stream(input_file,
+                                      jobs=parsed_args.jobs,
+                                      engine=parsed_args.engine,
+                                      cage_pruning=parsed_args.cage_pruning,
+                                      ordering=parsed_args.ordering,
+                                      cache=create_cache(parsed_args),
+                                      timeout=parsed_args.timeout)
+        failed = stream.write_results(results, sys.stdout)
+    return 1 if failed else 0
+
+
+def serve_main(args):
+    from solver import server
+
+    parser = argparse.ArgumentParser(prog="solve.py serve",
+                                     description=("Keep solving puzzles sent one per line as JSON, "
+                                                  "answering each with one line of JSON, so the "
+                                                  "start-up is only paid once"))
+    add_solver_arguments(parser)
+    add_timeout_argument(parser)
+    add_cache_arguments(parser)
+    parser.add_argument("--socket",
+                        metavar="PATH",
+                        help=("Listen on a Unix socket at this path rather than reading from stdin "
+                              "and writing to stdout"))
+    parsed_args = parser.parse_args(args)
+    check_solver_arguments(parser, parsed_args)
+
+    return server.serve(socket_path=parsed_args.socket,
+                        engine=parsed_args.engine,
+                        cage_pruning=parsed_args.cage_pruning,
+                        ordering=parsed_args.ordering,
+                        cache=create_cache(parsed_args),
+                        timeout=parsed_args.timeout)
+
+
+def pack_main(args):
+    parser = argparse.ArgumentParser(prog="solve.py pack",
+                                     description=("Check puzzles and pack them into a single file "
+                                                  "of the compact binary format"))
+    parser.add_argument("output",
+                        help="The file to write the packed puzzles to")
+    parser.add_argument("input",
+                        nargs="+",
+                        help="The JSON, JSONL or binary files to read the puzzles from")
+    parsed_args = parser.parse_args(args)
+
+    from solver import runner
+    return runner.run_packer(parsed_args.output, parsed_args.input)
+
+
+def generate_main(args):
+    from solver import generator, runner
+
+    parser = argparse.ArgumentParser(prog="solve.py generate",
+                                     description=("Generate puzzles with a unique solution, graded "
+                                                  "by difficulty, and write them one per line as "
+                                                  "JSON"))
+    parser.add_argument("--count",
+                        type=int,
+                        default=1,
+                        help="The number of puzzles to generate")
+    parser.add_argument("--size",
+                        type=int,
+                        default=9,
+                        help="The size of the boards")
+    parser.add_argument("--seed",
+                        type=int,
+                        default=0,
+                        help="The seed of the first puzzle, each following puzzle uses the next")
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=1,
+                        help="The number of worker processes to generate the puzzles with")
+    parser.add_argument("--cage-weights",
+                        type=int,
+                        nargs="+",
+                        metavar="WEIGHT",
+                        help=("The relative weight of cages of 1, 2, 3 and so on cells, the "
+                              "default is " +
+                              " ".join(map(str, generator.DEFAULT_CAGE_WEIGHTS.values()))))
+    parser.add_argument("--merge-attempts",
+                        type=int,
+                        default=generator.DEFAULT_MERGE_ATTEMPTS,
+                        help=("The number of merges of neighbouring cages to try once the solution "
+                              "is unique, more merges make harder puzzles"))
+    parser.add_argument("--output",
+                        help="Write the puzzles to this JSONL-file rather than to stdout")
+    parsed_args = parser.parse_args(args)
+
+    cage_weights = None
+    if parsed_args.cage_weights is not None:
+        cage_weights = {cage_size: weight
+                        for cage_size, weight in enumerate(parsed_args.cage_weights, 1) if weight}
+        if not cage_weights:
+            parser.error("at least one cage weight must be above 0")
+    return runner.run_generator(count=parsed_args.count,
+                                output=parsed_args.output,
+                                size=parsed_args.size,
+                                seed=parsed_args.seed,
+                                jobs=parsed_args.jobs,
+                                cage_weights=cage_weights,
+                                merge_attempts=parsed_args.merge_attempts)
+
+
 def main():
-    parser = argparse.ArgumentParser(description="Solve a Killer Sudoku from file")
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        return bench_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "stream":
+        return stream_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "pack":
+        return pack_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        return serve_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "generate":
+        return generate_main(sys.argv[2:])
+
+    # The about text is shown before the rest of the arguments are parsed, which needs the solver
+    about_parser = argparse.ArgumentParser(add_help=False)
+    about_parser.add_argument("--about", action="store_true")
+    if about_parser.parse_known_args()[0].about:
+        return show_about()
+
+    parser = argparse.ArgumentParser(description="Solve a Killer Sudoku from file",
+                                     epilog=("Use 'solve.py bench --help' to benchmark a "
+                                             "corpus, 'solve.py stream --help' to solve "
+                                             "puzzles from JSONL, 'solve.py serve --help' to keep "
+                                             "a process solving puzzles, 'solve.py pack --help' "
+                                             "to pack puzzles into the binary format, and "
+                                             "'solve.py generate --help' to generate puzzles"))
     parser.add_argument("--stats",
                         action="store_true",
                         help=("If set the solver will output information on how many combinations "
                               "were attempted"))
+    parser.add_argument("--stats-json",
+                        metavar="FILE",
+                        help="Write the stats of solving each puzzle to this file as JSON")
     parser.add_argument("--show-initial-board",
                         action="store_true",
                         help="Show the board and regions before trying to solve it.")
+    parser.add_argument("--count",
+                        action="store_true",
+                        help="Count the solutions of each puzzle rather than showing a solution")
+    parser.add_argument("--limit",
+                        type=int,
+                        help="The number of solutions to stop counting at, used with --count")
+    parser.add_argument("--unique",
+                        action="store_true",
+                        help=("Check whether each puzzle has a unique solution, and exit with a "
+                              "non-zero status if not"))
     parser.add_argument("--benchmark",
                         action="store_true",
                         help=("Benchmark against the specified files, by attempting to solve the "
                               "puzzles and show the time taken to do so"))
+    add_solver_arguments(parser)
+    add_timeout_argument(parser)
+    parser.add_argument("--progress",
+                        action="store_true",
+                        help=("Show the nodes searched, nodes per second and current depth on "
+                              "stderr while searching, not supported with more than one job"))
+    add_cache_arguments(parser)
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=1,
+                        help=("The number of worker processes to spread the files across, the "
+                              "results are still shown in the order of the files"))
+    parser.add_argument("--search-jobs",
+                        type=int,
+                        default=1,
+                        help=("The number of worker processes to search each puzzle with, by "
+                              "splitting the top of the search tree into subproblems"))
+    parser.add_argument("--split-depth",
+                        type=int,
+                        default=2,
+                        help="The number of levels of the search tree to split into subproblems")
     parser.add_argument("--about",
                         action="store_true",
                         help="Show text describing this script, and exits")
     parser.add_argument("filename",
-                        nargs='+',
+                        nargs='*',
                         help="The name of the JSON-file to load board and regions from")
     parsed_args = parser.parse_args()
+    check_solver_arguments(parser, parsed_args)
 
-    if parsed_args.about:
-        return show_about()
+    if not parsed_args.filename:
+        parser.error("the following arguments are required: filename")
+
+    from solver import runner
+
+    if parsed_args.count or parsed_args.unique:
+        return runner.run_counter(filenames=parsed_args.filename,
+                                  limit=parsed_args.limit,
+                                  unique=parsed_args.unique,
+                                  show_stats=parsed_args.stats,
+                                  engine=parsed_args.engine,
+                                  cage_pruning=parsed_args.cage_pruning,
+                                  ordering=parsed_args.ordering)
 
-    solver.run_solver(filenames=parsed_args.filename,
-                      show_stats=parsed_args.stats,
-                      benchmark=parsed_args.benchmark,
-                      show_initial_board=parsed_args.show_initial_board)
+    return runner.run_solver(filenames=parsed_args.filename,
+                             show_stats=parsed_args.stats,
+                             stats_json=parsed_args.stats_json,
+                             benchmark=parsed_args.benchmark,
+                             show_initial_board=parsed_args.show_initial_board,
+                             engine=parsed_args.engine,
+                             cage_pruning=parsed_args.cage_pruning,
+                             ordering=parsed_args.ordering,
+                             jobs=parsed_args.jobs,
+                             search_jobs=parsed_args.search_jobs,
+                             split_depth=parsed_args.split_depth,
+                             cache=create_cache(parsed_args),
+                             timeout=parsed_args.timeout,
+                             show_progress=parsed_args.progress)
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -1 +1,34 @@
+import importlib
+
+from .geometry import *
+from .combinations import *
+from .propagate import *
+from .puzzle import *
+from .cache import *
+from .loader import *
+from .stats import *
+from .dlx import *
+from .sat import *
 from .solver import *
+
+# The modules only needed by some of the commands, such as the process pools, the server and the
+# benchmarks, are imported the first time one of their names is used, so importing the package to
+# solve a puzzle does not pay for them
+_LAZY_MODULES = ("parallel", "stream", "server", "session", "generator", "batch", "runner", "bench")
+
+
+def __getattr__(name: str) -> object:
+    """ Find a name of the modules imported on first use, importing them until it is found.
+
+    :param name: The name to find
+    :return: Returns the value of the name, or the module if the name is one of the modules
+    """
+    if name in _LAZY_MODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    if not name.startswith("_"):
+        for module_name in _LAZY_MODULES:
+            module = importlib.import_module(f"{__name__}.{module_name}")
+            if hasattr(module, name):
+                value = globals()[name] = getattr(module, name)
+                return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,251 @@
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from .combinations import CAGE_PRUNING_COMBINATIONS, CAGE_PRUNINGS
+from .geometry import Geometry
+from .puzzle import PuzzleIndex
+from .solver import ENGINE_CLASSIC, ENGINES, ORDERING_MRV, ORDERING_ROWMAJOR, ORDERINGS, \
+    search_candidates, solve
+from .stats import SolveStats
+from .types import Board, Cages
+
+if TYPE_CHECKING:
+    import numpy
+
+
+def numpy_available() -> bool:
+    """ Find whether NumPy is installed, which `propagate_batch` needs.
+
+    :return: Returns True if NumPy can be imported
+    """
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def _popcounts(size: int) -> "numpy.ndarray":
+    """ Find the number of values in each bitmask of values of a board of the size. """
+    import numpy as np
+    return np.array([mask.bit_count() for mask in range(1 << size)], dtype=np.int8)
+
+
+@lru_cache(maxsize=256)
+def _group_arrays(index: PuzzleIndex) -> tuple["numpy.ndarray", "numpy.ndarray", "numpy.ndarray"]:
+    """ Find the cells of the houses and groups of a cage layout, and the combinations of the
+    groups.
+
+    The houses come first, followed by the groups of the propagation layout, each padded to the
+    size of the board with the cell -1.
+
+    :return: Returns the cells of each house and group, the combinations of the groups, and the
+             house or group of each combination
+    """
+    import numpy as np
+    size = index.geometry.size
+    groups = index.layout.groups
+    house_count = len(index.geometry.houses)
+    cells = np.full((house_count + len(groups), size), -1, dtype=np.int32)
+    cells[:house_count] = index.geometry.houses
+    combinations = []
+    combination_groups = []
+    for group_index, (_, group_cells, group_combinations) in enumerate(groups, house_count):
+        cells[group_index, :len(group_cells)] = group_cells
+        combinations += group_combinations
+        combination_groups += [group_index] * len(group_combinations)
+    return (cells, np.array(combinations, dtype=np.int32),
+            np.array(combination_groups, dtype=np.int32))
+
+
+def propagate_batch(puzzles: list[tuple[Board, Cages]]) -> list[list[int] | None]:
+    """ Propagate the constraints of a batch of puzzles of the same size at once, using NumPy.
+
+    The candidates of every puzzle are held in a single array, and each rule of `propagate` is
+    applied to the whole batch by a few array operations: the values of single candidate cells are
+    removed from the other cells of their houses and groups, values that are not part of any
+    combination completing a group are removed, and values that only one cell of a house or group
+    can hold, but must be held by one, are placed. The rules are applied until none of them removes
+    a candidate, while `propagate` stops once restricting the groups places no value, so the
+    candidates left are the ones of `propagate`, or fewer. Only candidates that can not be part of
+    a solution are removed either way.
+
+    NumPy is an optional dependency, and an ImportError is raised if it is not installed.
+
+    :param puzzles: The board and cages of each puzzle, every board of the same size
+    :return: Returns the candidates of each puzzle, as a list of bitmasks in row-major order, or
+             None for a puzzle where a contradiction was found
+    """
+    # Imported here, since NumPy is optional and only used for batches
+    import numpy as np
+    if not puzzles:
+        return []
+    size = len(puzzles[0][0])
+    if any(len(board) != size for board, _ in puzzles):
+        raise ValueError("Every board of a batch must have the same size")
+    geometry = Geometry.for_size(size)
+    cell_count = geometry.cell_count
+    all_values = geometry.all_values
+    popcounts = _popcounts(size)
+
+    # Number the cells of the whole batch, puzzle p holding the cells p * cell_count and on, and
+    # the houses and groups likewise, keeping cell -1 as the padding, which always holds 0
+    board_values = np.array([[value for row in board for value in row] for board, _ in puzzles],
+                            dtype=np.int32).ravel()
+    candidates = np.where(board_values > 0, 1 << np.maximum(board_values - 1, 0), all_values)
+    candidates = np.append(candidates, 0).astype(np.int32)
+    cells = []
+    combinations = []
+    combination_groups = []
+    group_puzzles = []
+    group_offset = 0
+    for puzzle_index, (_, cages) in enumerate(puzzles):
+        puzzle_cells, puzzle_combinations, puzzle_combination_groups = \
+            _group_arrays(PuzzleIndex.for_cages(cages, size))
+        cells.append(np.where(puzzle_cells >= 0, puzzle_cells + puzzle_index * cell_count, -1))
+        combinations.append(puzzle_combinations)
+        combination_groups.append(puzzle_combination_groups + group_offset)
+        group_puzzles.append(np.full(len(puzzle_cells), puzzle_index, dtype=np.int32))
+        group_offset += len(puzzle_cells)
+    cells = np.concatenate(cells)
+    combinations = np.concatenate(combinations)
+    combination_groups = np.concatenate(combination_groups)
+    group_puzzles = np.concatenate(group_puzzles)
+    group_count = len(cells)
+    puzzle_count = len(puzzles)
+
+    # The houses and groups of each cell, padded with an extra group that neither holds nor allows
+    # any values, so the rules can gather from the groups of each cell rather than scatter to them
+    members = cells.ravel()
+    member_groups = np.repeat(np.arange(group_count, dtype=np.int32), size)[members >= 0]
+    members = members[members >= 0]
+    order = np.argsort(members, kind="stable")
+    members = members[order]
+    member_groups = member_groups[order]
+    group_counts = np.bincount(members, minlength=puzzle_count * cell_count)
+    starts = np.cumsum(group_counts) - group_counts
+    cell_groups = np.full((group_counts.max(), puzzle_count * cell_count + 1), group_count,
+                          dtype=np.int32)
+    cell_groups[np.arange(len(members)) - starts[members], members] = member_groups
+
+    # The cells of each house, group and combination by their position in it, so each position is
+    # a contiguous row
+    cells = np.ascontiguousarray(cells.T)
+    combination_cells = np.ascontiguousarray(cells[:, combination_groups])
+    combination_padding = combination_cells < 0
+    combined = np.zeros(group_count, dtype=bool)
+    combined[combination_groups] = True
+    failed = np.zeros(puzzle_count, dtype=bool)
+
+    def gather_or(group_values: "numpy.ndarray") -> "numpy.ndarray":
+        group_values = np.append(group_values, 0)
+        result = group_values[cell_groups[0]]
+        for groups in cell_groups[1:]:
+            result |= group_values[groups]
+        return result
+
+    while True:
+        previous = candidates.copy()
+
+        # Remove the value of single candidate cells from the rest of their houses and groups, a
+        # value held by two of them is a contradiction
+        singles = np.where(popcounts[candidates] == 1, candidates, 0)
+        fixed = np.zeros(group_count, dtype=np.int32)
+        single_counts = np.zeros(group_count, dtype=np.int32)
+        for position in cells:
+            fixed |= singles[position]
+            single_counts += singles[position] != 0
+        failed[group_puzzles[popcounts[fixed] < single_counts]] = True
+        candidates &= ~(gather_or(fixed) & ~singles)
+
+        # Remove the values that are not part of a combination completing their group, the values
+        # of every such combination are required, as every value is in a house
+        completing = np.ones(len(combinations), dtype=bool)
+        union = np.zeros(len(combinations), dtype=np.int32)
+        for position, padding in zip(combination_cells, combination_padding):
+            masks = candidates[position] & combinations
+            completing &= (masks != 0) | padding
+            union |= masks
+        completing &= union == combinations
+        allowed = np.where(combined, 0, all_values).astype(np.int32)
+        np.bitwise_or.at(allowed, combination_groups[completing], combinations[completing])
+        required = np.full(group_count, all_values, dtype=np.int32)
+        np.bitwise_and.at(required, combination_groups[completing], combinations[completing])
+        disallowed = gather_or(all_values & ~allowed)
+        candidates &= ~disallowed
+
+        # Place the required values that only one cell of a house or group can hold, a required
+        # value that no cell can hold, or a cell that must hold two values, is a contradiction
+        seen_once = np.zeros(group_count, dtype=np.int32)
+        seen_more = np.zeros(group_count, dtype=np.int32)
+        for position in cells:
+            masks = candidates[position]
+            seen_more |= seen_once & masks
+            seen_once |= masks
+        failed[group_puzzles[(required & ~seen_once) != 0]] = True
+        forced = candidates & gather_or(required & ~seen_more)
+        failed[np.nonzero(popcounts[forced[:-1]] > 1)[0] // cell_count] = True
+        candidates = np.where(forced != 0, forced, candidates)
+
+        failed[np.nonzero(candidates[:-1] == 0)[0] // cell_count] = True
+        if np.array_equal(candidates, previous):
+            break
+
+    rows = candidates[:-1].reshape(len(puzzles), cell_count).tolist()
+    return [None if failed[puzzle_index] else row for puzzle_index, row in enumerate(rows)]
+
+
+def solve_batch(puzzles: list[tuple[Board, Cages]], engine: str = ENGINE_CLASSIC,
+                cage_pruning: str = CAGE_PRUNING_COMBINATIONS, ordering: str = ORDERING_ROWMAJOR,
+                stats: SolveStats | None = None) -> list[bool]:
+    """ Solve a batch of puzzles, propagating the constraints of every puzzle at once.
+
+    The puzzles are grouped by the size of the board, and the constraints of each group are
+    propagated together by `propagate_batch`. Only the puzzles that are not solved by that are then
+    searched one by one, by the engine, as by `solve`. Without NumPy, each puzzle is solved by
+    `solve` instead. Like `solve` each board is updated to its solution.
+
+    If stats are given, the time spent propagating the batch is added to them, along with the
+    stats of searching each puzzle.
+
+    :param puzzles: The board and cages of each puzzle
+    :param engine: The engine to search with, see `solve`
+    :param cage_pruning: Either `CAGE_PRUNING_MINMAX` or `CAGE_PRUNING_COMBINATIONS`
+    :param ordering: Either `ORDERING_ROWMAJOR` or `ORDERING_MRV`
+    :param stats: The stats to collect, if any
+    :return: Returns whether each puzzle was solved
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    if cage_pruning not in CAGE_PRUNINGS:
+        raise ValueError(f"Unknown cage pruning: {cage_pruning}")
+    if ordering not in ORDERINGS:
+        raise ValueError(f"Unknown ordering: {ordering}")
+    if ordering == ORDERING_MRV and engine == ENGINE_CLASSIC:
+        raise ValueError("The MRV ordering is not supported by the classic engine")
+    if not numpy_available():
+        return [solve(board, cages, engine, cage_pruning, ordering, stats)
+                for board, cages in puzzles]
+
+    sizes = {}
+    for puzzle_index, (board, _) in enumerate(puzzles):
+        sizes.setdefault(len(board), []).append(puzzle_index)
+    solved = [False] * len(puzzles)
+    for size, puzzle_indices in sizes.items():
+        start = time.perf_counter() if stats is not None else 0.0
+        propagated = propagate_batch([puzzles[puzzle_index] for puzzle_index in puzzle_indices])
+        if stats is not None:
+            stats.propagation_time += time.perf_counter() - start
+            start = time.perf_counter()
+        for puzzle_index, candidates in zip(puzzle_indices, propagated):
+            if candidates is not None:
+                board, cages = puzzles[puzzle_index]
+                solved[puzzle_index] = search_candidates(board, cages,
+                                                         PuzzleIndex.for_cages(cages, size),
+                                                         candidates, engine, cage_pruning,
+                                                         ordering, stats)
+        if stats is not None:
+            stats.search_time += time.perf_counter() - start
+    return solved
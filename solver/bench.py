@@ -0,0 +1,458 @@
+import json
+import math
+import os
+import sys
+import time
+from typing import NamedTuple
+
+from .combinations import CAGE_PRUNING_COMBINATIONS
+from .batch import numpy_available, solve_batch
+from .generator import partition_cages, random_solution
+from .solver import ENGINE_CLASSIC, ORDERING_ROWMAJOR, load_from_file, load_puzzles, solve
+from .stats import SolveStats
+from .types import Board, Cages
+
+# The timing compared against the baseline, when looking for regressions
+BENCH_METRIC_MIN = "min"
+BENCH_METRIC_MEDIAN = "median"
+BENCH_METRIC_P95 = "p95"
+BENCH_METRICS = (BENCH_METRIC_MIN, BENCH_METRIC_MEDIAN, BENCH_METRIC_P95)
+
+# The command-line script started by the latency benchmark, see `measure_latency`
+SOLVE_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "solve.py")
+
+
+class BenchResult(NamedTuple):
+    """ The timings of solving a single puzzle of the corpus a number of times. """
+    filename: str
+    difficulty: str
+    success: bool
+    nodes: int
+    times: list[float]
+    min: float
+    median: float
+    p95: float
+    nodes_per_sec: float
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """ Find the percentile of a list of values, using the nearest rank.
+
+    :param values: The values to find the percentile of, there must be at least one
+    :param pct: The percentile to find, between 0 and 100
+    :return: Returns the smallest value that at least pct percent of the values are less than or
+             equal to
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _median(values: list[float]) -> float:
+    """ Find the median of a list of values, importing statistics on first use rather than up
+    front, since it is only needed by the benchmarks. """
+    import statistics
+    return statistics.median(values)
+
+
+def find_corpus(directory: str) -> dict[str, list[str]]:
+    """ Find the puzzle files of a corpus directory, grouped by difficulty.
+
+    Each subdirectory of the corpus is a difficulty, holding the JSON puzzle files of that
+    difficulty. Puzzle files placed directly in the corpus directory are grouped by the part of the
+    name before the first dash, so expert-1.json is an expert puzzle.
+
+    :param directory: The corpus directory
+    :return: Returns the sorted file names of each difficulty, with the difficulties sorted by name
+    """
+    corpus = {}
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if entry.is_dir():
+            filenames = sorted(os.path.join(entry.path, name) for name in os.listdir(entry.path)
+                               if name.endswith(".json"))
+            if filenames:
+                corpus.setdefault(entry.name, []).extend(filenames)
+        elif entry.name.endswith(".json"):
+            difficulty = entry.name[:-len(".json")].split("-")[0]
+            corpus.setdefault(difficulty, []).append(entry.path)
+    return dict(sorted(corpus.items()))
+
+
+def benchmark_puzzle(filename: str, difficulty: str = "", engine: str = ENGINE_CLASSIC,
+                     cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                     ordering: str = ORDERING_ROWMAJOR, warmup: int = 1,
+                     repeats: int = 5) -> BenchResult:
+    """ Solve a puzzle a number of times, and find the timings of the runs.
+
+    The puzzle is loaded once, and every run solves a fresh copy of the board, since `solve`
+    changes the board it is given. The warm-up runs are not timed, and lets the tables and indexes
+    built on first use be built before the timed runs. The nodes are counted by an extra run
+    collecting the stats, so the timed runs do not pay for the collection.
+
+    :param filename: The puzzle file to solve
+    :param difficulty: The difficulty of the puzzle, only used to label the result
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param warmup: The number of runs before the timed runs
+    :param repeats: The number of timed runs, at least 1
+    :return: Returns the timings of the timed runs
+    """
+    board, cages = load_from_file(filename)
+    return _time_solves(filename, difficulty, board, cages, engine, cage_pruning, ordering, warmup,
+                        repeats)
+
+
+def _time_solves(filename: str, difficulty: str, board: Board, cages: Cages, engine: str,
+                 cage_pruning: str, ordering: str, warmup: int, repeats: int) -> BenchResult:
+    """ Solve a puzzle a number of times, see `benchmark_puzzle`. """
+    if repeats < 1:
+        raise ValueError("At least one timed run is needed")
+    for _ in range(warmup):
+        solve([row[:] for row in board], cages, engine, cage_pruning, ordering)
+
+    times = []
+    success = True
+    for _ in range(repeats):
+        run_board = [row[:] for row in board]
+        start = time.perf_counter()
+        success = solve(run_board, cages, engine, cage_pruning, ordering) and success
+        times.append(time.perf_counter() - start)
+    stats = SolveStats()
+    solve([row[:] for row in board], cages, engine, cage_pruning, ordering, stats)
+    nodes = stats.nodes
+
+    median = _median(times)
+    return BenchResult(filename, difficulty, success, nodes, times, min(times), median,
+                       percentile(times, 95), nodes / median if median > 0 else 0.0)
+
+
+def compare_to_baseline(results: list[BenchResult], baseline: dict, threshold: float,
+                        metric: str = BENCH_METRIC_MEDIAN) -> list[str]:
+    """ Find the puzzles that got slower than the baseline by more than the threshold.
+
+    Puzzles that are not part of the baseline are not compared.
+
+    :param results: The results of the benchmark
+    :param baseline: The results of an earlier benchmark, as written by `bench_to_json`
+    :param threshold: The fraction the time may grow by, 0.1 allows 10% slower runs
+    :param metric: The timing to compare, either `BENCH_METRIC_MIN`, `BENCH_METRIC_MEDIAN` or
+                   `BENCH_METRIC_P95`
+    :return: Returns a description of each regression found
+    """
+    if metric not in BENCH_METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    previous = {puzzle["filename"]: puzzle for puzzle in baseline.get("puzzles", [])}
+    regressions = []
+    for result in results:
+        if result.filename not in previous:
+            continue
+        before = previous[result.filename][metric]
+        after = getattr(result, metric)
+        if after > before * (1 + threshold):
+            regressions.append(f"{result.filename}: {metric} {after:.4f}s, "
+                               f"baseline {before:.4f}s")
+    return regressions
+
+
+def bench_to_json(results: list[BenchResult], engine: str, cage_pruning: str, ordering: str,
+                  warmup: int, repeats: int) -> dict:
+    """ Convert the results of a benchmark to the JSON format used for results and baselines.
+
+    :return: Returns a dictionary of the settings used and the results of each puzzle
+    """
+    return {
+        "engine": engine,
+        "cage_pruning": cage_pruning,
+        "ordering": ordering,
+        "warmup": warmup,
+        "repeats": repeats,
+        "puzzles": [result._asdict() for result in results],
+    }
+
+
+def run_benchmark(corpus: str, engine: str = ENGINE_CLASSIC,
+                  cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                  ordering: str = ORDERING_ROWMAJOR, warmup: int = 1, repeats: int = 5,
+                  output: str | None = None, baseline: str | None = None,
+                  threshold: float = 0.1, metric: str = BENCH_METRIC_MEDIAN) -> int:
+    """ Benchmark every puzzle of a corpus directory, and print the timings of each difficulty.
+
+    :param corpus: The corpus directory, see `find_corpus`
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param warmup: The number of untimed runs of each puzzle
+    :param repeats: The number of timed runs of each puzzle
+    :param output: The file to write the results to as JSON, if any
+    :param baseline: The JSON file of an earlier benchmark to compare against, if any
+    :param threshold: The fraction the time may grow by compared to the baseline
+    :param metric: The timing to compare against the baseline
+    :return: Returns the exit code, 1 if a puzzle was not solved or a regression was found,
+             otherwise 0
+    """
+    groups = find_corpus(corpus)
+    if not groups:
+        print(f"No puzzles found in {corpus}")
+        return 1
+
+    results = []
+    for difficulty, filenames in groups.items():
+        print(f"{difficulty}:")
+        group_results = []
+        for filename in filenames:
+            result = benchmark_puzzle(filename, difficulty, engine, cage_pruning, ordering,
+                                      warmup, repeats)
+            print(f"  {filename}: min {result.min:.4f}s, median {result.median:.4f}s, "
+                  f"p95 {result.p95:.4f}s, {result.nodes} nodes, "
+                  f"{result.nodes_per_sec:.0f} nodes/sec{'' if result.success else ', UNSOLVED'}")
+            group_results.append(result)
+        medians = [result.median for result in group_results]
+        print(f"  {len(group_results)} puzzle(s): median {_median(medians):.4f}s, "
+              f"p95 {percentile(medians, 95):.4f}s")
+        results.extend(group_results)
+
+    exit_code = 0 if all(result.success for result in results) else 1
+    if output is not None:
+        with open(output, "w") as file:
+            json.dump(bench_to_json(results, engine, cage_pruning, ordering, warmup, repeats), file,
+                      indent=2)
+        print(f"Results written to {output}")
+
+    if baseline is not None:
+        with open(baseline, "r") as file:
+            regressions = compare_to_baseline(results, json.load(file), threshold, metric)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"No regressions over {threshold * 100:.0f}% compared to {baseline}")
+    return exit_code
+
+
+def scaling_puzzle(size: int, seed: int = 0, max_cage_size: int = 3) -> tuple[Board, Cages]:
+    """ Generate a puzzle of a board size, to compare how the solver scales with the size.
+
+    The solution is made by `random_solution`, and then split into random cages by
+    `partition_cages`, with at most max_cage_size cells each. The board is left empty, and
+    the puzzle may have more than one solution, but it is the same puzzle for the same size and
+    seed.
+
+    :param size: The size of the board
+    :param seed: The seed of the random choices
+    :param max_cage_size: The largest number of cells in a cage
+    :return: Returns a tuple of the empty board and the cages
+    """
+    # Imported here, since only the generator and the benchmarks make random choices
+    import random
+    rng = random.Random(seed)
+    solution = random_solution(size, rng)
+    cages = partition_cages(solution, rng, lambda: rng.randint(1, max_cage_size))
+    return [[0] * size for _ in range(size)], cages
+
+
+def run_scaling_benchmark(sizes: list[int], engine: str = ENGINE_CLASSIC,
+                          cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                          ordering: str = ORDERING_ROWMAJOR, warmup: int = 1, repeats: int = 5,
+                          seed: int = 0, output: str | None = None) -> int:
+    """ Benchmark a generated puzzle of each board size, and print the timings of each size.
+
+    :param sizes: The board sizes to benchmark, see `scaling_puzzle`
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param warmup: The number of untimed runs of each puzzle
+    :param repeats: The number of timed runs of each puzzle
+    :param seed: The seed of the generated puzzles
+    :param output: The file to write the results to as JSON, if any
+    :return: Returns the exit code, 1 if a puzzle was not solved, otherwise 0
+    """
+    results = []
+    for size in sizes:
+        board, cages = scaling_puzzle(size, seed)
+        result = _time_solves(f"{size}x{size}", str(size), board, cages, engine, cage_pruning,
+                              ordering, warmup, repeats)
+        print(f"{result.filename}: min {result.min:.4f}s, median {result.median:.4f}s, "
+              f"p95 {result.p95:.4f}s, {result.nodes} nodes, "
+              f"{result.nodes_per_sec:.0f} nodes/sec{'' if result.success else ', UNSOLVED'}")
+        results.append(result)
+
+    if output is not None:
+        with open(output, "w") as file:
+            json.dump(bench_to_json(results, engine, cage_pruning, ordering, warmup, repeats), file,
+                      indent=2)
+        print(f"Results written to {output}")
+    return 0 if all(result.success for result in results) else 1
+
+
+def measure_latency(filename: str, requests: int = 20, engine: str = ENGINE_CLASSIC,
+                    cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                    ordering: str = ORDERING_ROWMAJOR,
+                    script: str = SOLVE_SCRIPT) -> tuple[list[float], list[float]]:
+    """ Measure the time it takes to solve a puzzle with a new process, and with a running server.
+
+    A cold request runs the script on the puzzle file in a new process, paying for starting the
+    interpreter, importing the solver and building its tables. A warm request sends the puzzle to
+    a single `solve.py serve` process and waits for the result line. The first warm request is not
+    timed, since it waits for the server to start.
+
+    :param filename: The puzzle file to solve
+    :param requests: The number of cold and warm requests to time
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param script: The command-line script to run
+    :return: Returns the times of the cold requests and the warm requests
+    """
+    import subprocess
+    options = ["--engine", engine, "--cage-pruning", cage_pruning, "--ordering", ordering]
+    cold = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script] + options + [filename], check=True,
+                       stdout=subprocess.DEVNULL)
+        cold.append(time.perf_counter() - start)
+
+    board, cages = load_from_file(filename)
+    line = json.dumps({"board": board, "cages": cages}) + "\n"
+    warm = []
+    with subprocess.Popen([sys.executable, script, "serve"] + options, stdin=subprocess.PIPE,
+                          stdout=subprocess.PIPE, text=True, bufsize=1) as server:
+        for request in range(requests + 1):
+            start = time.perf_counter()
+            server.stdin.write(line)
+            server.stdin.flush()
+            server.stdout.readline()
+            if request > 0:
+                warm.append(time.perf_counter() - start)
+        server.stdin.close()
+    return cold, warm
+
+
+def run_latency_benchmark(filename: str, requests: int = 20, engine: str = ENGINE_CLASSIC,
+                          cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                          ordering: str = ORDERING_ROWMAJOR) -> int:
+    """ Compare the latency of solving a puzzle with a new process and with a running server.
+
+    :param filename: The puzzle file to solve, see `measure_latency`
+    :param requests: The number of cold and warm requests to time
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :return: Returns the exit code, always 0
+    """
+    cold, warm = measure_latency(filename, requests, engine, cage_pruning, ordering)
+    for name, times in (("cold", cold), ("warm", warm)):
+        print(f"{name}: min {min(times):.4f}s, median {_median(times):.4f}s, "
+              f"p95 {percentile(times, 95):.4f}s")
+    print(f"A running server answers {_median(cold) / _median(warm):.1f}x faster, saving "
+          f"{_median(cold) - _median(warm):.4f}s per request")
+    return 0
+
+
+def measure_batch_throughput(puzzles: list[tuple[Board, Cages]], engine: str = ENGINE_CLASSIC,
+                             cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                             ordering: str = ORDERING_ROWMAJOR,
+                             repeats: int = 3) -> tuple[list[float], list[float]]:
+    """ Time solving a list of puzzles one by one with `solve`, and all at once with `solve_batch`.
+
+    The puzzles are solved once first without timing, so the indexes and tables of their cages
+    are built before either is timed. Every run solves copies of the boards.
+
+    :param puzzles: The board and cages of each puzzle
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param repeats: The number of timed runs of each
+    :return: Returns the seconds taken by each run of the loop and of the batch
+    """
+    def copies() -> list[tuple[Board, Cages]]:
+        return [([row[:] for row in board], cages) for board, cages in puzzles]
+
+    for board, cages in copies():
+        solve(board, cages, engine, cage_pruning, ordering)
+    loop_times = []
+    batch_times = []
+    for _ in range(repeats):
+        batch = copies()
+        start = time.perf_counter()
+        for board, cages in batch:
+            solve(board, cages, engine, cage_pruning, ordering)
+        loop_times.append(time.perf_counter() - start)
+        batch = copies()
+        start = time.perf_counter()
+        solve_batch(batch, engine, cage_pruning, ordering)
+        batch_times.append(time.perf_counter() - start)
+    return loop_times, batch_times
+
+
+def run_batch_benchmark(filename: str, engine: str = ENGINE_CLASSIC,
+                        cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                        ordering: str = ORDERING_ROWMAJOR, repeats: int = 3) -> int:
+    """ Compare the throughput of solving the puzzles of a file one by one and as a batch.
+
+    :param filename: The JSON, JSONL or binary file to read the puzzles from
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param repeats: The number of timed runs of each, the fastest is reported
+    :return: Returns the exit code, always 0
+    """
+    puzzles = list(load_puzzles(filename))
+    if not numpy_available():
+        print("NumPy is not installed, so the batch is solved one puzzle at a time")
+    loop_times, batch_times = measure_batch_throughput(puzzles, engine, cage_pruning, ordering,
+                                                       repeats)
+    for name, times in (("loop", loop_times), ("batch", batch_times)):
+        print(f"{name}: {min(times):.4f}s, {len(puzzles) / min(times):.1f} puzzles/sec")
+    print(f"The batch solves {min(loop_times) / min(batch_times):.2f}x as many puzzles per second")
+    return 0
+
+
+def measure_memory(board: Board, cages: Cages, engine: str = ENGINE_CLASSIC,
+                   cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                   ordering: str = ORDERING_ROWMAJOR) -> tuple[int, int]:
+    """ Measure the memory allocated by solving a puzzle, with tracemalloc.
+
+    The puzzle is solved once first without tracing, so the index and tables of its cages, which
+    are kept between puzzles, are not counted. Tracing slows the solver down many times over, so
+    the time of a traced solve says little.
+
+    :param board: The board to solve, which is not changed
+    :param cages: The cages of the board
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :return: Returns the most bytes allocated at once while solving, and the bytes still allocated
+             once solved
+    """
+    # Imported here, like the other tools only some of the benchmarks use
+    import tracemalloc
+    solve([row[:] for row in board], cages, engine, cage_pruning, ordering)
+    solution = [row[:] for row in board]
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        solve(solution, cages, engine, cage_pruning, ordering)
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline, held - baseline
+
+
+def run_memory_benchmark(filename: str, engine: str = ENGINE_CLASSIC,
+                         cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                         ordering: str = ORDERING_ROWMAJOR) -> int:
+    """ Show the memory allocated by solving a puzzle, see `measure_memory`.
+
+    :param filename: The puzzle file to solve
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :return: Returns the exit code, always 0
+    """
+    board, cages = load_from_file(filename)
+    peak, held = measure_memory(board, cages, engine, cage_pruning, ordering)
+    print(f"{filename}: peak {peak} bytes, held {held} bytes after solving")
+    return 0
@@ -0,0 +1,273 @@
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import permutations
+from typing import TYPE_CHECKING
+
+from .geometry import Geometry
+from .puzzle import PuzzleIndex
+from .types import Board, Cages
+
+if TYPE_CHECKING:
+    import sqlite3
+
+
+@lru_cache(maxsize=None)
+def line_maps(band_count: int, band_size: int) -> tuple[tuple[int, ...], ...]:
+    """ Find the ways to reorder the rows (or columns) of a board that keep the cages valid.
+
+    The bands are permuted, and the lines within every band are permuted the same way. Line i of
+    the reordered board is line `maps[n][i]` of the original one.
+
+    :param band_count: The number of bands, the boxes along the other axis
+    :param band_size: The number of lines in each band, the size of the boxes along the axis
+    :return: Returns the reorderings of the lines
+    """
+    return tuple(tuple(band_size * bands[line // band_size] + lines[line % band_size]
+                       for line in range(band_count * band_size))
+                 for bands in permutations(range(band_count))
+                 for lines in permutations(range(band_size)))
+
+
+@lru_cache(maxsize=None)
+def _orientations(size: int) -> tuple[tuple[tuple[int, ...], ...], ...]:
+    """ Find the cell at row r and column c of the board, and of its transpose if it has the same
+    boxes, which is only the case for square boxes. """
+    geometry = Geometry.for_size(size)
+    grids = [tuple(tuple(row * size + col for col in range(size)) for row in range(size))]
+    if geometry.box_width == geometry.box_height:
+        grids.append(tuple(tuple(col * size + row for col in range(size)) for row in range(size)))
+    return tuple(grids)
+
+
+class Transform:
+    """ The symmetry taking a puzzle to its canonical form.
+
+    Cell i of the canonical form is cell `cells[i]` of the puzzle, and if `complement` is set the
+    values v of the puzzle are replaced by 10 - v, and so the totals t of its cages of n cells by
+    10 * n - t. On boards of other sizes than 9, 10 is replaced by the size plus one.
+    """
+
+    __slots__ = ("cells", "complement")
+
+    def __init__(self, cells: tuple[int, ...], complement: bool) -> None:
+        self.cells = cells
+        self.complement = complement
+
+    def to_canonical(self, board: Board) -> bytes:
+        """ Convert a board of the puzzle to the canonical form.
+
+        :param board: The board to convert
+        :return: Returns the size * size values of the canonical board, in row-major order
+        """
+        values = [value for row in board for value in row]
+        if self.complement:
+            flip = len(board) + 1
+            return bytes(flip - values[cell] if values[cell] else 0 for cell in self.cells)
+        return bytes(values[cell] for cell in self.cells)
+
+    def from_canonical(self, canonical: bytes) -> Board:
+        """ Convert a board of the canonical form back to the puzzle.
+
+        :param canonical: The size * size values of the canonical board, in row-major order
+        :return: Returns the board
+        """
+        values = [0] * len(canonical)
+        size = round(len(canonical) ** 0.5)
+        for value, cell in zip(canonical, self.cells):
+            values[cell] = size + 1 - value if self.complement and value else value
+        return [values[y * size:y * size + size] for y in range(size)]
+
+
+def canonicalize(board: Board, cages: Cages) -> tuple[bytes, Transform]:
+    """ Find the canonical form of a puzzle under the symmetries that keep its cages valid.
+
+    The symmetries are transposing the board, which together with the row and column orders of
+    `line_maps` covers rotations and reflections, and complementing the values. Boards with boxes
+    that are not square are not transposed, since that changes the shape of the boxes. Any puzzle
+    reached from another by these has the same canonical form. The puzzle is encoded cell by cell
+    as the cage, numbered in the order the cages are first seen, the cage total and the value of
+    the cell, and the canonical form is the smallest encoding under any of the symmetries.
+
+    Since the first row of the encoding only depends on the orientation, the complement, the row
+    placed first and the column order, these are tried first, and the remaining row orders only
+    for the ones giving the smallest first row.
+
+    :param board: The board of the puzzle
+    :param cages: The cages of the puzzle
+    :return: Returns the canonical form as bytes, and the transform taking the puzzle to it
+    """
+    size = len(board)
+    geometry = Geometry.for_size(size)
+    index = PuzzleIndex.for_cages(cages, size)
+    cell_cage = index.cell_cage
+    values = [value for row in board for value in row]
+    flip = size + 1
+    codes = []
+    for complement in (False, True):
+        cell_codes = []
+        for cell in range(geometry.cell_count):
+            cage_index = cell_cage[cell]
+            if cage_index < 0:
+                total = 0
+            else:
+                cage = index.cages[cage_index]
+                total = flip * len(cage.cells) - cage.total if complement else cage.total
+            value = values[cell]
+            cell_codes.append((cage_index, total, flip - value if complement and value else value))
+        codes.append(cell_codes)
+    row_maps = line_maps(size // geometry.box_height, geometry.box_height)
+    col_maps = line_maps(size // geometry.box_width, geometry.box_width)
+
+    def encode(cells: list[int], cell_codes: list[tuple[int, int, int]]) -> list[int]:
+        labels = {}
+        encoding = []
+        for cell in cells:
+            cage_index, total, value = cell_codes[cell]
+            encoding += (labels.setdefault(cage_index, len(labels)), total, value)
+        return encoding
+
+    best_row = None
+    candidates = []
+    for grid in _orientations(size):
+        for complement, cell_codes in enumerate(codes):
+            for first_row in range(size):
+                row = grid[first_row]
+                for col_map in col_maps:
+                    encoding = encode([row[col] for col in col_map], cell_codes)
+                    if best_row is None or encoding < best_row:
+                        best_row = encoding
+                        candidates = []
+                    if encoding == best_row:
+                        candidates.append((grid, cell_codes, complement, first_row, col_map))
+
+    best = None
+    best_transform = None
+    for grid, cell_codes, complement, first_row, col_map in candidates:
+        for row_map in row_maps:
+            if row_map[0] != first_row:
+                continue
+            cells = [grid[row][col] for row in row_map for col in col_map]
+            encoding = encode(cells, cell_codes)
+            if best is None or encoding < best:
+                best = encoding
+                best_transform = Transform(tuple(cells), bool(complement))
+    return bytes(best), best_transform
+
+
+class SolutionCache:
+    """ A cache of solutions, keyed by the canonical form of the puzzles.
+
+    A puzzle that is a rotation, reflection, band or stack permutation, or complement of a puzzle
+    already solved, is looked up as the same puzzle, and the solution is converted to the layout of
+    the puzzle looked up. Puzzles without a solution are cached as well.
+
+    The most recently used solutions are kept in memory, up to `maxsize` of them. If a path is
+    given, the solutions are also stored in an SQLite database at that path, which is looked up
+    when a puzzle is not found in memory. The connection is opened on first use.
+
+    A cache sent to another process only brings along the path and size, and becomes the cache of
+    that process with the same path and size, so a worker process keeps a single cache in memory
+    for every task it is sent, and the worker processes share the database. The hits and misses are
+    counted by each process on its own.
+    """
+
+    __slots__ = ("maxsize", "path", "hits", "disk_hits", "misses", "_memory", "_connection")
+
+    def __init__(self, maxsize: int = 1024, path: str | None = None) -> None:
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._connection = None
+
+    def __reduce__(self):
+        return process_cache, (self.maxsize, self.path)
+
+    def _database(self) -> "sqlite3.Connection":
+        """ Open the database on first use, creating the table of solutions if needed. """
+        if self._connection is None:
+            # Imported on first use, since most caches are only kept in memory
+            import sqlite3
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS solutions "
+                                     "(puzzle BLOB PRIMARY KEY, solution BLOB)")
+        return self._connection
+
+    def _remember(self, key: bytes, solution: bytes) -> None:
+        """ Keep a canonical solution in memory, dropping the least recently used if full. """
+        self._memory[key] = solution
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, board: Board, cages: Cages,
+            canonical: tuple[bytes, Transform] | None = None) -> tuple[bool, Board | None]:
+        """ Look up the solution of a puzzle.
+
+        :param board: The board of the puzzle
+        :param cages: The cages of the puzzle
+        :param canonical: The canonical form and transform of the puzzle, if already found
+        :return: Returns whether the puzzle was found, and if so the solution, or None if the
+                 puzzle has no solution
+        """
+        key, transform = canonical or canonicalize(board, cages)
+        solution = self._memory.get(key)
+        if solution is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+        elif self.path is not None:
+            row = self._database().execute("SELECT solution FROM solutions WHERE puzzle = ?",
+                                           (key,)).fetchone()
+            if row is not None:
+                solution = bytes(row[0])
+                self._remember(key, solution)
+                self.hits += 1
+                self.disk_hits += 1
+        if solution is None:
+            self.misses += 1
+            return False, None
+        # An empty solution marks a puzzle without one
+        return True, transform.from_canonical(solution) if solution else None
+
+    def put(self, board: Board, cages: Cages, solution: Board | None,
+            canonical: tuple[bytes, Transform] | None = None) -> None:
+        """ Store the solution of a puzzle.
+
+        :param board: The board of the puzzle, as it was before solving it
+        :param cages: The cages of the puzzle
+        :param solution: The solution, or None if the puzzle has no solution
+        :param canonical: The canonical form and transform of the puzzle, if already found
+        """
+        key, transform = canonical or canonicalize(board, cages)
+        canonical = transform.to_canonical(solution) if solution is not None else b""
+        self._remember(key, canonical)
+        if self.path is not None:
+            with self._database() as connection:
+                connection.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?)",
+                                   (key, canonical))
+
+    def close(self) -> None:
+        """ Close the database, if it was opened. """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+# The caches of this process, created when a cache is received from another process
+_process_caches: dict[tuple[int, str | None], SolutionCache] = {}
+
+
+def process_cache(maxsize: int = 1024, path: str | None = None) -> SolutionCache:
+    """ Find the cache of this process with the size and path, creating it on first use.
+
+    :param maxsize: The number of solutions to keep in memory
+    :param path: The path of the database to store the solutions in, if any
+    :return: Returns the cache
+    """
+    key = (maxsize, path)
+    cache = _process_caches.get(key)
+    if cache is None:
+        cache = _process_caches[key] = SolutionCache(maxsize, path)
+    return cache
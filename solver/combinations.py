@@ -0,0 +1,143 @@
+from itertools import combinations
+
+from .geometry import Geometry
+
+CAGE_PRUNING_MINMAX = "minmax"
+CAGE_PRUNING_COMBINATIONS = "combinations"
+CAGE_PRUNINGS = (CAGE_PRUNING_MINMAX, CAGE_PRUNING_COMBINATIONS)
+
+# Combinations and tables built on first use, keyed by (total, field count, board size)
+_cage_combinations: dict[tuple[int, int, int], list[int]] = {}
+_combination_tables: dict[tuple[int, int, int], list[int]] = {}
+_minmax_tables: dict[tuple[int, int, int], list[int]] = {}
+
+
+def min_sum(count: int) -> int:
+    """ Find the smallest sum that can be made from count distinct values.
+
+    :param count: The number of values
+    :return: Returns the sum of the values 1 through count
+    """
+    return count * (count + 1) // 2
+
+
+def max_sum(count: int, size: int = 9) -> int:
+    """ Find the largest sum that can be made from count distinct values of a board of the size.
+
+    :param count: The number of values
+    :param size: The size of the board, which is also the largest value
+    :return: Returns the sum of the count largest values
+    """
+    return count * (2 * size - count + 1) // 2
+
+
+def bounds_mask(total: int, field_count: int, size: int = 9) -> int:
+    """ Find the values that are within the bounds of a cage as a bitmask.
+
+    This uses the same min/max approach as `find_minmax_value`, the lowest possible value is the one
+    that added to the largest values of the other fields reaches the total, and vice versa.
+
+    :param total: The total of the cage, or the remaining total if some fields are filled out
+    :param field_count: The number of fields in the cage, or the number of empty fields
+    :param size: The size of the board
+    :return: Returns a bitmask with the bits of the values within the bounds set
+    """
+    if field_count < 1:
+        return 0
+    min_value = max(total - max_sum(field_count - 1, size), 1)
+    max_value = min(total - min_sum(field_count - 1), size)
+    if min_value > max_value:
+        return 0
+    return ((1 << max_value) - 1) & ~((1 << (min_value - 1)) - 1)
+
+
+def cage_combinations(total: int, field_count: int, size: int = 9) -> list[int]:
+    """ Find every set of distinct values that adds up to the total using field_count values.
+
+    A cage of 2 fields with the total 5 can be either 1 + 4 or 2 + 3, so the result would be the two
+    bitmasks 0b1001 and 0b0110. The combinations are found the first time they are requested for a
+    total, field count and size, and the same list is returned afterwards, so it must not be
+    changed.
+
+    :param total: The total of the cage
+    :param field_count: The number of fields in the cage
+    :param size: The size of the board, which is also the largest value
+    :return: Returns a list of bitmasks, one for each valid set of values
+    """
+    key = (total, field_count, size)
+    found = _cage_combinations.get(key)
+    if found is None:
+        found = _cage_combinations[key] = [
+            sum(1 << (value - 1) for value in values)
+            for values in combinations(range(1, size + 1), field_count) if sum(values) == total]
+    return found
+
+
+def combination_table(total: int, field_count: int, size: int = 9) -> list[int]:
+    """ Find the table of available values in a cage, indexed by the mask of values already used.
+
+    For each of the 2 ** size masks of used values, the table holds the union of the values left in
+    every combination that contains the used values. If no combination contains the used values,
+    the entry is 0, meaning the cage can not be completed. The table is built the first time it is
+    requested for a total, field count and size, and reused afterwards.
+
+    :param total: The total of the cage
+    :param field_count: The number of fields in the cage
+    :param size: The size of the board
+    :return: Returns a list of 2 ** size bitmasks of values still available in the cage
+    """
+    key = (total, field_count, size)
+    table = _combination_tables.get(key)
+    if table is None:
+        table = [0] * (1 << size)
+        for combination in cage_combinations(total, field_count, size):
+            # Go through every subset of the combination, all of them can be completed by it
+            used = combination
+            while True:
+                table[used] |= combination & ~used
+                if used == 0:
+                    break
+                used = (used - 1) & combination
+        _combination_tables[key] = table
+    return table
+
+
+def minmax_table(total: int, field_count: int, size: int = 9) -> list[int]:
+    """ Find the table of values within the min/max bounds of a cage, indexed by the used values.
+
+    This is the naive counterpart of `combination_table`, the entry for a mask of used values holds
+    the values that are within the bounds of both the entire cage, and the fields left once the used
+    values are subtracted from the total.
+
+    :param total: The total of the cage
+    :param field_count: The number of fields in the cage
+    :param size: The size of the board
+    :return: Returns a list of 2 ** size bitmasks of values still available in the cage
+    """
+    key = (total, field_count, size)
+    table = _minmax_tables.get(key)
+    if table is None:
+        cage_bounds = bounds_mask(total, field_count, size)
+        mask_sums = Geometry.for_size(size).mask_sums
+        table = [0] * (1 << size)
+        for used in range(1 << size):
+            remaining = bounds_mask(total - mask_sums[used], field_count - used.bit_count(), size)
+            table[used] = remaining & cage_bounds & ~used
+        _minmax_tables[key] = table
+    return table
+
+
+def cage_table(total: int, field_count: int, cage_pruning: str, size: int = 9) -> list[int]:
+    """ Find the table of available values in a cage for the chosen kind of cage pruning.
+
+    :param total: The total of the cage
+    :param field_count: The number of fields in the cage
+    :param cage_pruning: Either `CAGE_PRUNING_MINMAX` or `CAGE_PRUNING_COMBINATIONS`
+    :param size: The size of the board
+    :return: Returns a list of 2 ** size bitmasks of values still available in the cage
+    """
+    if cage_pruning == CAGE_PRUNING_COMBINATIONS:
+        return combination_table(total, field_count, size)
+    if cage_pruning == CAGE_PRUNING_MINMAX:
+        return minmax_table(total, field_count, size)
+    raise ValueError(f"Unknown cage pruning: {cage_pruning}")
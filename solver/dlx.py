@@ -0,0 +1,153 @@
+from typing import Iterator
+
+from .combinations import cage_combinations
+from .puzzle import PuzzleIndex
+from .stats import SolveStats
+
+
+class ExactCover:
+    """ A puzzle encoded as an exact cover problem, solved with Algorithm X.
+
+    A row of the matrix either places a value in a cell, or chooses the combination of values of a
+    cage. Placing value v in a cell covers the cell, v in its row, column and nonet, and v in its
+    cage. Every cage has a column that is covered by choosing one of its combinations, which also
+    covers v in the cage for every value v not in the combination, so the cells of the cage must
+    place exactly the values of the chosen combination. Cells that are not part of any cage only
+    cover the first four columns.
+
+    With n = size * size cells, column c covers cell c, and the columns n, 2n and 3n on hold the
+    values of the rows, columns and nonets, with value v of row r at n + r * size + v - 1. The
+    columns of the cages follow from 4n, first one per cage, then the values of each cage. The rows
+    placing value v in a cell are numbered cell * size + v - 1, and the rows choosing the
+    combination of a cage follow these.
+
+    The matrix is kept as the set of rows of each column, and the columns of each row. Rather than
+    the linked lists of dancing links, selecting a row removes the rows it conflicts with from the
+    sets of their columns, and deselecting it adds them back in the reverse order, which does the
+    same with the sets of Python. The search always covers the column with the fewest rows next.
+    """
+
+    __slots__ = ("columns", "rows", "solution")
+
+    def __init__(self, candidates: list[int], index: PuzzleIndex) -> None:
+        """ Build the matrix from the candidates of the cells.
+
+        Only the values left in the candidates of a cell are placed in it, and only the combinations
+        of a cage that can be made from the candidates of its cells are chosen from. The cells with
+        a single candidate are selected up front, and are part of every solution.
+
+        :param candidates: The bitmask of the values still possible in each cell, numbered
+                           y * size + x
+        :param index: The index of the cages
+        """
+        geometry = index.geometry
+        size = geometry.size
+        cell_count = geometry.cell_count
+        cage_columns = 4 * cell_count
+        cage_count = len(index.cages)
+        rows = {}
+        for cell in range(cell_count):
+            cage_index = index.cell_cage[cell]
+            mask = candidates[cell]
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                value = bit.bit_length() - 1
+                columns = [cell,
+                           cell_count + geometry.cell_rows[cell] * size + value,
+                           2 * cell_count + geometry.cell_cols[cell] * size + value,
+                           3 * cell_count + geometry.cell_boxes[cell] * size + value]
+                if cage_index >= 0:
+                    columns.append(cage_columns + cage_count + cage_index * size + value)
+                rows[cell * size + value] = columns
+        row = cell_count * size
+        for cage_index, cage in enumerate(index.cages):
+            available = 0
+            for cell in cage.cells:
+                available |= candidates[cell]
+            for combination in cage_combinations(cage.total, len(cage.cells), size):
+                if combination & ~available:
+                    continue
+                rows[row] = [cage_columns + cage_index] + [
+                    cage_columns + cage_count + cage_index * size + value
+                    for value in range(size) if not combination & (1 << value)]
+                row += 1
+
+        self.rows = rows
+        self.columns = {column: set()
+                        for column in range(cage_columns + cage_count * (size + 1))}
+        for row, columns in rows.items():
+            for column in columns:
+                self.columns[column].add(row)
+        self.solution = []
+        for cell, mask in enumerate(candidates):
+            if mask and not mask & (mask - 1):
+                self.select(cell * size + mask.bit_length() - 1)
+
+    def select(self, row: int) -> list[set[int]]:
+        """ Add a row to the solution, removing its columns and every row conflicting with it.
+
+        :param row: The row to select
+        :return: Returns the rows of the removed columns, to pass to `deselect`
+        """
+        columns, rows = self.columns, self.rows
+        removed = []
+        for column in rows[row]:
+            for conflict in columns[column]:
+                for other in rows[conflict]:
+                    if other != column:
+                        columns[other].remove(conflict)
+            removed.append(columns.pop(column))
+        self.solution.append(row)
+        return removed
+
+    def deselect(self, row: int, removed: list[set[int]]) -> None:
+        """ Take the row last selected out of the solution, restoring the matrix as it was before.
+
+        :param row: The row to deselect
+        :param removed: The rows of the removed columns, as returned by `select`
+        """
+        columns, rows = self.columns, self.rows
+        self.solution.pop()
+        for column in reversed(rows[row]):
+            columns[column] = removed.pop()
+            for conflict in columns[column]:
+                for other in rows[conflict]:
+                    if other != column:
+                        columns[other].add(conflict)
+
+    def solutions(self, stats: SolveStats | None = None, depth: int = 0) -> Iterator[list[int]]:
+        """ Search for every exact cover of the matrix.
+
+        A node of the search is a column being covered. The solution yielded is the same list every
+        time, and it changes as the search continues.
+
+        :param stats: The stats to collect, if any
+        :param depth: The depth of the search, the number of rows selected by it
+        :return: Returns an iterator of the rows of each solution
+        """
+        columns = self.columns
+        if not columns:
+            yield self.solution
+            return
+        column = min(columns, key=lambda column: len(columns[column]))
+        if stats is not None:
+            stats.node(depth)
+        for row in list(columns[column]):
+            removed = self.select(row)
+            yield from self.solutions(stats, depth + 1)
+            self.deselect(row, removed)
+        if stats is not None:
+            stats.backtracks += 1
+
+
+def placements(solution: list[int], size: int = 9) -> Iterator[tuple[int, int]]:
+    """ Find the values placed by a solution of the exact cover matrix.
+
+    :param solution: The rows of the solution
+    :param size: The size of the board
+    :return: Returns an iterator of the cell, numbered y * size + x, and value of each placement
+    """
+    for row in solution:
+        if row < size * size * size:
+            yield row // size, row % size + 1
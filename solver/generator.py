@@ -0,0 +1,347 @@
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Iterator, NamedTuple
+
+from .geometry import Geometry
+from .puzzle import PuzzleIndex
+from .solver import ENGINE_DLX, ENGINE_PROPAGATE, ORDERING_MRV, solve, solve_all
+from .stats import SolveStats
+from .types import Board, Cages
+
+if TYPE_CHECKING:
+    import random
+
+# The relative weight of each number of cells a cage is drawn to have, see `partition_cages`
+DEFAULT_CAGE_WEIGHTS = {1: 1, 2: 6, 3: 6, 4: 3, 5: 1}
+# The number of random merges of neighbouring cages tried once the solution is unique, each
+# merge making the search for a second solution slower as the puzzle gets harder
+DEFAULT_MERGE_ATTEMPTS = 10
+# The other solutions kept to check the cages against while generating a puzzle, see
+# `generate_puzzle`
+GENERATOR_ALTERNATIVES = 32
+
+# The difficulties a puzzle is graded with, and the most nodes the propagate engine searches for
+# a puzzle of each, see `grade_puzzle`
+DIFFICULTY_EASY = "easy"
+DIFFICULTY_MEDIUM = "medium"
+DIFFICULTY_HARD = "hard"
+DIFFICULTY_EXPERT = "expert"
+DIFFICULTY_GRADES = ((DIFFICULTY_EASY, 1), (DIFFICULTY_MEDIUM, 10), (DIFFICULTY_HARD, 100),
+                     (DIFFICULTY_EXPERT, None))
+
+
+class GeneratedPuzzle(NamedTuple):
+    """ A puzzle made by `generate_puzzle`, with the unique solution of its cages. """
+    board: Board
+    cages: Cages
+    solution: Board
+    difficulty: str
+    nodes: int
+    searches: int
+    seed: int
+
+
+def random_solution(size: int, rng: "random.Random") -> Board:
+    """ Make a random solved board.
+
+    The board is a pattern filling each row with the values of the row above shifted along, with
+    the values, the rows within each band, the bands, the columns within each stack and the stacks
+    shuffled.
+
+    :param size: The size of the board
+    :param rng: The source of the random choices
+    :return: Returns the solved board
+    """
+    geometry = Geometry.for_size(size)
+    width, height = geometry.box_width, geometry.box_height
+
+    def shuffled_lines(band_count: int, band_size: int) -> list[int]:
+        bands = rng.sample(range(band_count), band_count)
+        return [band * band_size + line for band in bands
+                for line in rng.sample(range(band_size), band_size)]
+
+    values = rng.sample(range(1, size + 1), size)
+    rows = shuffled_lines(width, height)
+    cols = shuffled_lines(height, width)
+    return [[values[(width * (row % height) + row // height + col) % size] for col in cols]
+            for row in rows]
+
+
+def partition_cages(solution: Board, rng: "random.Random", cage_size: Callable[[], int]) -> Cages:
+    """ Split a solved board into random cages of connected cells with distinct values.
+
+    The cells are visited in a random order, and each cell not yet in a cage starts a new cage,
+    which grows by random neighbours until it has the number of cells drawn for it, or no neighbour
+    with a value not already in the cage is left.
+
+    :param solution: The solved board
+    :param rng: The source of the random choices
+    :param cage_size: Draws the number of cells of the next cage
+    :return: Returns the cages, with the totals of the solution
+    """
+    size = len(solution)
+    cages = []
+    caged = set()
+    cells = [(x, y) for y in range(size) for x in range(size)]
+    rng.shuffle(cells)
+    for cell in cells:
+        if cell in caged:
+            continue
+        fields = [cell]
+        caged.add(cell)
+        target = cage_size()
+        used = {solution[cell[1]][cell[0]]}
+        while len(fields) < target:
+            # The values of a cage are distinct, so only neighbours with a value not used yet
+            free = [neighbour for field in fields for neighbour in _neighbours(field, size)
+                    if neighbour not in caged and solution[neighbour[1]][neighbour[0]] not in used]
+            if not free:
+                break
+            neighbour = rng.choice(free)
+            fields.append(neighbour)
+            caged.add(neighbour)
+            used.add(solution[neighbour[1]][neighbour[0]])
+        cages.append((sum(solution[y][x] for x, y in fields), sorted(fields)))
+    return cages
+
+
+def _neighbours(field: tuple[int, int], size: int) -> list[tuple[int, int]]:
+    """ Find the cells next to a cell, not counting the diagonals. """
+    x, y = field
+    return [(nx, ny) for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+            if 0 <= nx < size and 0 <= ny < size]
+
+
+def _is_connected(fields: list[tuple[int, int]]) -> bool:
+    """ Find whether the cells are connected, not counting the diagonals. """
+    remaining = set(fields)
+    stack = [remaining.pop()]
+    while stack:
+        x, y = stack.pop()
+        for neighbour in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if neighbour in remaining:
+                remaining.remove(neighbour)
+                stack.append(neighbour)
+    return not remaining
+
+
+def _fits_cages(board: Board, cages: Cages) -> bool:
+    """ Find whether the values of a solved board add up to the total of every cage, each value
+    used once. The rows, columns and boxes are not checked. """
+    for total, fields in cages:
+        values = [board[y][x] for x, y in fields]
+        if sum(values) != total or len(set(values)) != len(values):
+            return False
+    return True
+
+
+def find_alternative(board: Board, cages: Cages, solution: Board) -> Board | None:
+    """ Search for a solution of a puzzle other than the one given, showing that it is not unique.
+
+    The cages are indexed for this search alone rather than by `PuzzleIndex.for_cages`, since the
+    generator checks many cages that are never solved again, which would push the indexes of the
+    puzzles being solved out of the cache.
+
+    :param board: The initial board of the puzzle
+    :param cages: The cages of the puzzle
+    :param solution: A solution of the puzzle
+    :return: Returns another solution, or None if the solution given is the only one
+    """
+    index = PuzzleIndex(cages, len(board))
+    for found in solve_all([row[:] for row in board], cages, 2, engine=ENGINE_DLX, index=index):
+        if found != solution:
+            return [row[:] for row in found]
+    return None
+
+
+def split_cage(cages: Cages, solution: Board, alternative: Board,
+               rng: "random.Random") -> Cages | None:
+    """ Split a cage in two, so that an alternative solution no longer adds up to the totals.
+
+    A cage holding different values in the two solutions has at least two cells differing, whose
+    differences cancel out. A random one of these cages is split into two connected parts that the
+    alternative does not add up to the totals of, as evenly as possible.
+
+    :param cages: The cages of the puzzle
+    :param solution: The solution the cages are made for
+    :param alternative: The other solution to rule out
+    :param rng: The source of the random choices
+    :return: Returns the cages with one of them split in two, or None if the cage drawn can not be
+             split into two connected parts ruling out the alternative
+    """
+    differing = [cage_index for cage_index, (_, fields) in enumerate(cages)
+                 if any(solution[y][x] != alternative[y][x] for x, y in fields)]
+    cage_index = rng.choice(differing)
+    fields = cages[cage_index][1]
+    best = []
+    best_balance = 0
+    # The last cell is always left in the second part, so each split is only tried once
+    for mask in range(1, 1 << (len(fields) - 1)):
+        part = [field for bit, field in enumerate(fields) if mask >> bit & 1]
+        rest = [field for bit, field in enumerate(fields) if not mask >> bit & 1]
+        difference = sum(solution[y][x] - alternative[y][x] for x, y in part)
+        balance = min(len(part), len(rest))
+        if not difference or balance < best_balance or not _is_connected(part) or \
+                not _is_connected(rest):
+            continue
+        if balance > best_balance:
+            best = []
+            best_balance = balance
+        best.append((part, rest))
+    if not best:
+        return None
+    part, rest = rng.choice(best)
+    return cages[:cage_index] + cages[cage_index + 1:] + [
+        (sum(solution[y][x] for x, y in part), part), (sum(solution[y][x] for x, y in rest), rest)]
+
+
+def merge_cages(cages: Cages, solution: Board, rng: "random.Random",
+                max_cage_size: int) -> Cages | None:
+    """ Merge two random neighbouring cages, whose values are distinct and fit a cage.
+
+    :param cages: The cages of the puzzle
+    :param solution: The solution the cages are made for
+    :param rng: The source of the random choices
+    :param max_cage_size: The most cells of the merged cage
+    :return: Returns the cages with two of them merged, or None if no two cages can be merged
+    """
+    size = len(solution)
+    field_cage = {field: cage_index for cage_index, (_, fields) in enumerate(cages)
+                  for field in fields}
+    pairs = set()
+    for cage_index, (_, fields) in enumerate(cages):
+        for field in fields:
+            for neighbour in _neighbours(field, size):
+                other = field_cage[neighbour]
+                if other > cage_index:
+                    pairs.add((cage_index, other))
+    mergeable = []
+    for first, second in sorted(pairs):
+        fields = cages[first][1] + cages[second][1]
+        values = {solution[y][x] for x, y in fields}
+        if len(fields) <= max_cage_size and len(values) == len(fields):
+            mergeable.append((first, second))
+    if not mergeable:
+        return None
+    first, second = rng.choice(mergeable)
+    merged = (cages[first][0] + cages[second][0], sorted(cages[first][1] + cages[second][1]))
+    return [cage for cage_index, cage in enumerate(cages) if cage_index not in (first, second)] + \
+        [merged]
+
+
+def grade_puzzle(board: Board, cages: Cages) -> tuple[str, int]:
+    """ Grade the difficulty of a puzzle by the nodes searched to solve it.
+
+    The puzzle is solved by the propagate engine with the MRV ordering, so a puzzle solved by
+    propagating the constraints alone only searches the single node finding it solved, and the
+    difficulty is the first of `DIFFICULTY_GRADES` the node count is within.
+
+    :param board: The initial board of the puzzle
+    :param cages: The cages of the puzzle
+    :return: Returns the difficulty and the number of nodes searched
+    """
+    stats = SolveStats()
+    solve([row[:] for row in board], cages, ENGINE_PROPAGATE, ordering=ORDERING_MRV, stats=stats)
+    difficulty = next(difficulty for difficulty, nodes in DIFFICULTY_GRADES
+                      if nodes is None or stats.nodes <= nodes)
+    return difficulty, stats.nodes
+
+
+def generate_puzzle(size: int = 9, seed: int = 0, cage_weights: dict[int, int] | None = None,
+                    merge_attempts: int = DEFAULT_MERGE_ATTEMPTS) -> GeneratedPuzzle:
+    """ Generate a puzzle with a unique solution and an empty board.
+
+    A random solution, see `random_solution`, is split into cages, see `partition_cages`, with the
+    number of cells of each cage drawn by the weights. As long as the cages have another solution,
+    a cage holding different values in it is split, see `split_cage`, and once the solution is
+    unique, random neighbouring cages are merged, see `merge_cages`, keeping each merge that leaves
+    the solution unique, which makes the puzzle harder.
+
+    If the cage drawn to be split can not be split, the solution is split into new cages. Each check
+    of the cages searches for a second solution, see `find_alternative`, but the last
+    `GENERATOR_ALTERNATIVES` other solutions already found are tried first. The combinations of
+    values of the cages are only found once for each total and number of cells, see
+    `cage_combinations`, while the cages themselves are indexed for each search. The same size,
+    seed and options always give the same puzzle.
+
+    :param size: The size of the board
+    :param seed: The seed of the random choices
+    :param cage_weights: The relative weight of each number of cells of a cage, the default is
+                         `DEFAULT_CAGE_WEIGHTS`. The largest number is also the most cells merged
+                         into a cage
+    :param merge_attempts: The number of merges to try once the solution is unique
+    :return: Returns the puzzle, with its solution, difficulty and the number of searches made
+    """
+    cage_weights = cage_weights or DEFAULT_CAGE_WEIGHTS
+    # Imported here, since only the generator and the benchmarks make random choices
+    import random
+    rng = random.Random(seed)
+    cage_sizes = list(cage_weights)
+    weights = list(cage_weights.values())
+
+    def draw_cage_size() -> int:
+        return rng.choices(cage_sizes, weights)[0]
+
+    solution = random_solution(size, rng)
+    cages = partition_cages(solution, rng, draw_cage_size)
+    board = [[0] * size for _ in range(size)]
+    alternatives = []
+    searches = 0
+
+    def check(candidate_cages: Cages) -> Board | None:
+        # Splitting or merging a cage often leaves a solution found earlier a solution, which is
+        # much faster to check than searching again
+        nonlocal searches
+        for alternative in alternatives:
+            if _fits_cages(alternative, candidate_cages):
+                return alternative
+        searches += 1
+        alternative = find_alternative(board, candidate_cages, solution)
+        if alternative is not None:
+            alternatives.append(alternative)
+            del alternatives[:-GENERATOR_ALTERNATIVES]
+        return alternative
+
+    while (alternative := check(cages)) is not None:
+        split = split_cage(cages, solution, alternative, rng)
+        cages = split if split is not None else partition_cages(solution, rng, draw_cage_size)
+    max_cage_size = max(cage_sizes)
+    for _ in range(merge_attempts):
+        merged = merge_cages(cages, solution, rng, max_cage_size)
+        if merged is None:
+            break
+        if check(merged) is None:
+            cages = merged
+
+    cages.sort(key=lambda cage: (cage[1][0][1], cage[1][0][0]))
+    difficulty, nodes = grade_puzzle(board, cages)
+    return GeneratedPuzzle(board, cages, solution, difficulty, nodes, searches, seed)
+
+
+def generate_puzzles(count: int, size: int = 9, seed: int = 0, jobs: int = 1,
+                     cage_weights: dict[int, int] | None = None,
+                     merge_attempts: int = DEFAULT_MERGE_ATTEMPTS) -> Iterator[GeneratedPuzzle]:
+    """ Generate a number of puzzles, see `generate_puzzle`, the puzzle n using the seed plus n.
+
+    With more than one job the puzzles are generated by a pool of worker processes. The puzzles
+    are yielded in the order of the seeds either way, so the same puzzles are generated for any
+    number of jobs.
+
+    :param count: The number of puzzles to generate
+    :param size: The size of the board
+    :param seed: The seed of the first puzzle
+    :param jobs: The number of worker processes to use
+    :param cage_weights: The relative weight of each number of cells of a cage
+    :param merge_attempts: The number of merges to try once the solution is unique
+    :return: Returns an iterator of the puzzles
+    """
+    worker = partial(generate_puzzle, size, cage_weights=cage_weights,
+                     merge_attempts=merge_attempts)
+    seeds = range(seed, seed + count)
+    if jobs <= 1:
+        yield from map(worker, seeds)
+        return
+
+    # Imported here rather than up front, see `solve_parallel`
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(worker, seeds)
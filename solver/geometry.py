@@ -0,0 +1,81 @@
+from functools import lru_cache
+
+# The largest board supported, the values of a cell must fit the bitmasks of the tables indexed by
+# the values used, which have 2 ** size entries
+MAX_BOARD_SIZE = 16
+
+
+def box_shape(size: int) -> tuple[int, int]:
+    """ Find the shape of the boxes of a board of the size.
+
+    The boxes are as close to square as possible, and never taller than they are wide, so a 9x9
+    board has 3x3 boxes, a 6x6 board has boxes 3 wide and 2 tall, and a 12x12 board has boxes 4 wide
+    and 3 tall. Boards of a prime size have boxes that are a single row.
+
+    :param size: The number of cells along each side of the board
+    :return: Returns the width and height of the boxes
+    """
+    height = max(divisor for divisor in range(1, size + 1)
+                 if size % divisor == 0 and divisor * divisor <= size)
+    return size // height, height
+
+
+class Geometry:
+    """ The shape of a board, and the lookups of its cells that only depend on the shape.
+
+    A board of size n has n rows, n columns and n boxes (the nonets of a 9x9 board), each holding
+    the values 1 through n once, and the cells are numbered y * n + x. Value v is represented by bit
+    v - 1 of a bitmask, so `all_values` has the lowest n bits set. The lookups match the module
+    level tables of the `puzzle` module, which are those of the 9x9 board.
+
+    Since the lookups only depend on the size, use `Geometry.for_size` to share them.
+    """
+
+    __slots__ = ("size", "box_width", "box_height", "cell_count", "all_values", "house_total",
+                 "cell_rows", "cell_cols", "cell_boxes", "houses", "house_peers", "mask_sums")
+
+    def __init__(self, size: int) -> None:
+        if not 1 <= size <= MAX_BOARD_SIZE:
+            raise ValueError(f"Board size must be between 1 and {MAX_BOARD_SIZE}, not {size}")
+        self.size = size
+        self.box_width, self.box_height = box_shape(size)
+        self.cell_count = size * size
+        self.all_values = (1 << size) - 1
+        self.house_total = size * (size + 1) // 2
+        boxes_per_row = size // self.box_width
+        cells = range(self.cell_count)
+        self.cell_rows = bytes(cell // size for cell in cells)
+        self.cell_cols = bytes(cell % size for cell in cells)
+        self.cell_boxes = bytes((cell // size) // self.box_height * boxes_per_row +
+                                (cell % size) // self.box_width for cell in cells)
+        # The rows, followed by the columns and the boxes, each in row-major order
+        self.houses = tuple(tuple(cell for cell in cells if lookup[cell] == house)
+                            for lookup in (self.cell_rows, self.cell_cols, self.cell_boxes)
+                            for house in range(size))
+        peers = [set() for _ in cells]
+        for house in self.houses:
+            for cell in house:
+                peers[cell].update(house)
+        self.house_peers = tuple(tuple(sorted(cell_peers - {cell}))
+                                 for cell, cell_peers in enumerate(peers))
+        # The sum of the values in each bitmask, built from the mask without its lowest bit
+        mask_sums = [0] * (1 << size)
+        for mask in range(1, 1 << size):
+            bit = mask & -mask
+            mask_sums[mask] = mask_sums[mask ^ bit] + bit.bit_length()
+        self.mask_sums = mask_sums
+
+    @classmethod
+    def for_size(cls, size: int) -> "Geometry":
+        """ Find the geometry of a board size, reusing it if already built.
+
+        :param size: The number of cells along each side of the board
+        :return: Returns the geometry
+        """
+        return _geometry_for_size(size)
+
+
+@lru_cache(maxsize=None)
+def _geometry_for_size(size: int) -> Geometry:
+    """ Build the geometry of a board size. """
+    return Geometry(size)
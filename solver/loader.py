@@ -0,0 +1,176 @@
+from functools import lru_cache
+from typing import BinaryIO, Iterable, Iterator
+
+from .combinations import max_sum, min_sum
+from .geometry import MAX_BOARD_SIZE, Geometry
+from .types import Board, Cages
+
+# The binary puzzle format starts with the magic bytes and the version of the format, followed by
+# the puzzles, see `encode_puzzle`
+PUZZLE_MAGIC = b"KSDK"
+PUZZLE_FORMAT_VERSION = 1
+PUZZLE_HEADER = PUZZLE_MAGIC + bytes([PUZZLE_FORMAT_VERSION])
+
+
+class PuzzleError(ValueError):
+    """ A puzzle that is not well formed, raised before any time is spent solving it. """
+
+
+def check_puzzle(board: Board, cages: Cages) -> None:
+    """ Check that a puzzle is well formed, raising a PuzzleError describing the first problem.
+
+    The board must be square, of a size supported by `Geometry`, and hold the values 0 through the
+    size. Every cage must have between 1 and size cells on the board, and a total that the number
+    of distinct values can add up to. The cages must partition the board, so every cell is in
+    exactly one cage, and since every row holds each value once, the totals of the cages must add
+    up to the sum of every row, 405 on a 9x9 board.
+
+    The checks only look at the layout, givens that conflict with each other or with their cage are
+    left for the solver to find. Rows and cells are checked in bulk, and only searched one by one
+    to describe the problem once one is found.
+
+    :param board: The board of the puzzle
+    :param cages: The cages of the puzzle
+    """
+    size = len(board)
+    if not 1 <= size <= MAX_BOARD_SIZE:
+        raise PuzzleError(f"Board size must be between 1 and {MAX_BOARD_SIZE}, not {size}")
+    geometry = Geometry.for_size(size)
+    values = _board_values(size)
+    for y, row in enumerate(board):
+        if len(row) != size:
+            raise PuzzleError(f"Row {y} has {len(row)} values, not {size}")
+        if not values.issuperset(row):
+            x = next(x for x, value in enumerate(row) if value not in values)
+            raise PuzzleError(f"Cell ({x}, {y}) holds {row[x]!r}, not a value from 0 to {size}")
+
+    cells = []
+    totals = 0
+    for cage_index, (total, fields) in enumerate(cages):
+        field_count = len(fields)
+        if not 1 <= field_count <= size:
+            raise PuzzleError(f"Cage {cage_index} has {field_count} cells, not 1 to {size}")
+        lowest, highest = min_sum(field_count), max_sum(field_count, size)
+        if type(total) is not int or not lowest <= total <= highest:
+            raise PuzzleError(f"Cage {cage_index} of {field_count} cells can not add up to "
+                              f"{total!r}, only {lowest} through {highest}")
+        totals += total
+        for x, y in fields:
+            if not (0 <= x < size and 0 <= y < size):
+                raise PuzzleError(f"Cell ({x}, {y}) of cage {cage_index} is outside the board")
+            cells.append(y * size + x)
+
+    if len(cells) != geometry.cell_count or set(cells) != _board_cells(size):
+        _find_partition_error(cages, size)
+    expected = size * geometry.house_total
+    if totals != expected:
+        raise PuzzleError(f"The cage totals add up to {totals}, not {expected}")
+
+
+@lru_cache(maxsize=None)
+def _board_values(size: int) -> frozenset[int]:
+    """ Find the values a cell of a board of the size may hold, 0 for an empty cell. """
+    return frozenset(range(size + 1))
+
+
+@lru_cache(maxsize=None)
+def _cell_coordinates(size: int) -> tuple[tuple[int, int], ...]:
+    """ Find the coordinates (x, y) of each cell of a board of the size. """
+    return tuple((cell % size, cell // size) for cell in range(size * size))
+
+
+@lru_cache(maxsize=None)
+def _board_cells(size: int) -> frozenset[int]:
+    """ Find the cells of a board of the size, numbered y * size + x. """
+    return frozenset(range(size * size))
+
+
+def _find_partition_error(cages: Cages, size: int) -> None:
+    """ Raise a PuzzleError for the first cell in more than one cage, or else not in any cage. """
+    cell_cage = {}
+    for cage_index, (_, fields) in enumerate(cages):
+        for x, y in fields:
+            if (x, y) in cell_cage:
+                raise PuzzleError(f"Cell ({x}, {y}) is in both cage {cell_cage[x, y]} and cage "
+                                  f"{cage_index}")
+            cell_cage[x, y] = cage_index
+    cell = next(cell for cell in range(size * size) if (cell % size, cell // size) not in cell_cage)
+    raise PuzzleError(f"Cell ({cell % size}, {cell // size}) is not in any cage")
+
+
+def encode_puzzle(board: Board, cages: Cages) -> bytes:
+    """ Encode a puzzle in the compact binary format.
+
+    Every number of the format is a single byte, which fits every board up to 16x16. A puzzle is
+    the board size and the number of cages, as two bytes in little-endian order, followed by the
+    values of the board in row-major order, and for every cage its total, its number of cells and
+    the cells, numbered y * size + x. A 9x9 puzzle takes a little over 200 bytes.
+
+    :param board: The board of the puzzle
+    :param cages: The cages of the puzzle
+    :return: Returns the encoded puzzle, without the header of the format
+    """
+    size = len(board)
+    encoded = bytearray([size, len(cages) & 0xFF, len(cages) >> 8])
+    for row in board:
+        encoded += bytes(row)
+    for total, fields in cages:
+        encoded += bytes([total, len(fields)])
+        encoded += bytes(y * size + x for x, y in fields)
+    return bytes(encoded)
+
+
+def decode_puzzles(data: bytes) -> Iterator[tuple[Board, Cages]]:
+    """ Decode the puzzles of the compact binary format, see `encode_puzzle`.
+
+    The puzzles are not checked, use `check_puzzle` for that.
+
+    :param data: The encoded puzzles, starting with the header of the format
+    :return: Returns an iterator of the board and cages of each puzzle
+    """
+    if not data.startswith(PUZZLE_MAGIC):
+        raise PuzzleError("Not a puzzle file of the binary format")
+    if len(data) < len(PUZZLE_HEADER):
+        raise PuzzleError("Puzzle file is truncated, the header is incomplete")
+    if data[len(PUZZLE_MAGIC)] != PUZZLE_FORMAT_VERSION:
+        raise PuzzleError(f"Unsupported version {data[len(PUZZLE_MAGIC)]} of the binary format")
+    view = memoryview(data)
+    offset = len(PUZZLE_HEADER)
+    try:
+        while offset < len(data):
+            size = data[offset]
+            cage_count = data[offset + 1] | data[offset + 2] << 8
+            offset += 3
+            if offset + size * size > len(data):
+                raise IndexError
+            board = [view[row:row + size].tolist()
+                     for row in range(offset, offset + size * size, size)]
+            offset += size * size
+            coordinates = _cell_coordinates(size)
+            cages = []
+            for _ in range(cage_count):
+                field_count = data[offset + 1]
+                end = offset + 2 + field_count
+                if end > len(data):
+                    raise IndexError
+                cages.append((data[offset], [coordinates[cell] for cell in data[offset + 2:end]]))
+                offset = end
+            yield board, cages
+    except IndexError:
+        raise PuzzleError(f"Puzzle file is truncated or corrupt at byte {offset}") from None
+
+
+def write_puzzles(file: BinaryIO, puzzles: Iterable[tuple[Board, Cages]]) -> int:
+    """ Write puzzles to a file in the compact binary format, checking each first.
+
+    :param file: The file to write to, opened in binary mode
+    :param puzzles: The board and cages of each puzzle
+    :return: Returns the number of puzzles written
+    """
+    file.write(PUZZLE_HEADER)
+    count = 0
+    for board, cages in puzzles:
+        check_puzzle(board, cages)
+        file.write(encode_puzzle(board, cages))
+        count += 1
+    return count
@@ -0,0 +1,281 @@
+import os
+import time
+from functools import partial
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from .cache import SolutionCache
+from .combinations import CAGE_PRUNING_COMBINATIONS
+from .propagate import initial_candidates, reduce_candidates
+from .puzzle import PuzzleIndex, board_from_snapshot, board_snapshot, restore_board
+from .solver import ENGINE_BITMASK, ENGINE_CLASSIC, ORDERING_MRV, ORDERING_ROWMAJOR, \
+    load_from_file, load_puzzles, solve
+from .stats import SolveProgress, SolveStats
+from .types import Board, Cages
+
+
+class PuzzleResult(NamedTuple):
+    """ The outcome of solving a single puzzle file, including the stats if they were collected. """
+    filename: str
+    board: Board
+    cages: Cages
+    solution: Board
+    success: bool
+    elapsed: float
+    stats: SolveStats | None
+
+
+def split_search(board: Board, cages: Cages, split_depth: int) -> list[bytes]:
+    """ Split the search for a solution into independent subproblems.
+
+    The constraints are propagated as done by `solve`, and the first `split_depth` levels of the
+    search tree are expanded, each level trying every candidate of the cell with the fewest
+    candidates left. Values leading to a contradiction when propagated are left out, and every
+    other branch becomes a snapshot of the board with the cells known in that branch filled out,
+    see `board_snapshot`, which is what is sent to the worker processes. The puzzle is solvable if,
+    and only if, one of the subproblems is.
+
+    :param board: The board to split the search of, which is not changed
+    :param cages: The cages of the board
+    :param split_depth: The number of levels of the search tree to expand
+    :return: Returns a list of board snapshots, one for each subproblem
+    """
+    size = len(board)
+    layout = PuzzleIndex.for_cages(cages, size).layout
+    candidates = initial_candidates(board)
+    queue = [cell for cell, mask in enumerate(candidates) if not mask & (mask - 1)]
+    if not reduce_candidates(candidates, layout, queue):
+        return []
+
+    branches = [candidates]
+    for _ in range(split_depth):
+        expanded = []
+        for branch in branches:
+            counts = [mask.bit_count() for mask in branch]
+            open_cells = [cell for cell, count in enumerate(counts) if count > 1]
+            if not open_cells:
+                expanded.append(branch)
+                continue
+            cell = min(open_cells, key=lambda open_cell: counts[open_cell])
+            mask = branch[cell]
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                subproblem = branch[:]
+                subproblem[cell] = bit
+                if reduce_candidates(subproblem, layout, [cell]):
+                    expanded.append(subproblem)
+        branches = expanded
+
+    return [bytes(mask.bit_length() if not mask & (mask - 1) else 0 for mask in branch)
+            for branch in branches]
+
+
+def _solve_subproblem(subproblem: bytes, cages: Cages, engine: str, cage_pruning: str,
+                      ordering: str, collect_stats: bool) -> tuple[bool, bytes, SolveStats | None]:
+    """ Solve a single subproblem in a worker process, and return a snapshot of the board and the
+    stats. """
+    board = board_from_snapshot(subproblem)
+    stats = SolveStats() if collect_stats else None
+    success = solve(board, cages, engine, cage_pruning, ordering, stats)
+    return success, board_snapshot(board), stats
+
+
+def solve_parallel(board: Board, cages: Cages, jobs: int = os.cpu_count() or 1,
+                   split_depth: int = 2, engine: str = ENGINE_BITMASK,
+                   cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                   ordering: str = ORDERING_MRV, stats: SolveStats | None = None) -> bool:
+    """ Solve Sudoku from board and cages, searching independent parts of the search tree in
+    parallel.
+
+    The search is split into subproblems by `split_search`, which are handed out to a pool of
+    worker processes, each solving them with `solve`. As soon as one of them returns a solution,
+    the remaining workers are terminated. Like `solve` the board parameter will be updated to
+    reflect the solution. If the puzzle has more than one solution, the one found is not
+    necessarily the one `solve` would have found.
+
+    If stats are given, the stats of the subproblems that were completed are added to them.
+
+    :param board: The initial board to use
+    :param cages: The cages of that board
+    :param jobs: The number of worker processes to use
+    :param split_depth: The number of levels of the search tree to expand into subproblems
+    :param engine: The engine to solve the subproblems with
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param stats: The stats to collect, if any
+    :return: Returns a boolean true if the Sudoku could be resolved
+    """
+    subproblems = split_search(board, cages, split_depth)
+    worker = partial(_solve_subproblem, cages=cages, engine=engine, cage_pruning=cage_pruning,
+                     ordering=ordering, collect_stats=stats is not None)
+
+    # Leaving the pool terminates the workers, including the ones still searching when a solution
+    # is found
+    # Imported here, since the process pools take longer to import than the rest of the package,
+    # and most runs never start one
+    import multiprocessing
+    with multiprocessing.Pool(max(1, min(jobs, len(subproblems)))) as pool:
+        for success, solution, subproblem_stats in pool.imap_unordered(worker, subproblems):
+            if stats is not None:
+                stats.merge(subproblem_stats)
+            if success:
+                restore_board(board, solution)
+                return True
+    return False
+
+
+def solve_puzzle(name: str, board: Board, cages: Cages, engine: str = ENGINE_CLASSIC,
+                 cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                 ordering: str = ORDERING_ROWMAJOR, search_jobs: int = 1,
+                 split_depth: int = 2, collect_stats: bool = False,
+                 cache: SolutionCache | None = None, timeout: float | None = None,
+                 progress: Callable[[SolveProgress], None] | None = None) -> PuzzleResult:
+    """ Solve a single puzzle, and optionally collect the stats of solving it.
+
+    The board is not changed, the solution is a copy of it. With a timeout or progress callback
+    the stats are always collected, so the result tells whether the search was stopped, see
+    `solve`. Neither is supported when searching in parallel.
+
+    :param name: The name of the puzzle, kept as the file name of the result
+    :param board: The board of the puzzle
+    :param cages: The cages of the puzzle
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param search_jobs: The number of worker processes to search the puzzle with, using
+                        `solve_parallel` if more than one
+    :param split_depth: The number of levels of the search tree to split, when searching in parallel
+    :param collect_stats: Whether to collect the stats of solving the puzzle
+    :param cache: The cache of solutions to use, if any, only used when not searching in parallel
+    :param timeout: The number of seconds the search may take, if limited
+    :param progress: The function to report the progress of the search to, if any
+    :return: Returns the result of solving the puzzle
+    """
+    if search_jobs > 1 and (timeout is not None or progress is not None):
+        raise ValueError("A timeout or progress is not supported when searching in parallel")
+    solution = [row[:] for row in board]
+    limited = timeout is not None or progress is not None
+    stats = SolveStats() if collect_stats or limited else None
+    start = time.perf_counter()
+    if search_jobs > 1:
+        success = solve_parallel(solution, cages, search_jobs, split_depth, engine, cage_pruning,
+                                 ordering, stats)
+    else:
+        success = solve(solution, cages, engine, cage_pruning, ordering, stats, cache, timeout,
+                        progress=progress)
+    elapsed = time.perf_counter() - start
+    return PuzzleResult(name, board, cages, solution, success, elapsed, stats)
+
+
+def solve_file(filename: str, engine: str = ENGINE_CLASSIC,
+               cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+               ordering: str = ORDERING_ROWMAJOR, search_jobs: int = 1,
+               split_depth: int = 2, collect_stats: bool = False,
+               cache: SolutionCache | None = None, timeout: float | None = None,
+               progress: Callable[[SolveProgress], None] | None = None) -> PuzzleResult:
+    """ Load and solve a single puzzle file, and optionally collect the stats of solving it.
+
+    See `solve_puzzle` for the parameters other than the file name.
+
+    :param filename: The name of the JSON-file, or binary file of a single puzzle, to load the board
+                     and cages from
+    :return: Returns the result of solving the puzzle
+    """
+    board, cages = load_from_file(filename)
+    return solve_puzzle(filename, board, cages, engine, cage_pruning, ordering, search_jobs,
+                        split_depth, collect_stats, cache, timeout, progress)
+
+
+def _solve_named_puzzle(puzzle: tuple[str, Board, Cages], **options) -> PuzzleResult:
+    """ Solve a puzzle given as its name, board and cages, as handed out to the worker processes.
+    """
+    return solve_puzzle(*puzzle, **options)
+
+
+def load_named_puzzles(filename: str) -> list[tuple[str, Board, Cages]]:
+    """ Load every puzzle of a JSON, JSONL or binary file, along with the name of each puzzle.
+
+    A puzzle is named by the file name, followed by its number counting from 1 if the file holds
+    more than one puzzle.
+
+    :param filename: The name of the file to load the puzzles from
+    :return: Returns a list of the name, board and cages of each puzzle
+    """
+    puzzles = list(load_puzzles(filename))
+    if len(puzzles) == 1:
+        return [(filename, *puzzles[0])]
+    return [(f"{filename} #{number}", board, cages)
+            for number, (board, cages) in enumerate(puzzles, 1)]
+
+
+def solve_puzzles(puzzles: Iterable[tuple[str, Board, Cages]], jobs: int = 1,
+                  engine: str = ENGINE_CLASSIC, cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                  ordering: str = ORDERING_ROWMAJOR, search_jobs: int = 1,
+                  split_depth: int = 2, collect_stats: bool = False,
+                  cache: SolutionCache | None = None, timeout: float | None = None,
+                  progress: Callable[[SolveProgress], None] | None = None
+                  ) -> Iterator[PuzzleResult]:
+    """ Solve a list of puzzles, spreading them across a pool of worker processes.
+
+    The results are yielded in the same order as the puzzles, as soon as each of them, and the ones
+    before it, are solved. With a single job the puzzles are solved in the current process, one at
+    a time as they are taken from the iterable. Since the worker processes can not start workers of
+    their own, searching each puzzle in parallel is only possible with a single job.
+
+    :param puzzles: The name, board and cages of each puzzle
+    :param jobs: The number of worker processes to use
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param search_jobs: The number of worker processes to search each puzzle with
+    :param split_depth: The number of levels of the search tree to split, when searching in parallel
+    :param collect_stats: Whether to collect the stats of solving each puzzle
+    :param cache: The cache of solutions to use, if any, see `SolutionCache` for how it is shared
+                  with the worker processes
+    :param timeout: The number of seconds the search of each puzzle may take, if limited
+    :param progress: The function to report the progress of each search to, if any, only
+                     supported with a single job
+    :return: Returns an iterator of the results, in the order of the puzzles
+    """
+    if jobs > 1 and search_jobs > 1:
+        raise ValueError("Puzzles can not be searched in parallel when solving several at once")
+    if jobs > 1 and progress is not None:
+        raise ValueError("The progress can only be reported when solving with a single job")
+
+    worker = partial(_solve_named_puzzle, engine=engine, cage_pruning=cage_pruning,
+                     ordering=ordering, search_jobs=search_jobs, split_depth=split_depth,
+                     collect_stats=collect_stats, cache=cache, timeout=timeout, progress=progress)
+    if jobs <= 1:
+        yield from map(worker, puzzles)
+        return
+
+    # Hand out the puzzles in chunks to limit the overhead of sending them to the workers, while
+    # keeping the chunks small enough to spread the load evenly
+    puzzles = list(puzzles)
+    chunksize = max(1, len(puzzles) // (jobs * 4))
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(worker, puzzles, chunksize=chunksize)
+
+
+def solve_files(filenames: list[str], jobs: int = 1, engine: str = ENGINE_CLASSIC,
+                cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                ordering: str = ORDERING_ROWMAJOR, search_jobs: int = 1,
+                split_depth: int = 2, collect_stats: bool = False,
+                cache: SolutionCache | None = None, timeout: float | None = None,
+                progress: Callable[[SolveProgress], None] | None = None
+                ) -> Iterator[PuzzleResult]:
+    """ Solve the puzzles of a list of files, spreading them across a pool of worker processes.
+
+    The files are loaded in the current process, so a file that can not be loaded raises its error,
+    a `PuzzleError` if the puzzle is not well formed, right here rather than in a worker. Every
+    puzzle of a JSONL or binary file is solved, named as by `load_named_puzzles`. See
+    `solve_puzzles` for the other parameters.
+
+    :param filenames: The names of the JSON, JSONL or binary files to load the puzzles from
+    :return: Returns an iterator of the results, in the order of the files and the puzzles in them
+    """
+    yield from solve_puzzles((puzzle for filename in filenames
+                              for puzzle in load_named_puzzles(filename)),
+                             jobs, engine, cage_pruning, ordering, search_jobs, split_depth,
+                             collect_stats, cache, timeout, progress)
@@ -0,0 +1,278 @@
+from array import array
+
+from .combinations import cage_combinations
+from .geometry import Geometry
+from .types import Board, Cages, Candidates
+
+# The entries of a trail pack the cell changed into the lowest bits and the candidates it held
+# before above them, so an entry fits the unsigned ints of an array("L") for every board size
+TRAIL_CELL_BITS = 8
+TRAIL_CELL_MASK = (1 << TRAIL_CELL_BITS) - 1
+
+
+class PropagationLayout:
+    """ The parts of a puzzle used by the propagation that only depend on the cage layout.
+
+    The cells are numbered in row-major order, so the cell at (x, y) is y * size + x. The houses are
+    the rows, columns and nonets of the `Geometry` of the size, and the peers of a cell are the
+    cells sharing a house or a cage with it. The groups are the cages, followed by the virtual cages
+    found by the rule of 45, each with the combinations of values that add up to its total.
+    `all_values` is the bitmask of every value of the board.
+    """
+
+    __slots__ = ("peers", "houses", "groups", "all_values")
+
+    def __init__(self, cages: Cages, size: int = 9) -> None:
+        geometry = Geometry.for_size(size)
+        self.all_values = geometry.all_values
+        self.houses = [[y * size + x for x, y in house] for house in find_houses(size)]
+        peers = [set() for _ in range(geometry.cell_count)]
+        for cells in self.houses + [[y * size + x for x, y in fields] for total, fields in cages]:
+            for cell in cells:
+                peers[cell].update(cells)
+        for cell, cell_peers in enumerate(peers):
+            cell_peers.discard(cell)
+        self.peers = [sorted(cell_peers) for cell_peers in peers]
+        self.groups = [(total, [y * size + x for x, y in fields],
+                        cage_combinations(total, len(fields), size))
+                       for total, fields in cages + find_innies_outies(cages, size)]
+
+
+def find_houses(size: int = 9) -> list[list[tuple[int, int]]]:
+    """ Find the coordinates of the cells in each row, column and nonet.
+
+    :param size: The size of the board
+    :return: Returns a list of 27 houses, the rows followed by the columns and the nonets, or 3 *
+             size houses for a board of another size, with its boxes in place of the nonets
+    """
+    return [[(cell % size, cell // size) for cell in house]
+            for house in Geometry.for_size(size).houses]
+
+
+def find_innies_outies(cages: Cages, size: int = 9) -> Cages:
+    """ Find the virtual cages given by the rule of 45 for each row, column and nonet.
+
+    The values in a house always add up to 45. Subtracting the totals of the cages entirely inside
+    the house leaves the total of the remaining cells in the house, the innies. Likewise the totals
+    of all the cages overlapping the house, minus 45, is the total of the cells of those cages that
+    are outside the house, the outies. Innies always hold distinct values, since they are in the
+    same house, but outies are only used if they are all inside another house as well. On a board
+    of another size the values of a house add up to size * (size + 1) / 2 instead of 45.
+
+    :param cages: The cages of the puzzle
+    :param size: The size of the board
+    :return: Returns a list of virtual cages, in the same format as the cages
+    """
+    houses = find_houses(size)
+    house_total = Geometry.for_size(size).house_total
+    known = {frozenset(fields) for total, fields in cages}
+    virtual_cages = []
+    for house in houses:
+        house_set = set(house)
+        inside_total = 0
+        inside_cells = set()
+        outside_total = 0
+        outside_cells = set()
+        for total, fields in cages:
+            field_set = set(fields)
+            if field_set <= house_set:
+                inside_total += total
+                inside_cells |= field_set
+            elif field_set & house_set:
+                outside_total += total
+                outside_cells |= field_set - house_set
+
+        innies = [cell for cell in house if cell not in inside_cells]
+        outies = sorted(outside_cells, key=lambda cell: (cell[1], cell[0]))
+        candidates = [(house_total - inside_total, innies)]
+        if any(outside_cells <= set(other) for other in houses):
+            candidates.append((inside_total + outside_total - house_total, outies))
+        for total, fields in candidates:
+            if 0 < len(fields) < size and frozenset(fields) not in known:
+                known.add(frozenset(fields))
+                virtual_cages.append((total, fields))
+    return virtual_cages
+
+
+def initial_candidates(board: Board) -> list[int]:
+    """ Find the candidates of each cell before any propagation, in row-major order.
+
+    :param board: The board, where filled out cells only have their value as candidate
+    :return: Returns a list of size * size bitmasks of candidate values
+    """
+    size = len(board)
+    candidates = [(1 << size) - 1] * (size * size)
+    for y in range(size):
+        for x in range(size):
+            if board[y][x] > 0:
+                candidates[y * size + x] = 1 << (board[y][x] - 1)
+    return candidates
+
+
+def undo_trail(candidates: list[int], trail: array, mark: int) -> None:
+    """ Roll the candidates back to the way they were when the trail held `mark` entries.
+
+    A trail is an array("L") of the changes made to the candidates by `reduce_candidates`, each
+    entry holding a cell and the candidates it held before the change, see `TRAIL_CELL_BITS`. The
+    entries after the mark are undone latest first and removed from the trail.
+
+    :param candidates: The list of bitmasks of candidate values, one for each cell
+    :param trail: The trail of changes made to the candidates
+    :param mark: The length of the trail to roll back to
+    """
+    while len(trail) > mark:
+        entry = trail.pop()
+        candidates[entry & TRAIL_CELL_MASK] = entry >> TRAIL_CELL_BITS
+
+
+def _eliminate_singles(candidates: list[int], layout: PropagationLayout, queue: list[int],
+                       trail: array | None) -> bool:
+    """ Remove the value of each single candidate cell in the queue from its peers (naked singles).
+
+    Peers that are reduced to a single candidate are added to the queue as well.
+
+    :return: Returns False if a cell is left without candidates
+    """
+    peers = layout.peers
+    while queue:
+        cell = queue.pop()
+        bit = candidates[cell]
+        for peer in peers[cell]:
+            mask = candidates[peer]
+            if mask & bit:
+                if trail is not None:
+                    trail.append(mask << TRAIL_CELL_BITS | peer)
+                mask &= ~bit
+                if not mask:
+                    return False
+                candidates[peer] = mask
+                if not mask & (mask - 1):
+                    queue.append(peer)
+    return True
+
+
+def _place_hidden_singles(candidates: list[int], cells: list[int], values: int,
+                          queue: list[int], trail: array | None) -> bool:
+    """ Place each of the values that only one of the cells can hold (hidden singles).
+
+    :return: Returns False if one of the values can not be held by any of the cells
+    """
+    seen_once = 0
+    seen_more = 0
+    for cell in cells:
+        mask = candidates[cell]
+        seen_more |= seen_once & mask
+        seen_once |= mask
+    if values & ~seen_once:
+        return False
+    unique = values & ~seen_more
+    while unique:
+        bit = unique & -unique
+        unique ^= bit
+        for cell in cells:
+            mask = candidates[cell]
+            if mask & bit:
+                if mask != bit:
+                    if trail is not None:
+                        trail.append(mask << TRAIL_CELL_BITS | cell)
+                    candidates[cell] = bit
+                    queue.append(cell)
+                break
+    return True
+
+
+def _restrict_groups(candidates: list[int], layout: PropagationLayout, queue: list[int],
+                     trail: array | None) -> bool:
+    """ Remove candidates that are not part of a combination that can complete their group.
+
+    A combination can complete a group if every cell has a candidate in it, and between them all of
+    its values are covered. Values that are part of every such combination must be in the group, so
+    if only one cell can hold one of these, it is placed there.
+
+    :return: Returns False if a group can not be completed
+    """
+    for total, cells, combinations in layout.groups:
+        allowed = 0
+        required = layout.all_values
+        for combination in combinations:
+            union = 0
+            for cell in cells:
+                mask = candidates[cell] & combination
+                if not mask:
+                    break
+                union |= mask
+            else:
+                if union == combination:
+                    allowed |= combination
+                    required &= combination
+        if not allowed:
+            return False
+        for cell in cells:
+            mask = candidates[cell]
+            if mask & ~allowed:
+                if trail is not None:
+                    trail.append(mask << TRAIL_CELL_BITS | cell)
+                mask &= allowed
+                candidates[cell] = mask
+                if not mask & (mask - 1):
+                    queue.append(cell)
+        if not _place_hidden_singles(candidates, cells, required, queue, trail):
+            return False
+    return True
+
+
+def reduce_candidates(candidates: list[int], layout: PropagationLayout,
+                      queue: list[int], trail: array | None = None) -> bool:
+    """ Propagate the constraints of the puzzle until no more candidates can be removed.
+
+    The candidates are updated in place. The queue holds the cells that have been reduced to a
+    single candidate since the last propagation, and which values should be removed from the peers.
+    With a trail, every change is recorded on it as well, so a search can take the changes back
+    with `undo_trail` rather than propagating a copy of the candidates. The changes are recorded
+    also when a contradiction is found.
+
+    :param candidates: The list of bitmasks of candidate values, one for each cell
+    :param layout: The layout of the puzzle
+    :param queue: The cells with a single candidate that has not yet been propagated
+    :param trail: The trail to record the changes on, if any
+    :return: Returns False if a contradiction was found, meaning the puzzle can not be solved from
+             the candidates
+    """
+    while True:
+        if not _eliminate_singles(candidates, layout, queue, trail):
+            return False
+        all_values = layout.all_values
+        for house in layout.houses:
+            if not _place_hidden_singles(candidates, house, all_values, queue, trail):
+                return False
+        if queue:
+            continue
+        if not _restrict_groups(candidates, layout, queue, trail):
+            return False
+        if not queue:
+            return True
+
+
+def propagate(board: Board, cages: Cages,
+              layout: PropagationLayout | None = None) -> Candidates | None:
+    """ Find the candidates of each cell that are left when propagating the constraints.
+
+    This removes the values of filled out and single candidate cells from their peers, places values
+    that only fit in one cell of a row, column, nonet or cage, removes values that are not part of
+    any combination completing their cage, and does the same for the innies and outies of each row,
+    column and nonet. The board is not changed.
+
+    :param board: The board to propagate the constraints of
+    :param cages: The cages of the board
+    :param layout: The layout to use, if already built for the cages
+    :return: Returns the grid of candidate bitmasks in the same layout as the board, or None if a
+             contradiction was found
+    """
+    size = len(board)
+    if layout is None:
+        layout = PropagationLayout(cages, size)
+    candidates = initial_candidates(board)
+    queue = [cell for cell, mask in enumerate(candidates) if not mask & (mask - 1)]
+    if not reduce_candidates(candidates, layout, queue):
+        return None
+    return [candidates[y * size:y * size + size] for y in range(size)]
@@ -0,0 +1,217 @@
+import math
+from array import array
+from functools import lru_cache
+
+from .combinations import max_sum, min_sum
+from .geometry import Geometry
+from .propagate import PropagationLayout
+from .types import Board, Cages
+
+
+class Cage:
+    """ A cage of the compact puzzle representation, the cells are numbered y * size + x. """
+
+    __slots__ = ("total", "cells")
+
+    def __init__(self, total: int, cells: tuple[int, ...]) -> None:
+        self.total = total
+        self.cells = cells
+
+    def __repr__(self) -> str:
+        return f"Cage({self.total}, {self.cells})"
+
+
+class PuzzleIndex:
+    """ Lookups of a cage layout, built in a single pass over the cages.
+
+    The cells are numbered y * size + x. The index holds the cage of each cell, both as a flat
+    array and as a grid in the layout of the board, the cells of each cage and the peers of each
+    cell, the cells sharing a row, column, nonet or cage with it. The row, column and nonet peers
+    alone are the same for every layout, and found in the `geometry`, where the boxes of boards of
+    other sizes than 9x9 take the place of the nonets. The min/max bounds of the cage of each cell
+    are kept in the same grid layout as the classic engine expects. Cells that are not part of any
+    cage have the cage index -1 and the bounds (1, size).
+
+    Since the index only depends on the cages, use `PuzzleIndex.for_cages` to reuse the index when
+    the same cages are solved with different givens.
+    """
+
+    __slots__ = ("geometry", "cages", "cell_cage", "cage_grid", "minmax_grid", "peers", "_layout")
+
+    def __init__(self, cages: Cages, size: int = 9) -> None:
+        geometry = self.geometry = Geometry.for_size(size)
+        self.cages = []
+        self.cell_cage = array("h", [-1] * geometry.cell_count)
+        self.minmax_grid = [[(1, size)] * size for _ in range(size)]
+        for cage_index, (total, fields) in enumerate(cages):
+            cells = []
+            field_count = len(fields)
+            bounds = (max(total - max_sum(field_count - 1, size), 1),
+                      min(total - min_sum(field_count - 1), size))
+            for x, y in fields:
+                cell = y * size + x
+                cells.append(cell)
+                self.cell_cage[cell] = cage_index
+                self.minmax_grid[y][x] = bounds
+            self.cages.append(Cage(total, tuple(cells)))
+        self.cage_grid = [list(self.cell_cage[y * size:y * size + size]) for y in range(size)]
+        house_peers = geometry.house_peers
+        self.peers = tuple(
+            tuple(sorted(set(house_peers[cell]).union(self.cages[self.cell_cage[cell]].cells) -
+                         {cell}))
+            if self.cell_cage[cell] >= 0 else house_peers[cell]
+            for cell in range(geometry.cell_count))
+        self._layout = None
+
+    @classmethod
+    def for_cages(cls, cages: Cages, size: int = 9) -> "PuzzleIndex":
+        """ Find the index of the cages, reusing the index if already built for the same cages.
+
+        :param cages: The cages to find the index of
+        :param size: The size of the board
+        :return: Returns the index
+        """
+        return _index_for_key(tuple((total, tuple((x, y) for x, y in fields))
+                                    for total, fields in cages), size)
+
+    @property
+    def layout(self) -> PropagationLayout:
+        """ The propagation layout of the cages, built the first time it is used. """
+        if self._layout is None:
+            self._layout = PropagationLayout(self.to_cages(), self.geometry.size)
+        return self._layout
+
+    def cage_index(self, x: int, y: int) -> int:
+        """ Find the index of the cage at coordinate (x, y).
+
+        If the cage at coordinate (x, y) does not exist, an AssertionError is raised.
+
+        :param x: The zero indexed x coordinate
+        :param y: The zero indexed y coordinate
+        :return: Returns the cage index for the cage at x, y
+        """
+        size = self.geometry.size
+        cage_index = self.cell_cage[y * size + x] if 0 <= x < size and 0 <= y < size else -1
+        if cage_index < 0:
+            raise AssertionError(f"Cage for coordinates ({x}, {y}) not found")
+        return cage_index
+
+    def to_cages(self) -> Cages:
+        """ Convert the cages of the index to a list of totals and coordinates.
+
+        :return: Returns the cages
+        """
+        size = self.geometry.size
+        return [(cage.total, [(cell % size, cell // size) for cell in cage.cells])
+                for cage in self.cages]
+
+
+@lru_cache(maxsize=256)
+def _index_for_key(key: tuple, size: int) -> PuzzleIndex:
+    """ Build the index of the cages, the key is the cages converted to tuples. """
+    return PuzzleIndex(list(key), size)
+
+
+class Puzzle:
+    """ Compact representation of a board and its cages.
+
+    The board is a flat bytearray of the size * size cells in row-major order, so the cell at
+    (x, y) is y * size + x, and 0 is an empty cell. The cages and the lookups of the cells are kept
+    in the `PuzzleIndex` of the cages, which is shared by copies of the puzzle, and the size is
+    found in the geometry of the index.
+    """
+
+    __slots__ = ("board", "index")
+
+    def __init__(self, board: bytearray, index: PuzzleIndex) -> None:
+        self.board = board
+        self.index = index
+
+    @classmethod
+    def from_board(cls, board: Board, cages: Cages) -> "Puzzle":
+        """ Convert a board and cages to the compact representation.
+
+        :param board: The board to convert
+        :param cages: The cages to convert
+        :return: Returns the puzzle
+        """
+        return cls(bytearray(value for row in board for value in row),
+                   PuzzleIndex.for_cages(cages, len(board)))
+
+    def copy(self) -> "Puzzle":
+        """ Copy the puzzle, only the board is copied, the index is shared.
+
+        :return: Returns the copy
+        """
+        return Puzzle(self.board[:], self.index)
+
+    def snapshot(self) -> bytes:
+        """ Take an immutable snapshot of the board, see `board_snapshot`.
+
+        :return: Returns the values of the cells in row-major order, one byte each
+        """
+        return bytes(self.board)
+
+    def restore(self, snapshot: bytes) -> None:
+        """ Put the values of a snapshot taken by `snapshot` back on the board, in place.
+
+        :param snapshot: The snapshot to restore
+        """
+        self.board[:] = snapshot
+
+    def to_board(self) -> Board:
+        """ Convert the board of the puzzle to a list of rows.
+
+        :return: Returns the board
+        """
+        size = self.index.geometry.size
+        return [list(self.board[y * size:y * size + size]) for y in range(size)]
+
+    def to_cages(self) -> Cages:
+        """ Convert the cages of the puzzle to a list of totals and coordinates.
+
+        :return: Returns the cages
+        """
+        return self.index.to_cages()
+
+    def write_to(self, board: Board) -> None:
+        """ Write the values of the puzzle into an existing board, replacing its values.
+
+        :param board: The board to update
+        """
+        size = self.index.geometry.size
+        for y in range(size):
+            board[y][:] = self.board[y * size:y * size + size]
+
+
+def board_snapshot(board: Board) -> bytes:
+    """ Encode a board as an immutable snapshot, holding the value of each cell in a single byte.
+
+    A snapshot of a 9x9 board is 81 bytes in one object, rather than 9 lists of 9 references, so it
+    is cheap to keep around, to hash and to send to another process.
+
+    :param board: The board to take a snapshot of
+    :return: Returns the values of the cells in row-major order
+    """
+    return bytes(value for row in board for value in row)
+
+
+def board_from_snapshot(snapshot: bytes) -> Board:
+    """ Decode a snapshot taken by `board_snapshot` into a new board.
+
+    :param snapshot: The snapshot to decode
+    :return: Returns the board
+    """
+    size = math.isqrt(len(snapshot))
+    return [list(snapshot[y * size:y * size + size]) for y in range(size)]
+
+
+def restore_board(board: Board, snapshot: bytes) -> None:
+    """ Put the values of a snapshot taken by `board_snapshot` back on an existing board.
+
+    :param board: The board to update, of the same size as the snapshot
+    :param snapshot: The snapshot to restore
+    """
+    size = len(board)
+    for y, row in enumerate(board):
+        row[:] = snapshot[y * size:y * size + size]
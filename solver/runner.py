@@ -0,0 +1,310 @@
+import json
+import sys
+import time
+from typing import Iterator
+
+from .cache import SolutionCache
+from .combinations import CAGE_PRUNING_COMBINATIONS
+from .loader import write_puzzles
+from .parallel import load_named_puzzles, solve_parallel, solve_puzzles
+from .solver import ENGINE_CLASSIC, ENGINE_DLX, ENGINE_ITERATIVE, ORDERING_ROWMAJOR, \
+    count_solutions, load_puzzles, print_board, solve
+from .stats import SolveProgress, SolveStats
+from .types import Board, Cages
+
+
+def print_stats(cage_pruning: str, ordering: str, stats: SolveStats) -> None:
+    """Print the stats of solving a puzzle.
+
+    :param cage_pruning: The kind of cage pruning used
+    :param ordering: The order the cells were filled out in
+    :param stats: The stats collected while solving the puzzle
+    """
+    print(f"Cage pruning: {cage_pruning}")
+    print(f"Ordering: {ordering}")
+    print(f"Cage sums validated: {stats.validations}")
+    print(f"Unique combinations tested: {stats.nodes}")
+    print(f"Backtracks: {stats.backtracks}")
+    print("Values pruned: " + ", ".join(f"{reason} {count}"
+                                        for reason, count in stats.pruned.items()))
+    print("Nodes per depth: " + " ".join(str(count) for count in stats.nodes_per_depth))
+    print(f"Propagation time: {stats.propagation_time:.4f}s, "
+          f"validation time: {stats.validation_time:.4f}s, "
+          f"encoding time: {stats.encoding_time:.4f}s, search time: {stats.search_time:.4f}s")
+
+
+def write_stats_json(filename: str, cage_pruning: str, ordering: str,
+                     results: list[tuple[str, SolveStats]]) -> None:
+    """Write the stats of solving a list of puzzles to a JSON-file.
+
+    :param filename: The name of the file to write
+    :param cage_pruning: The kind of cage pruning used
+    :param ordering: The order the cells were filled out in
+    :param results: The file name of each puzzle and the stats collected while solving it
+    """
+    with open(filename, "w") as file:
+        json.dump({"cage_pruning": cage_pruning, "ordering": ordering,
+                   "puzzles": [{"filename": puzzle, "stats": stats.to_dict()}
+                               for puzzle, stats in results]}, file, indent=2)
+
+
+def print_progress(progress: SolveProgress) -> None:
+    """Print the progress of a search to stderr, overwriting the line of the previous progress.
+
+    :param progress: The progress of the search so far
+    """
+    print(f"\rSearching: {progress.nodes} nodes, {progress.nodes_per_sec:.0f} nodes/sec, "
+          f"depth {progress.depth}, {progress.elapsed:.1f}s", end="", file=sys.stderr, flush=True)
+
+
+def load_puzzle_files(filenames: list[str],
+                      failed: list[str]) -> Iterator[tuple[str, Board, Cages]]:
+    """Load the puzzles of a list of files, skipping the files that can not be loaded.
+
+    A file that can not be read, or holds a puzzle that is not well formed, is reported on stderr
+    along with the reason, and added to the list of failed files.
+
+    :param filenames: The list of JSON, JSONL or binary files to load the puzzles from
+    :param failed: The list to add the file names of the files that could not be loaded to
+    :return: Returns an iterator of the name, board and cages of each puzzle, see
+             `load_named_puzzles`
+    """
+    for filename in filenames:
+        try:
+            puzzles = load_named_puzzles(filename)
+        except (OSError, ValueError) as error:
+            print(f"{filename}: {error}", file=sys.stderr)
+            failed.append(filename)
+            continue
+        yield from puzzles
+
+
+def run_solver(filenames: list[str], show_stats: bool = False, benchmark: bool = False,
+               show_initial_board: bool = False, engine: str = ENGINE_CLASSIC,
+               cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+               ordering: str = ORDERING_ROWMAJOR, jobs: int = 1, search_jobs: int = 1,
+               split_depth: int = 2, stats_json: str | None = None,
+               cache: SolutionCache | None = None, timeout: float | None = None,
+               show_progress: bool = False) -> int:
+    """Run the board solver for a list files.
+
+    Every puzzle of a JSONL or binary file is solved. Files that can not be loaded are reported on
+    stderr, and the remaining files are still solved.
+
+    :param filenames: The list of file names to load and solve
+    :param show_stats: Whether to show stats such as number of validations and unique combinations
+    :param benchmark: Will output the time it takes for one iteration
+    :param show_initial_board: Whetherh to show the board layout before solving it
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param jobs: The number of worker processes to solve the files with, not used when benchmarking
+    :param search_jobs: The number of worker processes to search each puzzle with
+    :param split_depth: The number of levels of the search tree to split, when searching in parallel
+    :param stats_json: The name of a file to write the stats of each puzzle to as JSON, if any
+    :param cache: The cache of solutions to use, if any, not used when benchmarking
+    :param timeout: The number of seconds the search of each puzzle may take, if limited
+    :param show_progress: Whether to show a line of progress on stderr while searching, only
+                          supported with a single job
+    :return: Returns the exit code, 1 if a file could not be loaded, otherwise 0
+    """
+    collect_stats = show_stats or stats_json is not None
+    progress = None
+    progress_shown = False
+    if show_progress:
+        def progress(report: SolveProgress) -> None:
+            nonlocal progress_shown
+            progress_shown = True
+            print_progress(report)
+
+    def end_progress() -> None:
+        # Move on from the line of progress, if a search was slow enough to show one
+        nonlocal progress_shown
+        if progress_shown:
+            print(file=sys.stderr)
+            progress_shown = False
+
+    collected = []
+    failed = []
+    if benchmark:
+        for filename, board, cages in load_puzzle_files(filenames, failed):
+            stats = SolveStats() if collect_stats else None
+            print(f"Using board and cages from {filename}")
+            if show_initial_board:
+                print_board(board, cages)
+
+            print("Benchmarking...")
+            # Imported here, since it is only used when benchmarking
+            import timeit
+            if search_jobs > 1:
+                benchmark_result = timeit.timeit(
+                    lambda b=board, c=cages: solve_parallel(b, c, search_jobs, split_depth, engine,
+                                                            cage_pruning, ordering, stats),
+                    number=1)
+            else:
+                benchmark_result = timeit.timeit(
+                    lambda b=board, c=cages: solve(b, c, engine, cage_pruning, ordering, stats,
+                                                   timeout=timeout, progress=progress),
+                    number=1)
+                end_progress()
+            print_board(board, cages)
+            print(f"Benchmarked solving {filename}: took: {benchmark_result} seconds")
+            if show_stats:
+                print_stats(cage_pruning, ordering, stats)
+            if stats is not None:
+                collected.append((filename, stats))
+        if stats_json is not None:
+            write_stats_json(stats_json, cage_pruning, ordering, collected)
+        return 1 if failed else 0
+
+    start = time.perf_counter()
+    times = []
+    solved = 0
+    for result in solve_puzzles(load_puzzle_files(filenames, failed), jobs, engine, cage_pruning,
+                                ordering, search_jobs, split_depth, collect_stats, cache, timeout,
+                                progress):
+        end_progress()
+        print(f"Using board and cages from {result.filename}")
+        if show_initial_board:
+            print_board(result.board, result.cages)
+
+        print("Calculating...")
+        if result.success:
+            solved += 1
+            print("SUCCESS")
+        elif result.stats is not None and result.stats.stopped is not None:
+            print(f"Stopped ({result.stats.stopped}) after {result.stats.nodes} nodes")
+        else:
+            print("Unable to find solution")
+        print_board(result.solution, result.cages)
+
+        if show_stats:
+            print_stats(cage_pruning, ordering, result.stats)
+        if collect_stats:
+            collected.append((result.filename, result.stats))
+        times.append(result.elapsed)
+    elapsed = time.perf_counter() - start
+    if stats_json is not None:
+        write_stats_json(stats_json, cage_pruning, ordering, collected)
+
+    if times and (jobs > 1 or len(times) > 1):
+        # Imported here, like the process pools, to keep the start-up of a single puzzle short
+        import statistics
+        print(f"Solved {solved} of {len(times)} puzzles in {elapsed:.3f} seconds "
+              f"({len(times) / elapsed:.2f} puzzles/sec) using {jobs} job(s)")
+        print(f"Time per puzzle: min {min(times):.4f}s, median {statistics.median(times):.4f}s, "
+              f"mean {statistics.mean(times):.4f}s, max {max(times):.4f}s")
+    # With more than one job, the worker processes count the hits and misses of their own caches
+    if show_stats and cache is not None and jobs <= 1:
+        print(f"Solution cache: {cache.hits} hits ({cache.disk_hits} from disk), "
+              f"{cache.misses} misses")
+    return 1 if failed else 0
+
+
+def run_counter(filenames: list[str], limit: int | None = None, unique: bool = False,
+                show_stats: bool = False, engine: str = ENGINE_CLASSIC,
+                cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                ordering: str = ORDERING_ROWMAJOR) -> int:
+    """Count the solutions of a list of files, or check whether each has a unique solution.
+
+    :param filenames: The list of file names to load and count the solutions of
+    :param limit: The number of solutions to stop counting at, or None to count every solution
+    :param unique: Whether to only check for a unique solution, which stops at 2 solutions
+    :param show_stats: Whether to show stats such as number of validations and unique combinations
+    :param engine: The solving engine to use, the DLX engine is used as is, and any other engine is
+                   replaced by the iterative engine
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :return: Returns the exit code, 1 if a file could not be loaded, or a puzzle does not have a
+             unique solution when checking for one, or has no solution when counting, otherwise 0
+    """
+    if unique:
+        limit = 2
+    if engine != ENGINE_DLX:
+        engine = ENGINE_ITERATIVE
+    failed = []
+    exit_code = 0
+    for filename, board, cages in load_puzzle_files(filenames, failed):
+        stats = SolveStats() if show_stats else None
+        print(f"Using board and cages from {filename}")
+        start = time.perf_counter()
+        count = count_solutions(board, cages, limit, cage_pruning, ordering, stats, engine)
+        elapsed = time.perf_counter() - start
+        if unique:
+            print("UNIQUE" if count == 1 else "NOT UNIQUE" if count else "NO SOLUTION")
+            if count != 1:
+                exit_code = 1
+        else:
+            at_limit = " (limit reached)" if count == limit else ""
+            print(f"Solutions: {count}{at_limit}")
+            if not count:
+                exit_code = 1
+        print(f"Took: {elapsed:.4f} seconds")
+        if show_stats:
+            print_stats(cage_pruning, ordering, stats)
+    return 1 if failed else exit_code
+
+
+def run_packer(output: str, filenames: list[str]) -> int:
+    """Pack the puzzles of a list of files into a single file of the compact binary format.
+
+    :param output: The file name to write the puzzles to
+    :param filenames: The list of JSON, JSONL or binary files to read the puzzles from
+    :return: Returns the exit code, 1 if a puzzle is not well formed, otherwise 0
+    """
+    start = time.perf_counter()
+    try:
+        with open(output, "wb") as file:
+            count = write_puzzles(file, (puzzle for filename in filenames
+                                         for puzzle in load_puzzles(filename)))
+    except ValueError as error:
+        print(f"Invalid puzzle: {error}")
+        return 1
+    print(f"Packed {count} puzzle(s) into {output} in {time.perf_counter() - start:.4f} seconds")
+    return 0
+
+
+def run_generator(count: int, output: str | None = None, size: int = 9, seed: int = 0,
+                  jobs: int = 1, cage_weights: dict[int, int] | None = None,
+                  merge_attempts: int | None = None) -> int:
+    """Generate puzzles with a unique solution, and write them as JSONL, one puzzle per line.
+
+    Each line holds the board and cages in the same format as the puzzle files, with the size for
+    boards of other sizes than 9x9, along with the difficulty, the nodes searched to solve it and
+    the seed it was generated from.
+
+    :param count: The number of puzzles to generate
+    :param output: The file name to write the puzzles to, or None to write them to stdout
+    :param size: The size of the boards
+    :param seed: The seed of the first puzzle, the puzzle n uses the seed plus n
+    :param jobs: The number of worker processes to generate the puzzles with
+    :param cage_weights: The relative weight of each number of cells of a cage
+    :param merge_attempts: The number of merges to try once the solution of a puzzle is unique,
+                           `DEFAULT_MERGE_ATTEMPTS` if not given
+    :return: Returns the exit code, 0
+    """
+    # Imported here, since only generating puzzles needs the generator
+    from .generator import DEFAULT_MERGE_ATTEMPTS, generate_puzzles
+    if merge_attempts is None:
+        merge_attempts = DEFAULT_MERGE_ATTEMPTS
+    start = time.perf_counter()
+    difficulties = {}
+    file = open(output, "w") if output is not None else sys.stdout
+    try:
+        for puzzle in generate_puzzles(count, size, seed, jobs, cage_weights, merge_attempts):
+            data = {"board": puzzle.board, "cages": puzzle.cages}
+            if size != 9:
+                data["size"] = size
+            data.update(difficulty=puzzle.difficulty, nodes=puzzle.nodes, seed=puzzle.seed)
+            file.write(json.dumps(data, separators=(",", ":")) + "\n")
+            file.flush()
+            difficulties[puzzle.difficulty] = difficulties.get(puzzle.difficulty, 0) + 1
+    finally:
+        if output is not None:
+            file.close()
+    if output is not None:
+        print(f"Generated {count} puzzle(s) into {output} in "
+              f"{time.perf_counter() - start:.4f} seconds: " +
+              ", ".join(f"{difficulty} {generated}"
+                        for difficulty, generated in difficulties.items()))
+    return 0
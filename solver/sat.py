@@ -0,0 +1,256 @@
+from .combinations import cage_combinations
+from .puzzle import PuzzleIndex
+from .stats import SolveStats
+
+# The SAT solvers that can be used, pycosat and pysat are only used if they are installed, and the
+# built-in DPLL solver is used otherwise
+SAT_BACKEND_PYCOSAT = "pycosat"
+SAT_BACKEND_PYSAT = "pysat"
+SAT_BACKEND_DPLL = "dpll"
+SAT_BACKENDS = (SAT_BACKEND_PYCOSAT, SAT_BACKEND_PYSAT, SAT_BACKEND_DPLL)
+
+
+def encode_cnf(candidates: list[int], index: PuzzleIndex) -> tuple[list[list[int]], int]:
+    """ Encode a puzzle as a boolean formula in conjunctive normal form.
+
+    A clause is a list of literals, at least one of which must be true. The literal of a variable is
+    its number, and the literal of its negation the negative number, as used by DIMACS. The clauses
+    say that:
+
+    * Every cell holds exactly one value.
+    * Every value is held by exactly one cell of each row, column and nonet.
+    * Every value is held by at most one cell of each cage.
+    * Every cage chooses one of the combinations of values adding up to its total, every value of
+      the combination is held by a cell of the cage, and no other values are.
+
+    Values that are not left in the candidates of a cell are ruled out by a clause of their own, and
+    combinations that can not be made from the candidates of a cage are left out. The variables
+    placing value v in a cell are numbered cell * size + v, and the variables choosing the
+    combination of a cage follow these.
+
+    :param candidates: The bitmask of the values still possible in each cell, numbered y * size + x
+    :param index: The index of the cages
+    :return: Returns the clauses and the number of variables
+    """
+    geometry = index.geometry
+    size = geometry.size
+    values = range(1, size + 1)
+    clauses = []
+    for cell in range(geometry.cell_count):
+        variables = [cell * size + value for value in values]
+        clauses.append(variables)
+        clauses.extend([-first, -second] for i, first in enumerate(variables)
+                       for second in variables[i + 1:])
+        clauses.extend([-cell * size - value] for value in values
+                       if not candidates[cell] & (1 << (value - 1)))
+
+    houses = list(geometry.houses)
+    for cells in houses:
+        for value in values:
+            clauses.append([cell * size + value for cell in cells])
+    for cells in houses + [cage.cells for cage in index.cages]:
+        for value in values:
+            clauses.extend([-first * size - value, -second * size - value]
+                           for i, first in enumerate(cells) for second in cells[i + 1:])
+
+    variable_count = geometry.cell_count * size
+    for cage in index.cages:
+        available = 0
+        for cell in cage.cells:
+            available |= candidates[cell]
+        chosen = []
+        for combination in cage_combinations(cage.total, len(cage.cells), size):
+            if combination & ~available:
+                continue
+            variable_count += 1
+            chosen.append(variable_count)
+            for value in values:
+                if combination & (1 << (value - 1)):
+                    clauses.append([-variable_count] + [cell * size + value for cell in cage.cells])
+                else:
+                    clauses.extend([-variable_count, -cell * size - value] for cell in cage.cells)
+        clauses.append(chosen)
+    return clauses, variable_count
+
+
+def find_sat_backend() -> str:
+    """ Find the SAT solver to use, the first of pycosat and pysat that is installed, or DPLL.
+
+    :return: Returns the backend, one of `SAT_BACKENDS`
+    """
+    try:
+        import pycosat  # noqa: F401
+        return SAT_BACKEND_PYCOSAT
+    except ImportError:
+        pass
+    try:
+        import pysat.solvers  # noqa: F401
+        return SAT_BACKEND_PYSAT
+    except ImportError:
+        pass
+    return SAT_BACKEND_DPLL
+
+
+def solve_cnf(clauses: list[list[int]], variable_count: int, backend: str | None = None,
+              stats: SolveStats | None = None) -> set[int] | None:
+    """ Find an assignment of the variables that satisfies every clause.
+
+    :param clauses: The clauses, see `encode_cnf`
+    :param variable_count: The number of variables, numbered 1 through variable_count
+    :param backend: The SAT solver to use, one of `SAT_BACKENDS`, or None to use the one found by
+                    `find_sat_backend`
+    :param stats: The stats to collect, if any, only the DPLL solver collects any
+    :return: Returns the variables that are true, or None if the clauses can not be satisfied
+    """
+    if backend is None:
+        backend = find_sat_backend()
+    if backend == SAT_BACKEND_PYCOSAT:
+        import pycosat
+        model = pycosat.solve(clauses)
+        if not isinstance(model, list):
+            return None
+    elif backend == SAT_BACKEND_PYSAT:
+        from pysat.solvers import Solver
+        with Solver(bootstrap_with=clauses) as sat_solver:
+            if not sat_solver.solve():
+                return None
+            model = sat_solver.get_model()
+    elif backend == SAT_BACKEND_DPLL:
+        model = dpll(clauses, variable_count, stats)
+        if model is None:
+            return None
+    else:
+        raise ValueError(f"Unknown SAT backend: {backend}")
+    return {literal for literal in model if literal > 0}
+
+
+def dpll(clauses: list[list[int]], variable_count: int,
+         stats: SolveStats | None = None) -> list[int] | None:
+    """ Find an assignment of the variables that satisfies every clause, using DPLL.
+
+    The search assigns a variable, propagates the unit clauses it leads to, and tries the opposite
+    value if that leads to a clause with every literal false. The unit clauses are found by
+    watching two literals of each clause that are not false, so a clause is only looked at when
+    one of its watched literals becomes false. The variable to assign next is the first unassigned
+    variable of the clause with the fewest unassigned literals, trying true first.
+
+    A node of the search is a variable being assigned, and a backtrack a clause found with every
+    literal false.
+
+    :param clauses: The clauses, see `encode_cnf`
+    :param variable_count: The number of variables, numbered 1 through variable_count
+    :param stats: The stats to collect, if any
+    :return: Returns the literals that are true, one for each variable, or None if the clauses can
+             not be satisfied
+    """
+    # Indexed by literal, the negative literals wrap around to the end of the lists
+    values = [0] * (2 * variable_count + 1)
+    watches = [[] for _ in range(2 * variable_count + 1)]
+    trail = []
+    units = []
+    long_clauses = []
+    short_clauses = []
+    for clause in clauses:
+        if not clause:
+            return None
+        if len(clause) == 1:
+            units.append(clause[0])
+            continue
+        clause = clause[:]
+        watches[clause[0]].append(clause)
+        watches[clause[1]].append(clause)
+        (long_clauses if len(clause) > 2 else short_clauses).append(clause)
+
+    def assign(literal: int) -> None:
+        values[literal] = 1
+        values[-literal] = -1
+        trail.append(literal)
+
+    def propagate(head: int) -> bool:
+        while head < len(trail):
+            false_literal = -trail[head]
+            head += 1
+            watching = watches[false_literal]
+            i = 0
+            while i < len(watching):
+                clause = watching[i]
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                other = clause[0]
+                if values[other] == 1:
+                    i += 1
+                    continue
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    if values[literal] != -1:
+                        clause[1], clause[k] = literal, false_literal
+                        watches[literal].append(clause)
+                        watching[i] = watching[-1]
+                        watching.pop()
+                        break
+                else:
+                    if values[other] == -1:
+                        return False
+                    assign(other)
+                    i += 1
+        return True
+
+    def choose() -> int:
+        best = 0
+        best_count = 0
+        for group in (long_clauses, short_clauses):
+            for clause in group:
+                count = 0
+                first = 0
+                for literal in clause:
+                    value = values[literal]
+                    if value == 1:
+                        break
+                    if value == 0:
+                        count += 1
+                        if not first:
+                            first = literal
+                else:
+                    if not best or count < best_count:
+                        best = first
+                        best_count = count
+            if best:
+                return best
+        return 0
+
+    for literal in units:
+        if values[literal] == -1:
+            return None
+        if values[literal] == 0:
+            assign(literal)
+    if not propagate(0):
+        return None
+
+    # The decisions made, as the length of the trail before each, its literal and whether the
+    # opposite value is being tried
+    decisions = []
+    while True:
+        literal = choose()
+        if not literal:
+            return [variable if values[variable] == 1 else -variable
+                    for variable in range(1, variable_count + 1)]
+        if stats is not None:
+            stats.node(len(decisions))
+        decisions.append((len(trail), literal, False))
+        head = len(trail)
+        assign(literal)
+        while not propagate(head):
+            if stats is not None:
+                stats.backtracks += 1
+            while decisions:
+                length, literal, flipped = decisions.pop()
+                for undone in trail[length:]:
+                    values[undone] = values[-undone] = 0
+                del trail[length:]
+                if not flipped:
+                    decisions.append((length, -literal, True))
+                    head = length
+                    assign(-literal)
+                    break
+            else:
+                return None
@@ -0,0 +1,95 @@
+import os
+import signal
+import sys
+from io import TextIOWrapper
+from typing import TextIO
+
+from .cache import SolutionCache
+from .combinations import CAGE_PRUNING_COMBINATIONS, cage_table, max_sum, min_sum
+from .solver import ENGINE_CLASSIC, ORDERING_ROWMAJOR
+from .stream import solve_stream, write_results
+
+
+def warm_up(cage_pruning: str = CAGE_PRUNING_COMBINATIONS, size: int = 9) -> None:
+    """ Build the cage tables of every total and number of cells of a board size up front.
+
+    The tables are otherwise built the first time a cage needs them, which makes the first puzzles
+    solved by a fresh process slower than the ones after.
+
+    :param cage_pruning: The kind of cage pruning to build the tables of
+    :param size: The size of the board
+    """
+    for field_count in range(1, size + 1):
+        for total in range(min_sum(field_count), max_sum(field_count, size) + 1):
+            cage_table(total, field_count, cage_pruning, size)
+
+
+def serve_lines(input_file: TextIO, output: TextIO, engine: str = ENGINE_CLASSIC,
+                cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                ordering: str = ORDERING_ROWMAJOR, cache: SolutionCache | None = None,
+                timeout: float | None = None) -> int:
+    """ Answer the puzzles read one per line as JSON with one result per line, see `solve_line`.
+
+    Each result is written as soon as its puzzle is solved, before the next line is read, so a
+    client can send a puzzle and wait for its result.
+
+    :param input_file: The stream to read the puzzles from
+    :param output: The stream to write the results to
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param cache: The cache of solutions to use, if any, which is kept between puzzles
+    :param timeout: The number of seconds the search of each puzzle may take, if limited
+    :return: Returns the number of puzzles that were not solved
+    """
+    return write_results(solve_stream(input_file, 1, engine, cage_pruning, ordering, cache,
+                                      timeout), output)
+
+
+def serve(socket_path: str | None = None, engine: str = ENGINE_CLASSIC,
+          cage_pruning: str = CAGE_PRUNING_COMBINATIONS, ordering: str = ORDERING_ROWMAJOR,
+          cache: SolutionCache | None = None, timeout: float | None = None) -> int:
+    """ Keep solving puzzles in a single process, paying for the start-up and warm-up once.
+
+    Without a socket path the puzzles are read from stdin and the results written to stdout, until
+    stdin is closed. With a socket path, a Unix socket is listened on, and every connection is
+    answered like stdin, one connection at a time, until interrupted or terminated. A file left at
+    the path by an earlier server is replaced, and the socket is removed again when the server
+    stops.
+
+    :param socket_path: The path of the Unix socket to listen on, or None to use stdin and stdout
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param cache: The cache of solutions to use, if any, which is shared by every connection
+    :param timeout: The number of seconds the search of each puzzle may take, if limited, so a
+                    single hard puzzle can not hold up the ones after it
+    :return: Returns the exit code, when reading from stdin 1 if a puzzle was not solved,
+             otherwise 0
+    """
+    warm_up(cage_pruning)
+    if socket_path is None:
+        return 1 if serve_lines(sys.stdin, sys.stdout, engine, cage_pruning, ordering, cache,
+                                timeout) else 0
+
+    # Imported here, since most runs never listen on a socket
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            output = TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+            serve_lines(TextIOWrapper(self.rfile, encoding="utf-8"), output, engine,
+                        cage_pruning, ordering, cache, timeout)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    # Stop the same way when terminated as when interrupted, so the socket is removed either way
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with socketserver.UnixStreamServer(socket_path, Handler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+    return 0
@@ -0,0 +1,206 @@
+from typing import Iterable
+
+from .combinations import combination_table
+from .loader import check_puzzle
+from .propagate import initial_candidates, reduce_candidates
+from .puzzle import Puzzle
+from .types import Board, Cages
+
+
+class SolverSession:
+    """ A puzzle being filled out one cell at a time, such as by a player asking for hints.
+
+    The index and propagation layout of the cages are built once, and the state of the board is
+    kept between calls and updated for each edit, so that neither checking the board nor asking for
+    a hint solves the puzzle again.
+
+    Each cell keeps the number of its peers holding the same value, and each cage whether its values
+    can still add up to its total, which are only updated for the peers and cage of an edited cell.
+    The candidates left by propagating the constraints of the filled out cells are kept as well.
+    Filling out a cell propagates from the candidates already found, while clearing a cell, which
+    can bring candidates back, has them propagated again from the board the next time a hint is
+    asked for.
+    """
+
+    __slots__ = ("puzzle", "_clashes", "_broken", "_conflicts", "_candidates", "_stale")
+
+    def __init__(self, cages: Cages, board: Board | None = None, size: int = 9) -> None:
+        """ Start a session of a puzzle, checking its layout first, see `check_puzzle`.
+
+        :param cages: The cages of the puzzle
+        :param board: The values already filled out, or None to start from an empty board
+        :param size: The size of the board, only used when no board is given
+        """
+        if board is None:
+            board = [[0] * size for _ in range(size)]
+        check_puzzle(board, cages)
+        self.puzzle = Puzzle.from_board(board, cages)
+        cell_count = len(self.puzzle.board)
+        self._clashes = [0] * cell_count
+        self._broken = [False] * len(self.puzzle.index.cages)
+        self._conflicts = set()
+        self._candidates = None
+        self._stale = True
+        board = self.puzzle.board
+        for cell, value in enumerate(board):
+            if value:
+                self._clashes[cell] = sum(board[peer] == value
+                                          for peer in self.puzzle.index.peers[cell])
+        for cage_index in range(len(self._broken)):
+            self._update_cage(cage_index)
+        self._update_conflicts(range(cell_count))
+
+    @property
+    def board(self) -> Board:
+        """ The board as filled out so far. """
+        return self.puzzle.to_board()
+
+    def set_cell(self, x: int, y: int, value: int) -> None:
+        """ Fill out the cell at coordinate (x, y), replacing any value it held.
+
+        The value is not required to fit the board, a value clashing with its peers or cage is
+        reported by `check`.
+
+        :param x: The zero indexed x coordinate
+        :param y: The zero indexed y coordinate
+        :param value: The value to fill out, or 0 to clear the cell
+        """
+        size = self.puzzle.index.geometry.size
+        if not (0 <= x < size and 0 <= y < size):
+            raise ValueError(f"Cell ({x}, {y}) is outside the board")
+        if not 0 <= value <= size:
+            raise ValueError(f"Cell ({x}, {y}) can not hold {value}, only 0 to {size}")
+        cell = y * size + x
+        board = self.puzzle.board
+        old = board[cell]
+        if old == value:
+            return
+        changed = [cell]
+        if old:
+            changed += self._remove_clashes(cell, old)
+        board[cell] = value
+        if value:
+            changed += self._add_clashes(cell, value)
+        cage_index = self.puzzle.index.cell_cage[cell]
+        if self._update_cage(cage_index):
+            changed += self.puzzle.index.cages[cage_index].cells
+        self._update_conflicts(changed)
+
+        if old or not value:
+            # Candidates removed because of the old value may be back, so propagate from scratch
+            self._stale = True
+        elif not self._stale and self._candidates is not None:
+            candidates = self._candidates
+            bit = 1 << (value - 1)
+            if candidates[cell] & bit:
+                candidates[cell] = bit
+                if not reduce_candidates(candidates, self.puzzle.index.layout, [cell]):
+                    self._candidates = None
+            else:
+                self._candidates = None
+
+    def clear_cell(self, x: int, y: int) -> None:
+        """ Clear the cell at coordinate (x, y), see `set_cell`.
+
+        :param x: The zero indexed x coordinate
+        :param y: The zero indexed y coordinate
+        """
+        self.set_cell(x, y, 0)
+
+    def check(self) -> list[tuple[int, int]]:
+        """ Find the cells in conflict, the ones sharing their value with a peer, and the filled out
+        cells of cages that can no longer add up to their total.
+
+        The conflicts are kept up to date by each edit, so checking only costs the number of cells
+        in conflict.
+
+        :return: Returns the coordinates (x, y) of the cells in conflict, in row-major order
+        """
+        size = self.puzzle.index.geometry.size
+        return [(cell % size, cell // size) for cell in sorted(self._conflicts)]
+
+    def hint(self) -> tuple[int, int, int] | None:
+        """ Find the next value forced by the cells filled out so far.
+
+        The constraints are propagated as by `propagate`, and the first empty cell in row-major
+        order left with a single candidate is the hint. The cells filled out are trusted, so a wrong
+        value may lead to a wrong hint, but never to a hint clashing with the board.
+
+        :return: Returns the coordinate and value (x, y, value) of the hint, or None if no empty
+                 cell is forced, or the board has a conflict or can not be completed
+        """
+        if self._conflicts:
+            return None
+        board = self.puzzle.board
+        if self._stale:
+            candidates = initial_candidates(self.board)
+            queue = [cell for cell, value in enumerate(board) if value]
+            valid = reduce_candidates(candidates, self.puzzle.index.layout, queue)
+            self._candidates = candidates if valid else None
+            self._stale = False
+        candidates = self._candidates
+        if candidates is None:
+            return None
+        size = self.puzzle.index.geometry.size
+        for cell, mask in enumerate(candidates):
+            if not board[cell] and not mask & (mask - 1):
+                return cell % size, cell // size, mask.bit_length()
+        return None
+
+    def _add_clashes(self, cell: int, value: int) -> list[int]:
+        """ Count the peers of a cell just given a value that hold the same value.
+
+        :return: Returns the peers that now clash with the cell
+        """
+        board = self.puzzle.board
+        clashes = self._clashes
+        peers = [peer for peer in self.puzzle.index.peers[cell] if board[peer] == value]
+        for peer in peers:
+            clashes[peer] += 1
+        clashes[cell] = len(peers)
+        return peers
+
+    def _remove_clashes(self, cell: int, value: int) -> list[int]:
+        """ Uncount the peers of a cell about to lose its value that hold the same value.
+
+        :return: Returns the peers that no longer clash with the cell
+        """
+        board = self.puzzle.board
+        clashes = self._clashes
+        peers = [peer for peer in self.puzzle.index.peers[cell] if board[peer] == value]
+        for peer in peers:
+            clashes[peer] -= 1
+        clashes[cell] = 0
+        return peers
+
+    def _update_cage(self, cage_index: int) -> bool:
+        """ Find whether the values of a cage can still add up to its total.
+
+        :return: Returns True if that changed since the cage was last updated
+        """
+        if cage_index < 0:
+            return False
+        cage = self.puzzle.index.cages[cage_index]
+        board = self.puzzle.board
+        values = [board[cell] for cell in cage.cells if board[cell]]
+        if len(values) == len(cage.cells):
+            broken = sum(values) != cage.total
+        else:
+            used = 0
+            for value in values:
+                used |= 1 << (value - 1)
+            size = self.puzzle.index.geometry.size
+            broken = not combination_table(cage.total, len(cage.cells), size)[used]
+        changed = broken != self._broken[cage_index]
+        self._broken[cage_index] = broken
+        return changed
+
+    def _update_conflicts(self, cells: Iterable[int]) -> None:
+        """ Update whether each of the cells is in conflict, after its clashes or cage changed. """
+        board = self.puzzle.board
+        cell_cage = self.puzzle.index.cell_cage
+        for cell in cells:
+            if self._clashes[cell] or board[cell] and self._broken[cell_cage[cell]]:
+                self._conflicts.add(cell)
+            else:
+                self._conflicts.discard(cell)
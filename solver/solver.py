@@ -1,12 +1,39 @@
 import json
-import timeit
-
-Cages = list[tuple[int, list[tuple[int, int]]]]
-Board = list[list[int]]
-MinMaxCache = list[list[tuple[int, int]]]
-
-validations_performed = 0
-combinations_tried = 0
+import time
+from array import array
+from threading import Event
+from typing import Callable, Iterable, Iterator
+
+from .cache import SolutionCache, canonicalize
+from .combinations import CAGE_PRUNING_COMBINATIONS, CAGE_PRUNING_MINMAX, CAGE_PRUNINGS, \
+    cage_table, max_sum, min_sum
+from .dlx import ExactCover, placements
+from .geometry import Geometry
+from .loader import PUZZLE_MAGIC, PuzzleError, check_puzzle, decode_puzzles
+from .propagate import TRAIL_CELL_BITS, PropagationLayout, initial_candidates, reduce_candidates, \
+    undo_trail
+from .puzzle import Puzzle, PuzzleIndex, board_snapshot, restore_board
+from .sat import encode_cnf, solve_cnf
+from .stats import PRUNE_CAGE_SUM, PRUNE_PROPAGATION, SearchBudget, SearchStopped, SolveProgress, \
+    SolveStats
+from .types import Board, Cages
+
+ENGINE_CLASSIC = "classic"
+ENGINE_BITMASK = "bitmask"
+ENGINE_PROPAGATE = "propagate"
+ENGINE_ITERATIVE = "iterative"
+ENGINE_DLX = "dlx"
+ENGINE_SAT = "sat"
+ENGINES = (ENGINE_CLASSIC, ENGINE_BITMASK, ENGINE_PROPAGATE, ENGINE_ITERATIVE, ENGINE_DLX,
+           ENGINE_SAT)
+
+ORDERING_ROWMAJOR = "rowmajor"
+ORDERING_MRV = "mrv"
+ORDERINGS = (ORDERING_ROWMAJOR, ORDERING_MRV)
+
+# If set, each solution found is validated in full, raising an AssertionError if it is not valid.
+# This is only meant for debugging, since the cage sums are validated as the cages are filled out
+debug_validation = False
 
 
 def find_cage_index(cages: Cages, x: int, y: int) -> int:
@@ -29,7 +56,8 @@ def find_cage_index(cages: Cages, x: int, y: int) -> int:
     raise AssertionError(f"Cage for coordinates ({x}, {y}) not found")
 
 
-def is_same_cage(cages: Cages, x1: int, y1: int, x2: int, y2: int) -> bool:
+def is_same_cage(cages: Cages, x1: int, y1: int, x2: int, y2: int,
+                 index: PuzzleIndex | None = None) -> bool:
     """Returns true if two coordinates belong to the same cage.
 
     If either set of coordinates are not found as a cage, an AssertionError is raised.
@@ -39,8 +67,11 @@ def is_same_cage(cages: Cages, x1: int, y1: int, x2: int, y2: int) -> bool:
     :param y1: The zero indexed y coordinate of the first cage
     :param x2: The zero indexed x coordinate of the second cage
     :param y2: The zero indexed y coordinate of the second cage
+    :param index: The index of the cages, used for the look up if given
     :return: Returns true if the cages are the same
     """
+    if index is not None:
+        return index.cage_index(x1, y1) == index.cage_index(x2, y2)
     return find_cage_index(cages, x1, y1) == find_cage_index(cages, x2, y2)
 
 
@@ -50,73 +81,84 @@ def print_board(board: Board, cages: Cages) -> None:
     :param board: The board to print
     :param cages: The list of cages to display on the board
     """
-    print("+" + "---+" * 9)
-    for y in range(9):
+    size = len(board)
+    index = PuzzleIndex.for_cages(cages, size)
+    # Boards larger than 9x9 have values of two digits
+    width = len(str(size))
+    print("+" + ("-" * (width + 2) + "+") * size)
+    for y in range(size):
         print("|", end="")
         sep_line = "|"
-        for x in range(9):
+        for x in range(size):
             value = board[y][x]
             end_char = "|"
-            if x < 8 and is_same_cage(cages, x, y, x + 1, y):
+            if x < size - 1 and is_same_cage(cages, x, y, x + 1, y, index):
                 end_char = " "
-            if y < 8 and is_same_cage(cages, x, y, x, y + 1):
-                sep_line += "   +"
+            if y < size - 1 and is_same_cage(cages, x, y, x, y + 1, index):
+                sep_line += " " * (width + 2) + "+"
             else:
-                sep_line += "---+"
-            print(f" {value if  value > 0 else ' '} {end_char}", end="")
+                sep_line += "-" * (width + 2) + "+"
+            print(f" {value if value > 0 else ' ':>{width}} {end_char}", end="")
         print()
         print(sep_line)
 
 
-def find_taken_value(board: Board, cages: Cages, cage_cache: Board,
-                     x: int, y: int) -> list[int]:
+def find_taken_value(board: Board, index: PuzzleIndex, x: int, y: int,
+                     cage_pruning: str = CAGE_PRUNING_MINMAX) -> list[int]:
     """Find values taken, that will not be available at the cell at coordinate (x, y).
 
+    The values in the row, column, nonet and cage of the cell are found through the peers of the
+    cell in the index. With the min/max cage pruning, values outside the bounds of the empty fields
+    of the cage are taken. With the combinations cage pruning, values not part of any combination
+    of values that completes the cage are taken, which is never fewer values.
+
     :param board: The board to search for taken values
-    :param cages: The cages to search for taken values but only the one including the coordinate
-    :param cage_cache: The lookup cache converting a coordinate to a cage
+    :param index: The index of the cages of the board
     :param x: The zero indexed x coordinate of the position to examine
     :param y: The zero indexed y coordinate of the position to examine
+    :param cage_pruning: Either `CAGE_PRUNING_MINMAX` or `CAGE_PRUNING_COMBINATIONS`
     :return: Returns a list of values that is already taken
     """
-    taken_values = []
-
-    # Values taken in the nonet
-    for ty in find_nonet_range(y):
-        for tx in find_nonet_range(x):
-            if board[ty][tx] > 0:
-                taken_values.append(board[ty][tx])
-
-    # Values taken in cage
-    total, fields = cages[cage_cache[y][x]]
-    field_count = len(fields)
-    for fx, fy in fields:
-        val = board[fy][fx]
-        if val > 0:
-            total -= val
-            field_count -= 1
-            taken_values.append(val)
-    # Calculate values that are too large to now fit in the cage, since we have subtracted the
-    # already taken values from the total, and reduced the field count this might reduce the number
-    # of possible values considerably
-    max_value = min(total - sum([i for i in range(1, 10)][:field_count - 1]), 9)
-    if max_value < 9:
-        taken_values.extend(range(max_value + 1, 10))
-    min_value = max(total - sum([i for i in range(9, 0, -1)][:field_count - 1]), 1)
-    if min_value > 1:
-        taken_values.extend(range(1, min(min_value, 10)))
-
-    # Find taken values in the column and row that the position is in
-    for pos in range(9):
-        if board[y][pos] > 0:
-            taken_values.append(board[y][pos])
-        if board[pos][x] > 0:
-            taken_values.append(board[pos][x])
+    size = len(board)
+    cell = y * size + x
+
+    # Values taken in the row, column, nonet and cage
+    taken_values = [board[peer // size][peer % size] for peer in index.peers[cell]
+                    if board[peer // size][peer % size] > 0]
+
+    cage_index = index.cell_cage[cell]
+    if cage_index < 0:
+        return taken_values
+    cage = index.cages[cage_index]
+    total, cells = cage.total, cage.cells
+    values = [board[field // size][field % size] for field in cells]
+    if cage_pruning == CAGE_PRUNING_COMBINATIONS:
+        # Look up the values left in the combinations containing the values already in the cage
+        used = 0
+        for val in values:
+            if val > 0:
+                used |= 1 << (val - 1)
+        available = cage_table(total, len(cells), cage_pruning, size)[used]
+        taken_values.extend(value for value in range(1, size + 1)
+                            if not available & (1 << (value - 1)))
+    else:
+        # Calculate values that are too large to now fit in the cage, since we have subtracted the
+        # already taken values from the total, and reduced the field count this might reduce the
+        # number of possible values considerably
+        total -= sum(values)
+        field_count = values.count(0)
+        max_value = min(total - min_sum(field_count - 1), size)
+        if max_value < size:
+            taken_values.extend(range(max_value + 1, size + 1))
+        min_value = max(total - max_sum(field_count - 1, size), 1)
+        if min_value > 1:
+            taken_values.extend(range(1, min(min_value, size + 1)))
 
     return taken_values
 
 
-def find_minmax_value(cages: Cages, x: int, y: int) -> tuple[int, int]:
+def find_minmax_value(cages: Cages, x: int, y: int, index: PuzzleIndex | None = None,
+                      size: int = 9) -> tuple[int, int]:
     """ Find minimum and maximum possible values for a cell on the board
 
     Since cages is a subset of fields that rarely contain all 9 numbers, it is possible to
@@ -124,37 +166,46 @@ def find_minmax_value(cages: Cages, x: int, y: int) -> tuple[int, int]:
     used here will consider the entire cage the same. This will help reduce the number of possible
     combinations enough that even the expert boards are solvable in due time.
 
-    This method is only run once, and since it is only run once, and the min/max cache is calculated
-    at the same time as the cage cache, we will look up the cage index for each cell.
+    The bounds of every cell are also kept in the `minmax_grid` of the `PuzzleIndex` of the cages,
+    which is what the solver uses.
 
     :param cages: The cages to evaluate
     :param x: The zero based index of the x coordinate
     :param y: The zero based index of the y coordinate
+    :param index: The index of the cages, used to look up the cage if given
+    :param size: The size of the board, the size of the index is used if given
     :return: Returns a tuple of the minimum and maximum possible values
     """
-    cage_index = find_cage_index(cages, x, y)
+    if index is not None:
+        cage_index = index.cage_index(x, y)
+        size = index.geometry.size
+    else:
+        cage_index = find_cage_index(cages, x, y)
     total, fields = cages[cage_index]
     field_count = len(fields)
-    min_val = max(total - sum([i for i in range(9, 0, -1)][:field_count - 1]), 1)
-    max_val = min(total - sum([i for i in range(1, 10)][:field_count - 1]), 9)
+    min_val = max(total - max_sum(field_count - 1, size), 1)
+    max_val = min(total - min_sum(field_count - 1), size)
     return min_val, max_val
 
 
-def find_nonet_range(coord: int) -> range:
+def find_nonet_range(coord: int, box_size: int = 3, size: int = 9) -> range:
     """ Find the range of a nonet along a single axis.
 
     The first 3 fields along an axis are equal to the nonet that resides in the range [0;3[. The
     next 3 equals the range [3;6[ and the final 3 equals [6:9[. Since this is the same for both axis
-    this method is called for a single axis at a time.
+    this method is called for a single axis at a time. On boards of other sizes, the boxes taking
+    the place of the nonets may have a different width and height, so the size of the box along the
+    axis is given. Coordinates past the board fall in the last box.
 
     :param coord: The zero-based coordinate along an axis
+    :param box_size: The size of the box along the axis
+    :param size: The size of the board
     :return: Returns the range used by the nonet along the specific axis
     """
-    if coord < 3:
-        return range(0, 3)
-    if coord < 6:
-        return range(3, 6)
-    return range(6, 9)
+    start = coord - coord % box_size
+    if start >= size:
+        start = size - box_size
+    return range(start, start + box_size)
 
 
 def find_next_cell(board: Board, x: int, y: int) -> tuple[int, int]:
@@ -174,12 +225,13 @@ def find_next_cell(board: Board, x: int, y: int) -> tuple[int, int]:
     """
     col = x
     row = y
+    last = len(board) - 1
     while True:
         col += 1
-        if col > 8:
+        if col > last:
             col = 0
             row += 1
-        if row > 8:
+        if row > last:
             return -1, -1
         if board[row][col] == 0:
             return col, row
@@ -195,9 +247,10 @@ def validate_rows(board: Board) -> bool:
     :param board: The board to validate
     :return: Returns a boolean True if no rows contain any duplicates
     """
-    for col in range(9):
+    size = len(board)
+    for col in range(size):
         row_set = set()
-        for row in range(9):
+        for row in range(size):
             value = board[row][col]
             if value != 0:
                 if value in row_set:
@@ -216,9 +269,9 @@ def validate_cols(board: Board) -> bool:
     :param board: The board to validate
     :return: Returns a boolean True if no columns contain any duplicates
     """
-    for row in range(9):
+    for row in board:
         col_set = set()
-        for value in board[row]:
+        for value in row:
             if value != 0:
                 if value in col_set:
                     return False
@@ -236,11 +289,13 @@ def validate_nonets(board: Board) -> bool:
     :param board: The board to validate
     :return: Returns a boolean True if no duplicates exist in any nonet
     """
-    for nonet_x in range(0, 9, 3):
-        range_x = find_nonet_range(nonet_x)
-        for nonet_y in range(0, 9, 3):
+    size = len(board)
+    geometry = Geometry.for_size(size)
+    for nonet_x in range(0, size, geometry.box_width):
+        range_x = find_nonet_range(nonet_x, geometry.box_width, size)
+        for nonet_y in range(0, size, geometry.box_height):
             nonet_set = set()
-            for y in find_nonet_range(nonet_y):
+            for y in find_nonet_range(nonet_y, geometry.box_height, size):
                 for x in range_x:
                     value = board[y][x]
                     if value != 0:
@@ -297,152 +352,1147 @@ def validate(board: Board, cages: Cages) -> bool:
     :param cages: The cages to validate
     :return: Returns a boolean True if the board is valid
     """
-    global validations_performed
-    validations_performed += 1
-
     return validate_cols(board) and validate_rows(board) and validate_nonets(board) and \
         validate_cages(board, cages)
 
 
-def fill_out_next(board: Board, cages: Cages, cage_cache: Board,
-                  minmax_cache: MinMaxCache, x: int, y: int) -> bool:
-    """ Fill out the next value on the board, and if all values are filled out validate the board.
+def validate_cage_sum(board: Board, cages: Cages, cage_index: int,
+                      stats: SolveStats | None = None) -> bool:
+    """ Validate the sum of a cage, if all of its fields are filled out.
+
+    This is the incremental counterpart of `validate_cages`, meant to be called when a value is
+    placed in the cage. Duplicates are not examined, since the search never places these.
+
+    :param board: The board to extract values from
+    :param cages: The cages of the board
+    :param cage_index: The index of the cage to validate
+    :param stats: The stats to count the validation in, if any
+    :return: Returns a boolean False if the cage is filled out and the values do not add up to the
+             cage total
+    """
+    total, fields = cages[cage_index]
+    for x, y in fields:
+        value = board[y][x]
+        if value == 0:
+            return True
+        total -= value
+
+    if stats is not None:
+        stats.validations += 1
+        if total != 0:
+            stats.pruned[PRUNE_CAGE_SUM] += 1
+    return total == 0
+
+
+def timed_validation(stats: SolveStats, validator: Callable[..., bool], *args) -> bool:
+    """ Call a cage sum validator, and add the time it took to the validation time of the stats.
+
+    :param stats: The stats to update, which are passed on to the validator as the last argument
+    :param validator: The validator to call
+    :param args: The arguments of the validator
+    :return: Returns the result of the validator
+    """
+    start = time.perf_counter()
+    valid = validator(*args, stats)
+    stats.validation_time += time.perf_counter() - start
+    return valid
+
+
+def _values_mask(values: Iterable[int]) -> int:
+    """ Convert values to a bitmask with bit v - 1 set for each value v, ignoring empty cells. """
+    mask = 0
+    for value in values:
+        if value > 0:
+            mask |= 1 << (value - 1)
+    return mask
+
+
+def debug_validate(board: Board, cages: Cages) -> None:
+    """ Validate a solution in full if `debug_validation` is set.
+
+    :param board: The solution to validate
+    :param cages: The cages of the board
+    """
+    if debug_validation and not validate(board, cages):
+        raise AssertionError("Solution found is not valid")
+
+
+def fill_out_next(board: Board, cages: Cages, index: PuzzleIndex, x: int, y: int,
+                  cage_pruning: str = CAGE_PRUNING_MINMAX, stats: SolveStats | None = None,
+                  depth: int = 0) -> bool:
+    """ Fill out the next value on the board, until all values are filled out.
 
     If the field at (x, y) is already filled out the method will raise an AssertionError.
 
     This method works by basically taking one value that is not already conflicting with an existing
     value in the row, column, nonet or cage of the coordinate. Apply the value and call itself
     recursively for the next cell, until all cells are filled out, at which point it back-tracks
-    and tries the next value available.
+    and tries the next value available. When a value fills out the last field of a cage, the sum of
+    the cage is validated right away, so no validation of the entire board is needed once all cells
+    are filled out.
 
     :param board: The board to fill out
     :param cages: The cages to respect
-    :param cage_cache: The look-up cage cache
-    :param minmax_cache: The min/max value limits to use for limiting search size
+    :param index: The index of the cages, with the min/max value limits limiting the search size
     :param x: The zero based x coordinate to fill out
     :param y: The zero based y coordinate to fill out
+    :param cage_pruning: The kind of cage pruning to pass on to `find_taken_value`
+    :param stats: The stats to collect, if any
+    :param depth: The number of cells filled out by the search before this one
     :return: Returns a boolean True if this board is valid, and False if it could never be in its
              current form
     """
     if board[y][x] != 0:
         raise AssertionError(f"Field ({x}, {y}) is not empty")
 
-    global combinations_tried
-    combinations_tried += 1
-
     next_x, next_y = find_next_cell(board, x, y)
-    taken_values = find_taken_value(board, cages, cage_cache, x, y)
+    taken_values = find_taken_value(board, index, x, y, cage_pruning)
 
     # If more than one value remains go through all values in the range min to max, and skip the
     # ones that are already taken, reserved (needed elsewhere), or out of reach (too high or low for
     # the cage). If only one value remains, then the taken values list will include all the values
     # that it cannot be, and only one iteration will be completed
-    min_value, max_value = minmax_cache[y][x]
+    min_value, max_value = index.minmax_grid[y][x]
+    cage_index = index.cage_grid[y][x]
+    if stats is not None:
+        size = len(board)
+        geometry = Geometry.for_size(size)
+        rows = find_nonet_range(y, geometry.box_height, size)
+        cols = find_nonet_range(x, geometry.box_width, size)
+        stats.node(depth)
+        stats.prune(_values_mask(board[y]), _values_mask(row[x] for row in board),
+                    _values_mask(board[ny][nx] for ny in rows for nx in cols),
+                    _values_mask(board[fy][fx] for fx, fy in cages[cage_index][1]),
+                    _values_mask(value for value in range(min_value, max_value + 1)
+                                 if value not in taken_values), geometry.all_values)
     for value in range(min_value, max_value + 1):
         if value not in taken_values:
             board[y][x] = value
+            if stats is None:
+                valid = validate_cage_sum(board, cages, cage_index)
+            else:
+                valid = timed_validation(stats, validate_cage_sum, board, cages, cage_index)
+            if not valid:
+                continue
             if next_x == -1:
-                success = validate(board, cages)
-                if not success:
-                    board[y][x] = 0
-                return success
-            if fill_out_next(board, cages, cage_cache, minmax_cache, next_x, next_y):
+                debug_validate(board, cages)
+                return True
+            if fill_out_next(board, cages, index, next_x, next_y, cage_pruning, stats, depth + 1):
                 return True
     board[y][x] = 0
+    if stats is not None:
+        stats.backtracks += 1
+    return False
+
+
+class CellMasks:
+    """ Bitmasks of the values already used in each row, column, nonet and cage.
+
+    Each mask has bit v - 1 set if the value v is used. Since the sum and count of the values in a
+    cage follow from its mask, the values still available in a cage are looked up in a table for
+    that cage, indexed by the mask, and built for the chosen kind of cage pruning. The masks are
+    updated in place by `assign` and `unassign` as the search moves forwards and backwards. Cells
+    are numbered y * size + x, as in the compact `Puzzle` representation. The row, column and
+    nonet of each cell, and the sum of each mask, are looked up in the tables of the geometry of
+    the puzzle, so the same masks work for boards of any size.
+    """
+
+    __slots__ = ("rows", "cols", "nonets", "cages", "cell_cage", "cage_tables", "cage_totals",
+                 "cage_sizes", "cell_rows", "cell_cols", "cell_nonets", "mask_sums", "all_values")
+
+    def __init__(self, puzzle: Puzzle, cage_pruning: str = CAGE_PRUNING_MINMAX) -> None:
+        geometry = puzzle.index.geometry
+        size = geometry.size
+        self.cell_rows = geometry.cell_rows
+        self.cell_cols = geometry.cell_cols
+        self.cell_nonets = geometry.cell_boxes
+        self.mask_sums = geometry.mask_sums
+        self.all_values = geometry.all_values
+        self.rows = [0] * size
+        self.cols = [0] * size
+        self.nonets = [0] * size
+        cages = puzzle.index.cages
+        self.cages = [0] * len(cages)
+        self.cell_cage = puzzle.index.cell_cage
+        self.cage_tables = [cage_table(cage.total, len(cage.cells), cage_pruning, size)
+                            for cage in cages]
+        self.cage_totals = [cage.total for cage in cages]
+        self.cage_sizes = [len(cage.cells) for cage in cages]
+        for cell, value in enumerate(puzzle.board):
+            if value > 0:
+                self.assign(cell, value)
+
+    def assign(self, cell: int, value: int) -> None:
+        """ Mark the value as used at the cell.
+
+        :param cell: The cell the value is placed at
+        :param value: The value placed at the cell
+        """
+        bit = 1 << (value - 1)
+        self.rows[self.cell_rows[cell]] |= bit
+        self.cols[self.cell_cols[cell]] |= bit
+        self.nonets[self.cell_nonets[cell]] |= bit
+        self.cages[self.cell_cage[cell]] |= bit
+
+    def unassign(self, cell: int, value: int) -> None:
+        """ Revert a previous call to `assign` for the same cell and value.
+
+        :param cell: The cell the value was placed at
+        :param value: The value that was placed at the cell
+        """
+        bit = ~(1 << (value - 1))
+        self.rows[self.cell_rows[cell]] &= bit
+        self.cols[self.cell_cols[cell]] &= bit
+        self.nonets[self.cell_nonets[cell]] &= bit
+        self.cages[self.cell_cage[cell]] &= bit
+
+    def validate_cage_sum(self, cell: int, value: int, stats: SolveStats | None = None) -> bool:
+        """ Validate the sum of the cage of the cell, if placing the value fills out its last field.
+
+        This is the bitmask equivalent of the `validate_cage_sum` function, and must be called
+        before the value is assigned.
+
+        :param cell: The cell the value is placed at
+        :param value: The value to place
+        :param stats: The stats to count the validation in, if any
+        :return: Returns a boolean False if the cage is filled out by the value, and the values do
+                 not add up to the cage total
+        """
+        cage_index = self.cell_cage[cell]
+        mask = self.cages[cage_index] | (1 << (value - 1))
+        if mask.bit_count() != self.cage_sizes[cage_index]:
+            return True
+
+        valid = self.mask_sums[mask] == self.cage_totals[cage_index]
+        if stats is not None:
+            stats.validations += 1
+            if not valid:
+                stats.pruned[PRUNE_CAGE_SUM] += 1
+        return valid
+
+    def candidates(self, cell: int) -> int:
+        """ Find the values that are still available at the cell as a bitmask.
+
+        This is the bitmask equivalent of `find_taken_value`, with the bits of the available values
+        set rather than a list of the taken ones.
+
+        :param cell: The cell to find the available values of
+        :return: Returns a bitmask of the values that can be placed at the cell
+        """
+        cage_index = self.cell_cage[cell]
+        available = self.cage_tables[cage_index][self.cages[cage_index]]
+        return available & ~(self.rows[self.cell_rows[cell]] | self.cols[self.cell_cols[cell]] |
+                             self.nonets[self.cell_nonets[cell]])
+
+    def record_node(self, cell: int, candidates: int, depth: int, stats: SolveStats) -> None:
+        """ Count a node of the search and the values pruned from its cell in the stats.
+
+        :param cell: The cell of the node
+        :param candidates: The values available at the cell, as returned by `candidates`
+        :param depth: The depth of the node
+        :param stats: The stats to update
+        """
+        stats.node(depth)
+        stats.prune(self.rows[self.cell_rows[cell]], self.cols[self.cell_cols[cell]],
+                    self.nonets[self.cell_nonets[cell]], self.cages[self.cell_cage[cell]],
+                    candidates, self.all_values)
+
+
+def fill_out_next_bitmask(puzzle: Puzzle, masks: CellMasks, cell: int,
+                          stats: SolveStats | None = None, depth: int = 0) -> bool:
+    """ Fill out the next value on the board using bitmasks to find the available values.
+
+    This works exactly like `fill_out_next`, and tries the values in the same order, but instead of
+    scanning the board for taken values on every call, the values used in each row, column, nonet
+    and cage are kept in `masks` and updated as values are placed and removed. The board is the
+    flat board of the compact `Puzzle` representation, where the next empty cell is simply the
+    next 0.
+
+    If the cell is already filled out the method will raise an AssertionError.
+
+    :param puzzle: The puzzle to fill out
+    :param masks: The masks of used values matching the current state of the board
+    :param cell: The cell to fill out, numbered y * size + x
+    :param stats: The stats to collect, if any
+    :param depth: The number of cells filled out by the search before this one
+    :return: Returns a boolean True if this board is valid, and False if it could never be in its
+             current form
+    """
+    board = puzzle.board
+    if board[cell] != 0:
+        raise AssertionError(f"Field ({masks.cell_cols[cell]}, {masks.cell_rows[cell]}) "
+                             "is not empty")
+
+    next_cell = board.find(0, cell + 1)
+    candidates = masks.candidates(cell)
+    if stats is not None:
+        masks.record_node(cell, candidates, depth, stats)
+
+    # Go through the set bits from the lowest to the highest value
+    while candidates:
+        bit = candidates & -candidates
+        candidates ^= bit
+        value = bit.bit_length()
+        if stats is None:
+            valid = masks.validate_cage_sum(cell, value)
+        else:
+            valid = timed_validation(stats, masks.validate_cage_sum, cell, value)
+        if not valid:
+            continue
+        board[cell] = value
+        if next_cell == -1:
+            debug_validate(puzzle.to_board(), puzzle.to_cages())
+            return True
+        masks.assign(cell, value)
+        if fill_out_next_bitmask(puzzle, masks, next_cell, stats, depth + 1):
+            return True
+        masks.unassign(cell, value)
+    board[cell] = 0
+    if stats is not None:
+        stats.backtracks += 1
+    return False
+
+
+class CandidateCounts:
+    """ The empty cells of the board, grouped by the number of candidates they have.
+
+    This is used to pick the most constrained empty cell to fill out next (minimum remaining
+    values). The empty cells are kept in a bucket for each number of candidates, so finding the
+    cell with the fewest candidates does not require looking at every cell. When a value is placed
+    or removed, only the candidates of the empty peers of the cell can change, so these are the only
+    ones that are counted again. Cells are numbered y * size + x.
+    """
+
+    __slots__ = ("counts", "buckets", "peers", "cage_sizes")
+
+    def __init__(self, puzzle: Puzzle, masks: CellMasks) -> None:
+        cages = puzzle.index.cages
+        self.cage_sizes = [len(cages[cage_index].cells) for cage_index in puzzle.index.cell_cage]
+        self.peers = puzzle.index.peers
+        geometry = puzzle.index.geometry
+        self.counts = [-1] * geometry.cell_count
+        self.buckets = [set() for _ in range(geometry.size + 1)]
+        for cell, value in enumerate(puzzle.board):
+            if value == 0:
+                self.add(cell, masks)
+
+    def add(self, cell: int, masks: CellMasks) -> None:
+        """ Add an empty cell to the bucket matching its number of candidates.
+
+        :param cell: The cell to add
+        :param masks: The masks of used values matching the current state of the board
+        """
+        count = masks.candidates(cell).bit_count()
+        self.counts[cell] = count
+        self.buckets[count].add(cell)
+
+    def remove(self, cell: int) -> None:
+        """ Remove a cell that is about to be filled out.
+
+        :param cell: The cell to remove
+        """
+        self.buckets[self.counts[cell]].discard(cell)
+        self.counts[cell] = -1
+
+    def update_peers(self, cell: int, masks: CellMasks) -> None:
+        """ Count the candidates of the empty peers of a cell again, after it was changed.
+
+        :param cell: The cell that had a value placed or removed
+        :param masks: The masks of used values matching the current state of the board
+        """
+        counts = self.counts
+        buckets = self.buckets
+        candidates = masks.candidates
+        for peer in self.peers[cell]:
+            old_count = counts[peer]
+            if old_count >= 0:
+                count = candidates(peer).bit_count()
+                if count != old_count:
+                    buckets[old_count].discard(peer)
+                    buckets[count].add(peer)
+                    counts[peer] = count
+
+    def best(self) -> int:
+        """ Find the empty cell with the fewest candidates.
+
+        Ties are broken by picking the cell in the smallest cage, and then the first cell in
+        row-major order, so the search is deterministic.
+
+        :return: Returns the cell, or -1 if no empty cells are left
+        """
+        cage_sizes = self.cage_sizes
+        for bucket in self.buckets:
+            if bucket:
+                return min(bucket, key=lambda cell: (cage_sizes[cell], cell))
+        return -1
+
+
+def fill_out_next_mrv(puzzle: Puzzle, masks: CellMasks, order: CandidateCounts, cell: int,
+                      stats: SolveStats | None = None, depth: int = 0) -> bool:
+    """ Fill out the next value on the board, choosing the most constrained cell to fill out next.
+
+    This works like `fill_out_next_bitmask`, but rather than continuing with the next empty cell in
+    row-major order, the search continues with the empty cell with the fewest candidates left. A
+    cell without any candidates is therefor found as soon as possible.
+
+    If the cell is already filled out the method will raise an AssertionError.
+
+    :param puzzle: The puzzle to fill out
+    :param masks: The masks of used values matching the current state of the board
+    :param order: The candidate counts of the empty cells, not including the one to fill out
+    :param cell: The cell to fill out, numbered y * size + x
+    :param stats: The stats to collect, if any
+    :param depth: The number of cells filled out by the search before this one
+    :return: Returns a boolean True if this board is valid, and False if it could never be in its
+             current form
+    """
+    board = puzzle.board
+    if board[cell] != 0:
+        raise AssertionError(f"Field ({masks.cell_cols[cell]}, {masks.cell_rows[cell]}) "
+                             "is not empty")
+
+    candidates = masks.candidates(cell)
+    if stats is not None:
+        masks.record_node(cell, candidates, depth, stats)
+    while candidates:
+        bit = candidates & -candidates
+        candidates ^= bit
+        value = bit.bit_length()
+        if stats is None:
+            valid = masks.validate_cage_sum(cell, value)
+        else:
+            valid = timed_validation(stats, masks.validate_cage_sum, cell, value)
+        if not valid:
+            continue
+        board[cell] = value
+        masks.assign(cell, value)
+        order.update_peers(cell, masks)
+        next_cell = order.best()
+        if next_cell == -1:
+            debug_validate(puzzle.to_board(), puzzle.to_cages())
+            return True
+        order.remove(next_cell)
+        if fill_out_next_mrv(puzzle, masks, order, next_cell, stats, depth + 1):
+            return True
+        order.add(next_cell, masks)
+        masks.unassign(cell, value)
+        order.update_peers(cell, masks)
+    board[cell] = 0
+    if stats is not None:
+        stats.backtracks += 1
+    return False
+
+
+def fill_out_iterative(puzzle: Puzzle, masks: CellMasks, cell: int,
+                       stats: SolveStats | None = None) -> bool:
+    """ Fill out the board using an explicit stack rather than recursion.
+
+    This finds the first solution of `fill_out_iterative_all`, and leaves it on the board.
+
+    If the cell is already filled out the method will raise an AssertionError.
+
+    :param puzzle: The puzzle to fill out
+    :param masks: The masks of used values matching the current state of the board
+    :param cell: The first empty cell, numbered y * size + x
+    :param stats: The stats to collect, if any
+    :return: Returns a boolean True if the board was filled out, and False if it could never be in
+             its current form
+    """
+    for _ in fill_out_iterative_all(puzzle, masks, cell, stats):
+        return True
     return False
 
 
-def solve(board: Board, cages: Cages) -> bool:
+def fill_out_iterative_all(puzzle: Puzzle, masks: CellMasks, cell: int,
+                           stats: SolveStats | None = None) -> Iterator[None]:
+    """ Fill out the board in every possible way, using an explicit stack rather than recursion.
+
+    This tries the same values in the same order as `fill_out_next_bitmask`, and counts the same
+    number of combinations, but without a function call for each cell. Since the cells are filled
+    out in row-major order, and the empty cells do not change while searching, the cell to fill out
+    at each depth is found once up front. The stack holds the candidates left to try and the value
+    placed at each depth, and the masks are updated in place when moving up and down the stack,
+    without going through the methods of `masks`. For the same reason the cage sums validated are
+    counted in the stats, but the time spent validating them is not measured.
+
+    Each time the board is filled out, the generator yields with the solution on the board, and
+    the search continues from there when the next solution is asked for. Once every solution has
+    been found, the empty cells are empty again. The board is not copied for each solution, so copy
+    it if the solution is needed after asking for the next one.
+
+    If the cell is already filled out the method will raise an AssertionError.
+
+    :param puzzle: The puzzle to fill out
+    :param masks: The masks of used values matching the current state of the board
+    :param cell: The first empty cell, numbered y * size + x
+    :param stats: The stats to collect, if any
+    :return: Returns an iterator yielding once for each solution
+    """
+    board = puzzle.board
+    if board[cell] != 0:
+        raise AssertionError(f"Field ({masks.cell_cols[cell]}, {masks.cell_rows[cell]}) "
+                             "is not empty")
+
+    cell_cage = puzzle.index.cell_cage
+    cell_rows, cell_cols, cell_nonets = masks.cell_rows, masks.cell_cols, masks.cell_nonets
+    cells = []
+    while cell != -1:
+        cells.append((cell, cell_rows[cell], cell_cols[cell], cell_nonets[cell], cell_cage[cell]))
+        cell = board.find(0, cell + 1)
+    last = len(cells) - 1
+    pending = [0] * len(cells)
+    values = [0] * len(cells)
+
+    rows, cols, nonets, cage_masks = masks.rows, masks.cols, masks.nonets, masks.cages
+    cage_tables, cage_totals, cage_sizes = masks.cage_tables, masks.cage_totals, masks.cage_sizes
+    mask_sums = masks.mask_sums
+    validations = 0
+    invalid = 0
+    cell, row, col, nonet, cage_index = cells[0]
+    pending[0] = cage_tables[cage_index][cage_masks[cage_index]] & \
+        ~(rows[row] | cols[col] | nonets[nonet])
+    if stats is not None:
+        masks.record_node(cell, pending[0], 0, stats)
+    depth = 0
+    while depth >= 0:
+        cell, row, col, nonet, cage_index = cells[depth]
+        value = values[depth]
+        if value:
+            # Back from the next depth, so undo the value placed here before trying the next one
+            bit = ~(1 << (value - 1))
+            rows[row] &= bit
+            cols[col] &= bit
+            nonets[nonet] &= bit
+            cage_masks[cage_index] &= bit
+            values[depth] = 0
+
+        candidates = pending[depth]
+        cage_mask = cage_masks[cage_index]
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            # Validate the sum of the cage, if this is its last field
+            mask = cage_mask | bit
+            if mask.bit_count() != cage_sizes[cage_index]:
+                break
+            validations += 1
+            if mask_sums[mask] == cage_totals[cage_index]:
+                break
+            invalid += 1
+        else:
+            board[cell] = 0
+            depth -= 1
+            if stats is not None:
+                stats.backtracks += 1
+            continue
+        pending[depth] = candidates
+
+        value = bit.bit_length()
+        board[cell] = value
+        if depth == last:
+            if stats is not None:
+                stats.validations += validations
+                stats.pruned[PRUNE_CAGE_SUM] += invalid
+                validations = invalid = 0
+            debug_validate(puzzle.to_board(), puzzle.to_cages())
+            yield
+            # The value is not placed in the masks at the last depth, so just try the next one
+            continue
+        rows[row] |= bit
+        cols[col] |= bit
+        nonets[nonet] |= bit
+        cage_masks[cage_index] |= bit
+        values[depth] = value
+        depth += 1
+
+        cell, row, col, nonet, cage_index = cells[depth]
+        pending[depth] = cage_tables[cage_index][cage_masks[cage_index]] & \
+            ~(rows[row] | cols[col] | nonets[nonet])
+        if stats is not None:
+            masks.record_node(cell, pending[depth], depth, stats)
+    if stats is not None:
+        stats.validations += validations
+        stats.pruned[PRUNE_CAGE_SUM] += invalid
+
+
+def fill_out_iterative_mrv(puzzle: Puzzle, masks: CellMasks, order: CandidateCounts,
+                           cell: int, stats: SolveStats | None = None) -> bool:
+    """ Fill out the board using an explicit stack, choosing the most constrained cell next.
+
+    This finds the first solution of `fill_out_iterative_mrv_all`, and leaves it on the board.
+
+    If the cell is already filled out the method will raise an AssertionError.
+
+    :param puzzle: The puzzle to fill out
+    :param masks: The masks of used values matching the current state of the board
+    :param order: The candidate counts of the empty cells, not including the first cell
+    :param cell: The first cell to fill out, numbered y * size + x
+    :param stats: The stats to collect, if any
+    :return: Returns a boolean True if the board was filled out, and False if it could never be in
+             its current form
+    """
+    for _ in fill_out_iterative_mrv_all(puzzle, masks, order, cell, stats):
+        return True
+    return False
+
+
+def fill_out_iterative_mrv_all(puzzle: Puzzle, masks: CellMasks, order: CandidateCounts,
+                               cell: int, stats: SolveStats | None = None) -> Iterator[None]:
+    """ Fill out the board in every possible way, choosing the most constrained cell next.
+
+    This is the explicit stack counterpart of `fill_out_next_mrv`, trying the same values in the
+    same order and counting the same number of combinations. Unlike the row-major search, the cell
+    to fill out at each depth is only known when reaching it, so it is kept on the stack as well.
+    Like `fill_out_iterative_all`, the generator yields with each solution on the board.
+
+    If the cell is already filled out the method will raise an AssertionError.
+
+    :param puzzle: The puzzle to fill out
+    :param masks: The masks of used values matching the current state of the board
+    :param order: The candidate counts of the empty cells, not including the first cell
+    :param cell: The first cell to fill out, numbered y * size + x
+    :param stats: The stats to collect, if any
+    :return: Returns an iterator yielding once for each solution
+    """
+    board = puzzle.board
+    if board[cell] != 0:
+        raise AssertionError(f"Field ({masks.cell_cols[cell]}, {masks.cell_rows[cell]}) "
+                             "is not empty")
+
+    # One more than the number of cells, since the first cell is not counted in the order
+    depths = puzzle.index.geometry.cell_count + 1
+    cells = [0] * depths
+    pending = [0] * depths
+    values = [0] * depths
+
+    cells[0] = cell
+    pending[0] = masks.candidates(cell)
+    if stats is not None:
+        masks.record_node(cell, pending[0], 0, stats)
+    depth = 0
+    while depth >= 0:
+        cell = cells[depth]
+        value = values[depth]
+        if value:
+            # Back from the next depth, so the cell filled out there is empty again
+            order.add(cells[depth + 1], masks)
+            masks.unassign(cell, value)
+            order.update_peers(cell, masks)
+            values[depth] = 0
+
+        candidates = pending[depth]
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            value = bit.bit_length()
+            if stats is None:
+                if masks.validate_cage_sum(cell, value):
+                    break
+            elif timed_validation(stats, masks.validate_cage_sum, cell, value):
+                break
+        else:
+            board[cell] = 0
+            depth -= 1
+            if stats is not None:
+                stats.backtracks += 1
+            continue
+        pending[depth] = candidates
+
+        board[cell] = value
+        masks.assign(cell, value)
+        order.update_peers(cell, masks)
+        next_cell = order.best()
+        if next_cell == -1:
+            debug_validate(puzzle.to_board(), puzzle.to_cages())
+            yield
+            # Take the value back out of the masks, and try the next one
+            masks.unassign(cell, value)
+            order.update_peers(cell, masks)
+            continue
+        order.remove(next_cell)
+        values[depth] = value
+        depth += 1
+
+        cells[depth] = next_cell
+        pending[depth] = masks.candidates(next_cell)
+        if stats is not None:
+            masks.record_node(next_cell, pending[depth], depth, stats)
+
+
+def fill_out_next_propagate(candidates: list[int], layout: PropagationLayout,
+                            ordering: str = ORDERING_ROWMAJOR, stats: SolveStats | None = None,
+                            depth: int = 0, trail: array | None = None) -> list[int] | None:
+    """ Fill out the next cell with more than one candidate, and propagate the constraints.
+
+    Rather than filling out every cell in turn, each value placed is propagated to the rest of the
+    puzzle, removing it from the candidates of its peers and so on, as done by `propagate`. Cells
+    left with a single candidate are never searched, and a contradiction is found as soon as the
+    value causing it is placed. The candidates are updated in place, and every change is recorded
+    on a trail shared by the whole search, so the changes of a value that did not lead to a
+    solution are rolled back with `undo_trail` before the next value is tried, rather than each
+    value working on a copy of the candidates. Once the search is done the candidates are left as
+    they were passed, unless a solution was found. With the MRV ordering, the cell with the fewest
+    candidates is found by looking through them.
+
+    :param candidates: The list of bitmasks of candidate values of each cell, in row-major order
+    :param layout: The propagation layout of the cages
+    :param ordering: Either `ORDERING_ROWMAJOR` or `ORDERING_MRV`
+    :param stats: The stats to collect, if any. Values leading to a contradiction are counted as
+                  pruned by propagation, and the time spent propagating them as propagation time
+    :param depth: The number of cells filled out by the search before this one
+    :param trail: The trail of changes of the search, None to start a new one
+    :return: Returns the candidates with a single candidate for every cell, or None if the
+             candidates can not lead to a solution
+    """
+    if stats is not None:
+        stats.node(depth)
+
+    if ordering == ORDERING_MRV:
+        cell = -1
+        fewest = layout.all_values.bit_length() + 1
+        for index, mask in enumerate(candidates):
+            count = mask.bit_count()
+            if 1 < count < fewest:
+                cell = index
+                fewest = count
+        if cell == -1:
+            return candidates
+        mask = candidates[cell]
+    else:
+        for cell, mask in enumerate(candidates):
+            if mask & (mask - 1):
+                break
+        else:
+            return candidates
+
+    if trail is None:
+        trail = array("L")
+    mark = len(trail)
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        trail.append(candidates[cell] << TRAIL_CELL_BITS | cell)
+        candidates[cell] = bit
+        if stats is None:
+            consistent = reduce_candidates(candidates, layout, [cell], trail)
+        else:
+            start = time.perf_counter()
+            consistent = reduce_candidates(candidates, layout, [cell], trail)
+            stats.propagation_time += time.perf_counter() - start
+            if not consistent:
+                stats.pruned[PRUNE_PROPAGATION] += 1
+        if consistent:
+            result = fill_out_next_propagate(candidates, layout, ordering, stats, depth + 1, trail)
+            if result is not None:
+                return result
+        undo_trail(candidates, trail, mark)
+    if stats is not None:
+        stats.backtracks += 1
+    return None
+
+
+def solve(board: Board, cages: Cages, engine: str = ENGINE_CLASSIC,
+          cage_pruning: str = CAGE_PRUNING_COMBINATIONS, ordering: str = ORDERING_ROWMAJOR,
+          stats: SolveStats | None = None, cache: SolutionCache | None = None,
+          timeout: float | None = None, max_nodes: int | None = None,
+          cancel_event: Event | None = None,
+          progress: Callable[[SolveProgress], None] | None = None) -> bool:
     """ Solve Sudoku from board and cages
 
     The method will return a boolean true if the board was solved, or false if it for some reason
     was not possible to solve it. The board parameter will be updated to reflect the solution, when
     the function exits.
 
+    Before searching, the constraints of the puzzle are propagated, filling out every cell that can
+    only hold a single value. The classic and bitmask engines then try the same values in the same
+    order. The classic engine finds the taken values by scanning the board for each cell, while the
+    bitmask engine keeps masks of the used values that are updated as the search progresses. The
+    propagate engine instead propagates the constraints again after each value is placed. The
+    iterative engine works like the bitmask engine, but with an explicit stack rather than
+    recursion. The DLX engine encodes the puzzle as an exact cover problem, see `ExactCover`, and
+    always fills out the most constrained cell, value or cage combination next, so it does not use
+    the ordering or the cage pruning. The SAT engine encodes the puzzle as a boolean formula, see
+    `encode_cnf`, and solves it with pycosat or pysat if either is installed, or with the built-in
+    DPLL solver otherwise. It does not use the ordering or the cage pruning either, and the
+    solution it finds is validated in full.
+
+    The cells are filled out in row-major order by default. With the MRV (minimum remaining values)
+    ordering, the empty cell with the fewest candidates is filled out next instead, which is only
+    supported by the bitmask, propagate and iterative engines.
+
+    The values of a cell are limited by the values available in its cage. With the min/max cage
+    pruning the values must be within the bounds of the cage, with the combinations cage pruning
+    the values must be part of a combination of distinct values that adds up to the cage total.
+
+    If stats are given, the nodes searched, the values pruned and the time spent propagating,
+    validating and searching are added to them. The search time includes the time spent validating
+    and, for the propagate engine, propagating while searching. For the SAT engine the time spent
+    encoding the puzzle is also counted on its own, and the search time includes it.
+
+    If a cache is given, the puzzle is looked up in it before solving, also when it is only the same
+    as a puzzle already solved up to a symmetry, and the solution found is stored in it. Neither
+    the stats nor the engine are used for puzzles found in the cache.
+
+    The search can be limited by a timeout, a number of nodes, or an event set from another thread,
+    and its progress reported to a callback, see `SearchBudget`. The budget is checked at each node
+    the stats count, so stats are collected whenever a limit or callback is given. Once a limit is
+    hit, False is returned with the board holding the givens and the cells found by propagating the
+    constraints, and the reason is held by `stats.stopped`. A stopped search is not cached. The SAT
+    engine can only be stopped when it uses the built-in DPLL solver.
+
     :param board: The initial board to use
     :param cages: The cages of that board
+    :param engine: The engine to use, either `ENGINE_CLASSIC`, `ENGINE_BITMASK`,
+                   `ENGINE_PROPAGATE`, `ENGINE_ITERATIVE`, `ENGINE_DLX` or `ENGINE_SAT`
+    :param cage_pruning: Either `CAGE_PRUNING_MINMAX` or `CAGE_PRUNING_COMBINATIONS`
+    :param ordering: Either `ORDERING_ROWMAJOR` or `ORDERING_MRV`
+    :param stats: The stats to collect, if any
+    :param cache: The cache of solutions to use, if any
+    :param timeout: The number of seconds the search may take, if limited
+    :param max_nodes: The number of nodes the search may visit, if limited
+    :param cancel_event: An event that stops the search once set, if any
+    :param progress: The function to report the progress of the search to, if any
     :return: Returns a boolean true if the Sudoku could be resolved
     """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    if cage_pruning not in CAGE_PRUNINGS:
+        raise ValueError(f"Unknown cage pruning: {cage_pruning}")
+    if ordering not in ORDERINGS:
+        raise ValueError(f"Unknown ordering: {ordering}")
+    if ordering == ORDERING_MRV and engine == ENGINE_CLASSIC:
+        raise ValueError("The MRV ordering is not supported by the classic engine")
+
+    if cache is not None:
+        canonical = canonicalize(board, cages)
+        found, solution = cache.get(board, cages, canonical)
+        if found:
+            if solution is not None:
+                for y, row in enumerate(solution):
+                    board[y][:] = row
+            return solution is not None
+        if stats is None and (timeout, max_nodes, cancel_event, progress) != (None,) * 4:
+            stats = SolveStats()
+        success = solve(board, cages, engine, cage_pruning, ordering, stats, None, timeout,
+                        max_nodes, cancel_event, progress)
+        if stats is None or stats.stopped is None:
+            cache.put(board, cages, board if success else None, canonical)
+        return success
+
+    budget = None
+    if (timeout, max_nodes, cancel_event, progress) != (None,) * 4:
+        budget = SearchBudget(timeout, max_nodes, cancel_event, progress)
+        if stats is None:
+            stats = SolveStats()
+        stats.stopped = None
+
+    # Propagate the constraints before searching, any cell left with a single candidate is known
+    # and can be filled out, which gives us a smaller search range
+    index = PuzzleIndex.for_cages(cages, len(board))
+    start = time.perf_counter() if stats is not None else 0.0
+    candidates = initial_candidates(board)
+    queue = [cell for cell, mask in enumerate(candidates) if not mask & (mask - 1)]
+    consistent = reduce_candidates(candidates, index.layout, queue)
+    if stats is None:
+        return consistent and search_candidates(board, cages, index, candidates, engine,
+                                                cage_pruning, ordering)
+
+    stats.propagation_time += time.perf_counter() - start
+    if not consistent:
+        return False
+    start = time.perf_counter()
+    if budget is None:
+        success = search_candidates(board, cages, index, candidates, engine, cage_pruning,
+                                    ordering, stats)
+    else:
+        # The search fills out the board as it goes, so keep what is known to restore if stopped
+        known = bytes(mask.bit_length() if not mask & (mask - 1) else 0 for mask in candidates)
+        stats.budget = budget
+        try:
+            success = search_candidates(board, cages, index, candidates, engine, cage_pruning,
+                                        ordering, stats)
+        except SearchStopped as stopped:
+            stats.stopped = stopped.reason
+            restore_board(board, known)
+            success = False
+        finally:
+            stats.budget = None
+    stats.search_time += time.perf_counter() - start
+    return success
+
+
+def search_candidates(board: Board, cages: Cages, index: PuzzleIndex, candidates: list[int],
+                      engine: str, cage_pruning: str, ordering: str,
+                      stats: SolveStats | None = None) -> bool:
+    """ Search for a solution with the engine, once the constraints have been propagated.
+
+    This is the search of `solve`, after the propagation, which is also used by `solve_batch` once
+    the constraints of a whole batch of puzzles are propagated. Every cell with a single candidate
+    is filled out before searching.
+
+    :param board: The initial board to use, which is updated to the solution
+    :param cages: The cages of that board
+    :param index: The index of the cages
+    :param candidates: The candidates left by propagating the constraints, in row-major order
+    :param engine: The engine to use, see `solve`
+    :param cage_pruning: Either `CAGE_PRUNING_MINMAX` or `CAGE_PRUNING_COMBINATIONS`
+    :param ordering: Either `ORDERING_ROWMAJOR` or `ORDERING_MRV`
+    :param stats: The stats to collect, if any
+    :return: Returns a boolean true if the Sudoku could be resolved
+    """
+    if engine == ENGINE_PROPAGATE:
+        candidates = fill_out_next_propagate(candidates, index.layout, ordering, stats)
+        if candidates is None:
+            return False
 
-    # Create look-up caches to speed up the process of finding cages and limiting the possible
-    # values of each cell.
-    cage_cache = []
-    minmax_cache = []
-    for y in range(9):
-        cage_row = []
-        minmax_row = []
-        for x in range(9):
-            cage_row.append(find_cage_index(cages, x, y))
-            minmax_row.append(find_minmax_value(cages, x, y))
-        cage_cache.append(cage_row)
-        minmax_cache.append(minmax_row)
-
-    # Fill out single cages, we start by doing this, since these are easy to isolate, and will
-    # give us a smaller search range
-    for total, fields in cages:
-        if len(fields) == 1:
-            x, y = fields[0]
-            board[y][x] = total
+    size = len(board)
+    for cell, mask in enumerate(candidates):
+        if not mask & (mask - 1):
+            board[cell // size][cell % size] = mask.bit_length()
 
     # The fill out next method expects the field to be empty, so ensure that the field we start with
     # are actually empty.
     next_x, next_y = 0, 0
-    if board[next_x][next_y] != 0:
+    if board[next_y][next_x] != 0:
         next_x, next_y = find_next_cell(board, next_x, next_y)
+    if next_x == -1:
+        debug_validate(board, cages)
+        return True
+
+    if engine == ENGINE_DLX:
+        for solution in ExactCover(candidates, index).solutions(stats):
+            write_placements(board, solution)
+            debug_validate(board, cages)
+            return True
+        return False
+
+    if engine == ENGINE_SAT:
+        start = time.perf_counter() if stats is not None else 0.0
+        clauses, variable_count = encode_cnf(candidates, index)
+        if stats is not None:
+            stats.encoding_time += time.perf_counter() - start
+        model = solve_cnf(clauses, variable_count, stats=stats)
+        if model is None:
+            return False
+        for cell in range(len(candidates)):
+            for value in range(1, size + 1):
+                if cell * size + value in model:
+                    board[cell // size][cell % size] = value
+        # The solution comes from outside of the solver, so it is always validated in full
+        if any(0 in row for row in board) or not validate(board, cages):
+            raise AssertionError("Solution found by the SAT solver is not valid")
+        return True
+
+    if engine in (ENGINE_BITMASK, ENGINE_ITERATIVE):
+        # These engines work on the compact representation, and the solution is copied back
+        puzzle = Puzzle(bytearray(value for row in board for value in row), index)
+        masks = CellMasks(puzzle, cage_pruning)
+        if ordering == ORDERING_MRV:
+            order = CandidateCounts(puzzle, masks)
+            next_cell = order.best()
+            order.remove(next_cell)
+            if engine == ENGINE_ITERATIVE:
+                success = fill_out_iterative_mrv(puzzle, masks, order, next_cell, stats)
+            else:
+                success = fill_out_next_mrv(puzzle, masks, order, next_cell, stats)
+        elif engine == ENGINE_ITERATIVE:
+            success = fill_out_iterative(puzzle, masks, next_y * size + next_x, stats)
+        else:
+            success = fill_out_next_bitmask(puzzle, masks, next_y * size + next_x, stats)
+        puzzle.write_to(board)
+        return success
 
-    return fill_out_next(board, cages, cage_cache, minmax_cache, next_x, next_y)
+    # The index holds the look-up caches of the cage and the possible values of each cell
+    return fill_out_next(board, cages, index, next_x, next_y, cage_pruning, stats)
 
 
-def load_from_file(filename: str) -> tuple[Board, Cages]:
-    """ Loads board and cage data from a JSON file.
+def solve_all(board: Board, cages: Cages, limit: int | None = None,
+              cage_pruning: str = CAGE_PRUNING_COMBINATIONS, ordering: str = ORDERING_MRV,
+              stats: SolveStats | None = None, engine: str = ENGINE_ITERATIVE,
+              index: PuzzleIndex | None = None) -> Iterator[Board]:
+    """ Find every solution of a Sudoku from board and cages.
 
-    :param filename: The name of the file to load the board and cage data from
-    :return: Returns a tuple of board and cages from the file
+    The constraints are propagated once before searching, like `solve` does, which never rules out
+    a solution, and the search then continues past each solution found, using either the iterative
+    or the DLX engine. The search stops as soon as the limit is reached, so a limit of 2 is enough
+    to tell whether a puzzle has a unique solution.
+
+    Each solution is written to the board given, and the same board is yielded every time rather
+    than a copy, so copy it if the solution is needed after asking for the next one. Once every
+    solution has been found, the board is reset to the values it was given with. If the search
+    stops at the limit, the board holds the last solution found.
+
+    :param board: The initial board to use
+    :param cages: The cages of that board
+    :param limit: The number of solutions to stop at, or None to find every solution
+    :param cage_pruning: Either `CAGE_PRUNING_MINMAX` or `CAGE_PRUNING_COMBINATIONS`, not used by
+                         the DLX engine
+    :param ordering: Either `ORDERING_ROWMAJOR` or `ORDERING_MRV`, not used by the DLX engine
+    :param stats: The stats to collect, if any
+    :param engine: Either `ENGINE_ITERATIVE` or `ENGINE_DLX`
+    :param index: The index of the cages, if already built, otherwise the index is found by
+                  `PuzzleIndex.for_cages`
+    :return: Returns an iterator of the solutions
     """
-    with open(filename) as board_file:
-        data = json.load(board_file)
-
-        # Convert cages from basic JSON to useful tuples
-        cages = []
-        for total, fields in data["cages"]:
-            tuples = []
-            for x, y in fields:
-                tuples.append((x, y))
-            cages.append((total, tuples))
-        return data["board"], cages
-
-
-def run_solver(filenames: list[str], show_stats: bool = False, benchmark: bool = False,
-               show_initial_board: bool = False) -> None:
-    """Run the board solver for a list files.
-
-    :param filenames: The list of file names to load and solve
-    :param show_stats: Whether to show stats such as number of validations and unique combinations
-    :param benchmark: Will output the time it takes for one iteration
-    :param show_initial_board: Whetherh to show the board layout before solving it
-    """
-    for filename in filenames:
-        global validations_performed, combinations_tried
-        validations_performed, combinations_tried = 0, 0
-        board, cages = load_from_file(filename=filename)
-        print(f"Using board and cages from {filename}")
-        if show_initial_board:
-            print_board(board, cages)
-
-        if benchmark:
-            print("Benchmarking...")
-            benchmark_result = timeit.timeit(lambda b=board, c=cages: solve(b, c), number=1)
-            print_board(board, cages)
-            print(f"Benchmarked solving {filename}: took: {benchmark_result} seconds")
+    if engine not in (ENGINE_ITERATIVE, ENGINE_DLX):
+        raise ValueError(f"Finding every solution is not supported by the {engine} engine")
+    if cage_pruning not in CAGE_PRUNINGS:
+        raise ValueError(f"Unknown cage pruning: {cage_pruning}")
+    if ordering not in ORDERINGS:
+        raise ValueError(f"Unknown ordering: {ordering}")
+    if limit is not None and limit < 1:
+        raise ValueError("The limit must be at least 1")
+
+    if index is None:
+        index = PuzzleIndex.for_cages(cages, len(board))
+    givens = board_snapshot(board)
+    start = time.perf_counter() if stats is not None else 0.0
+    candidates = initial_candidates(board)
+    queue = [cell for cell, mask in enumerate(candidates) if not mask & (mask - 1)]
+    consistent = reduce_candidates(candidates, index.layout, queue)
+    if stats is not None:
+        stats.propagation_time += time.perf_counter() - start
+    if not consistent:
+        return
+
+    # Each step of the solutions writes the next solution to the board
+    if engine == ENGINE_DLX:
+        cover = ExactCover(candidates, index)
+        solutions = (write_placements(board, solution) for solution in cover.solutions(stats))
+    else:
+        puzzle = Puzzle(bytearray(mask.bit_length() if not mask & (mask - 1) else 0
+                                  for mask in candidates), index)
+        cell = puzzle.board.find(0)
+        if cell == -1:
+            # Propagating solved the puzzle, which is then the only solution
+            debug_validate(puzzle.to_board(), cages)
+            found = [puzzle]
         else:
-            print("Calculating...")
-            success = solve(board, cages)
-            if success:
-                print("SUCCESS")
+            masks = CellMasks(puzzle, cage_pruning)
+            if ordering == ORDERING_MRV:
+                order = CandidateCounts(puzzle, masks)
+                cell = order.best()
+                order.remove(cell)
+                found = fill_out_iterative_mrv_all(puzzle, masks, order, cell, stats)
             else:
-                print("Unable to find solution")
-            print_board(board, cages)
+                found = fill_out_iterative_all(puzzle, masks, cell, stats)
+        solutions = (puzzle.write_to(board) for _ in found)
+
+    count = 0
+    start = time.perf_counter() if stats is not None else 0.0
+    for _ in solutions:
+        if stats is not None:
+            stats.search_time += time.perf_counter() - start
+        yield board
+        count += 1
+        if count == limit:
+            return
+        if stats is not None:
+            start = time.perf_counter()
+    if stats is not None:
+        stats.search_time += time.perf_counter() - start
+    restore_board(board, givens)
+
+
+def write_placements(board: Board, solution: list[int]) -> None:
+    """ Write the values placed by a solution of the exact cover matrix to the board.
+
+    :param board: The board to update
+    :param solution: The rows of the solution, see `ExactCover`
+    """
+    size = len(board)
+    for cell, value in placements(solution, size):
+        board[cell // size][cell % size] = value
+
+
+def count_solutions(board: Board, cages: Cages, limit: int | None = None,
+                    cage_pruning: str = CAGE_PRUNING_COMBINATIONS, ordering: str = ORDERING_MRV,
+                    stats: SolveStats | None = None, engine: str = ENGINE_ITERATIVE) -> int:
+    """ Count the solutions of a Sudoku from board and cages, see `solve_all`.
+
+    The board given is left as it is.
+
+    :param board: The board to count the solutions of
+    :param cages: The cages of that board
+    :param limit: The number of solutions to stop counting at, or None to count every solution
+    :param cage_pruning: Either `CAGE_PRUNING_MINMAX` or `CAGE_PRUNING_COMBINATIONS`
+    :param ordering: Either `ORDERING_ROWMAJOR` or `ORDERING_MRV`
+    :param stats: The stats to collect, if any
+    :param engine: Either `ENGINE_ITERATIVE` or `ENGINE_DLX`
+    :return: Returns the number of solutions, at most the limit
+    """
+    return sum(1 for _ in solve_all([row[:] for row in board], cages, limit, cage_pruning,
+                                    ordering, stats, engine))
+
 
-        if show_stats:
-            print(f"Validations performed: {validations_performed}")
-            print(f"Unique combinations tested: {combinations_tried}")
+def load_puzzle(data: dict, check: bool = True) -> tuple[Board, Cages]:
+    """ Converts board and cage data decoded from JSON to a board and cages.
+
+    The board is 9x9 unless the optional key "size" gives another size. The shape of the boxes
+    follows from the size, see `geometry.box_shape`, and the optional key "box" may state it as the
+    width and height, which must match. A ValueError is raised if they do not, or if the board does
+    not have the size. The puzzle is then checked with `check_puzzle`, which raises a PuzzleError,
+    itself a ValueError, if the cages do not partition the board or can not add up.
+
+    :param data: The decoded JSON, with the keys "board" and "cages", and optionally "size" and
+                 "box"
+    :param check: Whether to check the puzzle, leave it out for puzzles known to be well formed
+    :return: Returns a tuple of board and cages
+    """
+    board = data["board"]
+    size = data.get("size", 9)
+    geometry = Geometry.for_size(size)
+    if "box" in data and tuple(data["box"]) != (geometry.box_width, geometry.box_height):
+        raise PuzzleError(f"Boxes of a board of size {size} are {geometry.box_width} wide and "
+                          f"{geometry.box_height} tall, not {data['box'][0]} by {data['box'][1]}")
+    if len(board) != size:
+        raise PuzzleError(f"Board must have {size} rows of {size} values")
+
+    # Convert cages from basic JSON to useful tuples
+    cages = [(total, list(map(tuple, fields))) for total, fields in data["cages"]]
+    if check:
+        check_puzzle(board, cages)
+    return board, cages
+
+
+def load_from_file(filename: str, check: bool = True) -> tuple[Board, Cages]:
+    """ Loads board and cage data from a JSON file, or a file of the compact binary format.
+
+    The format is told apart by the header of the binary format, see `encode_puzzle`, and a binary
+    file must hold a single puzzle. Use `load_puzzles` for files holding more.
+
+    :param filename: The name of the file to load the board and cage data from
+    :param check: Whether to check the puzzle, see `load_puzzle`
+    :return: Returns a tuple of board and cages from the file
+    """
+    with open(filename, "rb") as board_file:
+        data = board_file.read()
+    if not data.startswith(PUZZLE_MAGIC):
+        return load_puzzle(json.loads(data), check)
+    puzzles = decode_puzzles(data)
+    puzzle = next(puzzles, None)
+    if puzzle is None or next(puzzles, None) is not None:
+        raise PuzzleError(f"{filename} must hold a single puzzle, use load_puzzles to load more")
+    if check:
+        check_puzzle(*puzzle)
+    return puzzle
+
+
+def load_puzzles(filename: str, check: bool = True) -> Iterator[tuple[Board, Cages]]:
+    """ Loads every puzzle of a file, either of the compact binary format, JSONL or JSON.
+
+    :param filename: The name of the file to load the puzzles from
+    :param check: Whether to check each puzzle, see `load_puzzle`
+    :return: Returns an iterator of the board and cages of each puzzle
+    """
+    with open(filename, "rb") as puzzle_file:
+        data = puzzle_file.read()
+    if data.startswith(PUZZLE_MAGIC):
+        for board, cages in decode_puzzles(data):
+            if check:
+                check_puzzle(board, cages)
+            yield board, cages
+        return
+    for line in data.decode().splitlines() if filename.endswith(".jsonl") else [data]:
+        if line.strip():
+            yield load_puzzle(json.loads(line), check)
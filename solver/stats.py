@@ -0,0 +1,196 @@
+import time
+from threading import Event
+from typing import Callable, NamedTuple
+
+# The reasons a value can be pruned from a cell. A value excluded for more than one reason is
+# counted for the first of row, column, nonet, cage duplicate and cage bound
+PRUNE_ROW = "row"
+PRUNE_COL = "col"
+PRUNE_NONET = "nonet"
+PRUNE_CAGE_DUPLICATE = "cage-duplicate"
+PRUNE_CAGE_BOUND = "cage-bound"
+# A value that fills out a cage without adding up to its total
+PRUNE_CAGE_SUM = "cage-sum"
+# A value leading to a contradiction when propagated, only used by the propagate engine
+PRUNE_PROPAGATION = "propagation"
+PRUNE_REASONS = (PRUNE_ROW, PRUNE_COL, PRUNE_NONET, PRUNE_CAGE_DUPLICATE, PRUNE_CAGE_BOUND,
+                 PRUNE_CAGE_SUM, PRUNE_PROPAGATION)
+
+# The reasons a search can be stopped before it finished, see `SearchBudget`
+STOP_TIMEOUT = "timeout"
+STOP_MAX_NODES = "max-nodes"
+STOP_CANCELLED = "cancelled"
+# The number of nodes between looking at the clock and the cancel event, which cost more than the
+# node itself for the faster engines
+BUDGET_CHECK_INTERVAL = 32
+# The default number of seconds between reports of the progress of a search
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+
+class SearchStopped(Exception):
+    """ Raised by `SearchBudget.check` to stop a search, and caught by `solve`. """
+
+    def __init__(self, reason: str) -> None:
+        """ :param reason: Why the search was stopped, `STOP_TIMEOUT`, `STOP_MAX_NODES` or
+                           `STOP_CANCELLED`
+        """
+        super().__init__(reason)
+        self.reason = reason
+
+
+class SolveProgress(NamedTuple):
+    """ The progress of a search so far, as reported to the progress callback of `solve`. """
+    nodes: int
+    depth: int
+    elapsed: float
+    nodes_per_sec: float
+
+
+class SearchBudget:
+    """ The limits of a search, checked at every node by `SolveStats.node`.
+
+    The number of nodes is checked at every node, while the clock and the cancel event are only
+    looked at on the first node and every `BUDGET_CHECK_INTERVAL` nodes after it, so a timeout or
+    cancel may be noticed a few nodes late. The progress callback is called at most once per
+    interval of seconds, with the nodes searched since the budget was made and the depth of the
+    current node.
+    """
+
+    __slots__ = ("deadline", "max_nodes", "cancel_event", "progress", "progress_interval",
+                 "nodes", "start", "next_progress")
+
+    def __init__(self, timeout: float | None = None, max_nodes: int | None = None,
+                 cancel_event: Event | None = None,
+                 progress: Callable[[SolveProgress], None] | None = None,
+                 progress_interval: float = DEFAULT_PROGRESS_INTERVAL) -> None:
+        """ :param timeout: The number of seconds the search may take, if limited
+        :param max_nodes: The number of nodes the search may visit, if limited
+        :param cancel_event: An event that stops the search once set, from another thread
+        :param progress: The function to report the progress of the search to, if any
+        :param progress_interval: The number of seconds between reports of the progress
+        """
+        self.start = time.perf_counter()
+        self.deadline = self.start + timeout if timeout is not None else None
+        self.max_nodes = max_nodes
+        self.cancel_event = cancel_event
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.nodes = 0
+        self.next_progress = self.start + progress_interval
+
+    def check(self, depth: int) -> None:
+        """ Count a node of the search, and stop the search before the node if it is over budget.
+
+        :param depth: The depth of the node
+        """
+        self.nodes += 1
+        nodes = self.nodes
+        if self.max_nodes is not None and nodes > self.max_nodes:
+            raise SearchStopped(STOP_MAX_NODES)
+        if (nodes - 1) % BUDGET_CHECK_INTERVAL:
+            return
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise SearchStopped(STOP_CANCELLED)
+        now = time.perf_counter()
+        if self.deadline is not None and now >= self.deadline:
+            raise SearchStopped(STOP_TIMEOUT)
+        if self.progress is not None and now >= self.next_progress:
+            self.next_progress = now + self.progress_interval
+            elapsed = now - self.start
+            self.progress(SolveProgress(nodes, depth, elapsed, nodes / elapsed))
+
+
+class SolveStats:
+    """ The stats of solving one or more puzzles.
+
+    Pass an instance to `solve` to collect the stats, which are added to the ones already
+    collected. Without one, the engines skip the collection entirely. A node is a cell being
+    filled out, and its depth the number of cells filled out by the search before it. A backtrack
+    is a node where every value was tried without finding a solution. The times are in seconds.
+
+    While `solve` searches with a budget it is attached to the stats, and `stopped` holds the
+    reason the last search was stopped, or None if it finished.
+    """
+
+    __slots__ = ("nodes", "nodes_per_depth", "backtracks", "pruned", "validations",
+                 "propagation_time", "validation_time", "encoding_time", "search_time", "stopped",
+                 "budget")
+
+    def __init__(self) -> None:
+        self.nodes = 0
+        self.nodes_per_depth = []
+        self.backtracks = 0
+        self.pruned = dict.fromkeys(PRUNE_REASONS, 0)
+        self.validations = 0
+        self.propagation_time = 0.0
+        self.validation_time = 0.0
+        self.encoding_time = 0.0
+        self.search_time = 0.0
+        self.stopped = None
+        self.budget = None
+
+    def node(self, depth: int) -> None:
+        """ Count a node of the search.
+
+        :param depth: The depth of the node
+        """
+        if self.budget is not None:
+            self.budget.check(depth)
+        self.nodes += 1
+        nodes_per_depth = self.nodes_per_depth
+        if depth < len(nodes_per_depth):
+            nodes_per_depth[depth] += 1
+        else:
+            nodes_per_depth.extend([0] * (depth - len(nodes_per_depth)) + [1])
+
+    def prune(self, row: int, col: int, nonet: int, cage: int, available: int, values: int) -> None:
+        """ Count the values pruned from a cell by the reason they were pruned for.
+
+        :param row: The bitmask of values used in the row of the cell
+        :param col: The bitmask of values used in the column of the cell
+        :param nonet: The bitmask of values used in the nonet of the cell
+        :param cage: The bitmask of values used in the cage of the cell
+        :param available: The bitmask of values left to try at the cell, every other value is
+                          counted as pruned
+        :param values: The bitmask of every value of the board, the values 1 through size
+        """
+        pruned = self.pruned
+        left = values & ~available
+        pruned[PRUNE_ROW] += (left & row).bit_count()
+        left &= ~row
+        pruned[PRUNE_COL] += (left & col).bit_count()
+        left &= ~col
+        pruned[PRUNE_NONET] += (left & nonet).bit_count()
+        left &= ~nonet
+        pruned[PRUNE_CAGE_DUPLICATE] += (left & cage).bit_count()
+        left &= ~cage
+        pruned[PRUNE_CAGE_BOUND] += left.bit_count()
+
+    def merge(self, other: "SolveStats") -> None:
+        """ Add the stats of another instance to these.
+
+        :param other: The stats to add
+        """
+        self.nodes += other.nodes
+        for depth, count in enumerate(other.nodes_per_depth):
+            if depth < len(self.nodes_per_depth):
+                self.nodes_per_depth[depth] += count
+            else:
+                self.nodes_per_depth.append(count)
+        self.backtracks += other.backtracks
+        for reason, count in other.pruned.items():
+            self.pruned[reason] = self.pruned.get(reason, 0) + count
+        self.validations += other.validations
+        self.propagation_time += other.propagation_time
+        self.validation_time += other.validation_time
+        self.encoding_time += other.encoding_time
+        self.search_time += other.search_time
+        if other.stopped is not None:
+            self.stopped = other.stopped
+
+    def to_dict(self) -> dict:
+        """ Convert the stats to a dictionary that can be written as JSON.
+
+        :return: Returns a dictionary with an entry for each of the stats
+        """
+        return {name: getattr(self, name) for name in self.__slots__ if name != "budget"}
@@ -0,0 +1,122 @@
+import json
+import time
+from collections import deque
+from functools import partial
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+
+from .cache import SolutionCache
+from .combinations import CAGE_PRUNING_COMBINATIONS
+from .solver import ENGINE_CLASSIC, ORDERING_ROWMAJOR, load_puzzle, solve
+from .stats import SolveStats
+
+# The number of lines handed to a worker process at a time when streaming in parallel
+STREAM_CHUNK_SIZE = 16
+
+
+def solve_line(line_number: int, line: str, engine: str = ENGINE_CLASSIC,
+               cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+               ordering: str = ORDERING_ROWMAJOR, cache: SolutionCache | None = None,
+               timeout: float | None = None) -> dict:
+    """ Solve the puzzle of a single JSONL line, in the same format as the puzzle files.
+
+    A line that can not be decoded results in an error rather than an exception, so a single bad
+    line does not end the stream.
+
+    :param line_number: The one based number of the line, which is part of the result
+    :param line: The line holding the JSON of the puzzle
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param cache: The cache of solutions to use, if any. The node count of a puzzle found in the
+                  cache is 0
+    :param timeout: The number of seconds the search may take, if limited
+    :return: Returns the result as a dictionary with the line number, the solution, whether it was
+             solved, the time taken in seconds and the number of nodes searched, or the line number
+             and the error if the line could not be decoded. A search stopped by the timeout also
+             has the reason it stopped, see `solve`
+    """
+    try:
+        board, cages = load_puzzle(json.loads(line))
+    except (ValueError, KeyError, TypeError) as error:
+        return {"line": line_number, "success": False, "error": f"Invalid puzzle: {error}"}
+
+    stats = SolveStats()
+    start = time.perf_counter()
+    success = solve(board, cages, engine, cage_pruning, ordering, stats, cache, timeout)
+    elapsed = time.perf_counter() - start
+    result = {"line": line_number, "success": success, "solution": board, "time": elapsed,
+              "nodes": stats.nodes}
+    if stats.stopped is not None:
+        result["stopped"] = stats.stopped
+    return result
+
+
+def _solve_lines(lines: list[tuple[int, str]], engine: str, cage_pruning: str,
+                 ordering: str, cache: SolutionCache | None,
+                 timeout: float | None) -> list[dict]:
+    """ Solve a chunk of lines in a worker process. """
+    return [solve_line(line_number, line, engine, cage_pruning, ordering, cache, timeout)
+            for line_number, line in lines]
+
+
+def solve_stream(lines: Iterable[str], jobs: int = 1, engine: str = ENGINE_CLASSIC,
+                 cage_pruning: str = CAGE_PRUNING_COMBINATIONS,
+                 ordering: str = ORDERING_ROWMAJOR,
+                 cache: SolutionCache | None = None,
+                 timeout: float | None = None) -> Iterator[dict]:
+    """ Solve the puzzles of a stream of JSONL lines, one puzzle per line.
+
+    The lines are read lazily, and blank lines are skipped. The results are yielded in the order of
+    the lines, see `solve_line`. With more than one job the lines are handed out in chunks to a
+    pool of worker processes, keeping a bounded number of chunks in flight, so the memory used does
+    not grow with the number of lines in either case.
+
+    :param lines: The lines to read the puzzles from, such as an open file
+    :param jobs: The number of worker processes to use
+    :param engine: The solving engine to use
+    :param cage_pruning: The kind of cage pruning to use
+    :param ordering: The order to fill out the cells in
+    :param cache: The cache of solutions to use, if any
+    :param timeout: The number of seconds the search of each puzzle may take, if limited
+    :return: Returns an iterator of the results, in the order of the lines
+    """
+    numbered = ((line_number, line) for line_number, line in enumerate(lines, 1) if line.strip())
+    if jobs <= 1:
+        for line_number, line in numbered:
+            yield solve_line(line_number, line, engine, cage_pruning, ordering, cache, timeout)
+        return
+
+    worker = partial(_solve_lines, engine=engine, cage_pruning=cage_pruning, ordering=ordering,
+                     cache=cache, timeout=timeout)
+    # Imported here rather than up front, see `solve_parallel`
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Unlike executor.map, only submit a few chunks per worker ahead of the ones being yielded,
+        # rather than reading every line up front
+        pending = deque()
+        while True:
+            while len(pending) < jobs * 2:
+                chunk = list(islice(numbered, STREAM_CHUNK_SIZE))
+                if not chunk:
+                    break
+                pending.append(executor.submit(worker, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def write_results(results: Iterable[dict], output: TextIO) -> int:
+    """ Write results to a stream as JSONL, one result per line, as soon as each is available.
+
+    :param results: The results to write, such as the ones yielded by `solve_stream`
+    :param output: The stream to write to
+    :return: Returns the number of results that were not solved
+    """
+    failed = 0
+    for result in results:
+        output.write(json.dumps(result, separators=(",", ":")) + "\n")
+        output.flush()
+        if not result["success"]:
+            failed += 1
+    return failed
@@ -0,0 +1,5 @@
+Cages = list[tuple[int, list[tuple[int, int]]]]
+Board = list[list[int]]
+MinMaxCache = list[list[tuple[int, int]]]
+# Bitmasks of the values that are still possible in each cell, in the same layout as the board
+Candidates = list[list[int]]
@@ -1,8 +1,22 @@
+import array
+import io
+import json
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
 
 import solver
 
 
+EXPERT_1 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "expert-1.json")
+EXPERT_2 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "expert-2.json")
+
+
 class Test(unittest.TestCase):
 
     def setUp(self) -> None:
@@ -67,6 +81,7 @@ class Test(unittest.TestCase):
                 minmax_row.append(solver.find_minmax_value(self.cages, x, y))
             self.cage_cache.append(cage_row)
             self.minmax_cache.append(minmax_row)
+        self.index = solver.PuzzleIndex.for_cages(self.cages)
 
     def test_find_cage_index(self):
         self.assertEqual(21, solver.find_cage_index(self.cages, 1, 2))
@@ -80,15 +95,35 @@ class Test(unittest.TestCase):
         self.assertFalse(solver.is_same_cage(self.cages, 5, 0, 4, 0))
 
     def test_find_taken_value(self):
-        taken_values_1 = solver.find_taken_value(self.board, self.cages, self.cage_cache, 0, 0)
+        taken_values_1 = solver.find_taken_value(self.board, self.index, 0, 0)
         self.assertListEqual(list(set(taken_values_1)), [1, 2, 3 ])
-        taken_values_2 = solver.find_taken_value(self.board, self.cages, self.cage_cache, 0, 4)
+        taken_values_2 = solver.find_taken_value(self.board, self.index, 0, 4)
         self.assertListEqual(list(set(taken_values_2)), [5])
-        taken_values_3 = solver.find_taken_value(self.board, self.cages, self.cage_cache, 4, 0)
+        taken_values_3 = solver.find_taken_value(self.board, self.index, 4, 0)
         self.assertListEqual(list(set(taken_values_3)), [1, 2, 3, 4, 5])
-        taken_values_4 = solver.find_taken_value(self.board, self.cages, self.cage_cache, 8, 8)
+        taken_values_4 = solver.find_taken_value(self.board, self.index, 8, 8)
         self.assertListEqual(list(set(taken_values_4)), [1, 2, 3, 4, 5, 6, 7, 8])
 
+    def test_find_taken_value_combinations(self):
+        taken_values = solver.find_taken_value(self.board, self.index, 4, 0,
+                                               solver.CAGE_PRUNING_COMBINATIONS)
+        self.assertListEqual(sorted(set(taken_values)), [1, 2, 3, 4, 5, 7])
+
+    def test_cage_combinations(self):
+        self.assertListEqual(solver.cage_combinations(5, 2), [0b1001, 0b0110])
+        self.assertListEqual(solver.cage_combinations(45, 9), [0b111111111])
+        self.assertListEqual(solver.cage_combinations(2, 2), [])
+        self.assertIs(solver.cage_combinations(5, 2), solver.cage_combinations(5, 2))
+
+    def test_combination_table(self):
+        table = solver.combination_table(14, 2)
+        self.assertEqual(table[0], 0b110110000)
+        self.assertEqual(table[0b100000000], 0b000010000)
+        self.assertEqual(table[0b001000000], 0)
+        minmax_table = solver.minmax_table(14, 2)
+        self.assertEqual(minmax_table[0], 0b111110000)
+        self.assertEqual(minmax_table[0b100000000], 0b000010000)
+
     def test_find_minmax_value(self):
         min_value, max_value = solver.find_minmax_value(self.cages, 0, 0)
         self.assertTupleEqual((min_value, max_value), (4, 9))
@@ -125,6 +160,859 @@ class Test(unittest.TestCase):
     def test_validate(self):
         self.assertTrue(solver.validate(self.board, self.cages))
 
+    def test_validate_cage_sum(self):
+        # Cage 2 is (13, [(0, 0), (1, 0)])
+        self.assertTrue(solver.validate_cage_sum(self.board, self.cages, 2))
+        self.board[0][0] = 4
+        self.assertTrue(solver.validate_cage_sum(self.board, self.cages, 2))
+        self.board[0][1] = 9
+        self.assertTrue(solver.validate_cage_sum(self.board, self.cages, 2))
+        self.board[0][1] = 8
+        self.assertFalse(solver.validate_cage_sum(self.board, self.cages, 2))
+
+        masks = solver.CellMasks(solver.Puzzle.from_board(self.board, self.cages))
+        masks.unassign(1, 8)
+        self.assertTrue(masks.validate_cage_sum(1, 9))
+        self.assertFalse(masks.validate_cage_sum(1, 8))
+
+    def test_debug_validation(self):
+        solver.solver.debug_validation = True
+        try:
+            board, cages = solver.load_from_file(EXPERT_2)
+            self.assertTrue(solver.solve(board, cages, solver.ENGINE_BITMASK))
+            with self.assertRaises(AssertionError):
+                solver.debug_validate([[1] * 9 for _ in range(9)], cages)
+        finally:
+            solver.solver.debug_validation = False
+        solver.debug_validate([[1] * 9 for _ in range(9)], cages)
+
+    def test_puzzle(self):
+        puzzle = solver.Puzzle.from_board(self.board, self.cages)
+        self.assertEqual(len(puzzle.board), 81)
+        self.assertEqual(puzzle.board[1 * 9 + 1], 1)
+        self.assertListEqual(puzzle.to_board(), self.board)
+        self.assertListEqual(puzzle.to_cages(), self.cages)
+
+        copy = puzzle.copy()
+        copy.board[0] = 9
+        self.assertEqual(puzzle.board[0], 0)
+        self.assertIs(copy.index, puzzle.index)
+        copy.write_to(self.board)
+        self.assertEqual(self.board[0][0], 9)
+
+    def test_puzzle_index(self):
+        index = solver.PuzzleIndex.for_cages(self.cages)
+        self.assertEqual(index.cell_cage[0], 2)
+        self.assertEqual(index.cages[2].cells, (0, 1))
+        # 8 in the row, 8 in the column, 4 more in the nonet, and the other cell of the cage is
+        # already in the row
+        self.assertEqual(len(index.peers[0]), 20)
+        self.assertNotIn(0, index.peers[0])
+        self.assertListEqual(index.cage_grid, self.cage_cache)
+        self.assertListEqual(index.minmax_grid, self.minmax_cache)
+        self.assertListEqual(index.to_cages(), self.cages)
+        self.assertTrue(solver.is_same_cage(self.cages, 0, 0, 1, 0, index))
+        self.assertEqual(solver.find_minmax_value(self.cages, 0, 0, index),
+                         solver.find_minmax_value(self.cages, 0, 0))
+        with self.assertRaises(AssertionError):
+            index.cage_index(9, 0)
+
+        # The same layout is only indexed once, even when given as a copy
+        cages = [(total, list(fields)) for total, fields in self.cages]
+        self.assertIs(solver.PuzzleIndex.for_cages(cages), index)
+        self.assertIs(index.layout, index.layout)
+
+    def test_bounds_mask(self):
+        self.assertEqual(solver.bounds_mask(17, 2), 0b110000000)
+        self.assertEqual(solver.bounds_mask(6, 1), 0b000100000)
+        self.assertEqual(solver.bounds_mask(10, 1), 0)
+
+    def test_cell_masks(self):
+        masks = solver.CellMasks(solver.Puzzle.from_board(self.board, self.cages))
+        for y in range(9):
+            for x in range(9):
+                if self.board[y][x] == 0:
+                    taken_values = solver.find_taken_value(self.board, self.index, x, y)
+                    min_value, max_value = self.minmax_cache[y][x]
+                    expected = [value for value in range(min_value, max_value + 1)
+                                if value not in taken_values]
+                    candidates = masks.candidates(y * 9 + x)
+                    self.assertListEqual(
+                        [value for value in range(1, 10) if candidates & (1 << (value - 1))],
+                        expected)
+
+    def test_find_innies_outies(self):
+        virtual_cages = solver.find_innies_outies(self.cages)
+        # The cages entirely inside row 0 total 13 + 15 + 5, leaving the remaining three cells of
+        # the row to add up to the rest of 45
+        self.assertIn((45 - 13 - 15 - 5, [(2, 0), (3, 0), (4, 0)]), virtual_cages)
+        for total, fields in virtual_cages:
+            self.assertTrue(0 < len(fields) < 9)
+
+    def test_propagate(self):
+        board = [[0] * 9 for _ in range(9)]
+        candidates = solver.propagate(board, self.cages)
+        self.assertListEqual(board, [[0] * 9 for _ in range(9)])
+        solution = [[mask.bit_length() for mask in row] for row in candidates]
+        self.assertTrue(all(mask & (mask - 1) == 0 for row in candidates for mask in row))
+        self.assertTrue(solver.validate(solution, self.cages))
+
+        board[0][0] = 1
+        board[0][1] = 1
+        self.assertIsNone(solver.propagate(board, self.cages))
+
+    def test_solve_engines(self):
+        classic_board = [[0] * 9 for _ in range(9)]
+        bitmask_board = [[0] * 9 for _ in range(9)]
+        minmax_board = [[0] * 9 for _ in range(9)]
+        propagate_board = [[0] * 9 for _ in range(9)]
+        self.assertTrue(solver.solve(classic_board, self.cages, solver.ENGINE_CLASSIC))
+        self.assertTrue(solver.solve(bitmask_board, self.cages, solver.ENGINE_BITMASK))
+        self.assertTrue(solver.solve(minmax_board, self.cages, solver.ENGINE_BITMASK,
+                                     solver.CAGE_PRUNING_MINMAX))
+        self.assertListEqual(classic_board, bitmask_board)
+        self.assertTrue(solver.solve(propagate_board, self.cages, solver.ENGINE_PROPAGATE))
+        self.assertListEqual(classic_board, minmax_board)
+        self.assertListEqual(classic_board, propagate_board)
+        dlx_board = [[0] * 9 for _ in range(9)]
+        self.assertTrue(solver.solve(dlx_board, self.cages, solver.ENGINE_DLX))
+        self.assertListEqual(classic_board, dlx_board)
+        sat_board = [[0] * 9 for _ in range(9)]
+        self.assertTrue(solver.solve(sat_board, self.cages, solver.ENGINE_SAT))
+        self.assertListEqual(classic_board, sat_board)
+        self.assertTrue(solver.validate(bitmask_board, self.cages))
+        with self.assertRaises(ValueError):
+            solver.solve(bitmask_board, self.cages, "unknown")
+        with self.assertRaises(ValueError):
+            solver.solve(bitmask_board, self.cages, solver.ENGINE_BITMASK, "unknown")
+
+    def test_solve_ordering(self):
+        rowmajor_board, cages = solver.load_from_file(EXPERT_2)
+        rowmajor_stats = solver.SolveStats()
+        self.assertTrue(solver.solve(rowmajor_board, cages, solver.ENGINE_BITMASK,
+                                     stats=rowmajor_stats))
+
+        mrv_board, cages = solver.load_from_file(EXPERT_2)
+        mrv_stats = solver.SolveStats()
+        self.assertTrue(solver.solve(mrv_board, cages, solver.ENGINE_BITMASK,
+                                     ordering=solver.ORDERING_MRV, stats=mrv_stats))
+        self.assertLess(mrv_stats.nodes, rowmajor_stats.nodes)
+        self.assertListEqual(rowmajor_board, mrv_board)
+
+        propagate_board, cages = solver.load_from_file(EXPERT_2)
+        self.assertTrue(solver.solve(propagate_board, cages, solver.ENGINE_PROPAGATE,
+                                     ordering=solver.ORDERING_MRV))
+        self.assertListEqual(rowmajor_board, propagate_board)
+
+        with self.assertRaises(ValueError):
+            solver.solve(mrv_board, cages, solver.ENGINE_CLASSIC, ordering=solver.ORDERING_MRV)
+
+    def test_solve_iterative(self):
+        for ordering in solver.ORDERINGS:
+            recursive_board, cages = solver.load_from_file(EXPERT_2)
+            recursive_stats = solver.SolveStats()
+            self.assertTrue(solver.solve(recursive_board, cages, solver.ENGINE_BITMASK,
+                                         ordering=ordering, stats=recursive_stats))
+
+            iterative_board, cages = solver.load_from_file(EXPERT_2)
+            iterative_stats = solver.SolveStats()
+            self.assertTrue(solver.solve(iterative_board, cages, solver.ENGINE_ITERATIVE,
+                                         ordering=ordering, stats=iterative_stats))
+            self.assertEqual(iterative_stats.nodes, recursive_stats.nodes)
+            self.assertListEqual(iterative_stats.nodes_per_depth, recursive_stats.nodes_per_depth)
+            self.assertEqual(iterative_stats.backtracks, recursive_stats.backtracks)
+            self.assertDictEqual(iterative_stats.pruned, recursive_stats.pruned)
+            self.assertEqual(iterative_stats.validations, recursive_stats.validations)
+            self.assertListEqual(recursive_board, iterative_board)
+
+    def test_solve_stats(self):
+        results = {}
+        for engine in (solver.ENGINE_CLASSIC, solver.ENGINE_BITMASK):
+            board, cages = solver.load_from_file(EXPERT_2)
+            stats = solver.SolveStats()
+            self.assertTrue(solver.solve(board, cages, engine, solver.CAGE_PRUNING_MINMAX,
+                                         stats=stats))
+            results[engine] = stats
+        classic, bitmask = results[solver.ENGINE_CLASSIC], results[solver.ENGINE_BITMASK]
+        # Both engines search the same tree, and so prune the same values for the same reasons
+        self.assertEqual(classic.nodes, bitmask.nodes)
+        self.assertEqual(sum(classic.nodes_per_depth), classic.nodes)
+        self.assertListEqual(classic.nodes_per_depth, bitmask.nodes_per_depth)
+        self.assertEqual(classic.backtracks, bitmask.backtracks)
+        self.assertDictEqual(classic.pruned, bitmask.pruned)
+        self.assertEqual(classic.validations, bitmask.validations)
+        self.assertGreater(classic.pruned[solver.PRUNE_CAGE_BOUND], 0)
+        self.assertGreater(classic.validations, 0)
+        self.assertGreater(classic.propagation_time, 0)
+        self.assertGreater(classic.search_time, classic.validation_time)
+        self.assertEqual(classic.nodes_per_depth[0], 1)
+
+        board, cages = solver.load_from_file(EXPERT_2)
+        stats = solver.SolveStats()
+        self.assertTrue(solver.solve(board, cages, solver.ENGINE_PROPAGATE, stats=stats))
+        self.assertGreater(stats.nodes, 0)
+        self.assertEqual(stats.pruned[solver.PRUNE_ROW], 0)
+
+        propagate_nodes = stats.nodes
+        stats.merge(bitmask)
+        self.assertEqual(stats.nodes, propagate_nodes + bitmask.nodes)
+        self.assertEqual(sum(stats.nodes_per_depth), stats.nodes)
+        self.assertEqual(json.loads(json.dumps(stats.to_dict()))["nodes"], stats.nodes)
+
+    def test_exact_cover(self):
+        board, cages = solver.load_from_file(EXPERT_2)
+        index = solver.PuzzleIndex.for_cages(cages)
+        candidates = solver.initial_candidates(board)
+        cover = solver.ExactCover(candidates, index)
+        # The cells, rows, columns and nonets each have 81 columns, followed by the cages
+        self.assertEqual(len(cover.columns), 4 * 81 + len(cages) * 10)
+        # Every cell can hold any value, and the combinations of the cages follow the placements
+        self.assertEqual(len(cover.rows), 81 * 9 + sum(
+            len(solver.cage_combinations(total, len(fields))) for total, fields in cages))
+
+        # Selecting a row and deselecting it again leaves the matrix as it was
+        columns = {column: set(rows) for column, rows in cover.columns.items()}
+        removed = cover.select(4 * 9 + 2)
+        self.assertNotIn(4, cover.columns)
+        # Cell 5 is in the same row, and can no longer hold the value
+        self.assertNotIn(5 * 9 + 2, cover.columns[5])
+        self.assertIn(5 * 9 + 3, cover.columns[5])
+        cover.deselect(4 * 9 + 2, removed)
+        self.assertDictEqual(cover.columns, columns)
+        self.assertListEqual(cover.solution, [])
+
+        stats = solver.SolveStats()
+        solutions = [list(solver.placements(solution)) for solution in cover.solutions(stats)]
+        self.assertEqual(len(solutions), 1)
+        self.assertEqual(len(solutions[0]), 81)
+        self.assertGreater(stats.nodes, 0)
+
+        dlx_board, cages = solver.load_from_file(EXPERT_2)
+        self.assertTrue(solver.solve(dlx_board, cages, solver.ENGINE_DLX))
+        self.assertTrue(solver.validate(dlx_board, cages))
+        for cell, value in solutions[0]:
+            self.assertEqual(dlx_board[cell // 9][cell % 9], value)
+
+    def test_sat(self):
+        # (a or b) and (not a or b) and (not b or c) can only be satisfied with b and c true
+        self.assertListEqual(solver.dpll([[1, 2], [-1, 2], [-2, 3]], 3)[1:], [2, 3])
+        self.assertIsNone(solver.dpll([[1, 2], [-1, 2], [-2], [3]], 3))
+        self.assertIsNone(solver.dpll([[1], []], 1))
+        self.assertSetEqual(solver.solve_cnf([[1], [-1, -2]], 2, solver.SAT_BACKEND_DPLL), {1})
+        with self.assertRaises(ValueError):
+            solver.solve_cnf([[1]], 1, "unknown")
+        self.assertIn(solver.find_sat_backend(), solver.SAT_BACKENDS)
+
+        board, cages = solver.load_from_file(EXPERT_2)
+        index = solver.PuzzleIndex.for_cages(cages)
+        clauses, variable_count = solver.encode_cnf(solver.initial_candidates(board), index)
+        # The placements of the 9 values in the 81 cells are followed by the cage combinations
+        self.assertGreater(variable_count, 81 * 9)
+        stats = solver.SolveStats()
+        model = solver.solve_cnf(clauses, variable_count, solver.SAT_BACKEND_DPLL, stats)
+        self.assertGreater(stats.nodes, 0)
+        for cell in range(81):
+            values = [value for value in range(1, 10) if cell * 9 + value in model]
+            self.assertEqual(len(values), 1)
+            board[cell // 9][cell % 9] = values[0]
+        self.assertTrue(solver.validate(board, cages))
+
+        sat_board, cages = solver.load_from_file(EXPERT_2)
+        stats = solver.SolveStats()
+        self.assertTrue(solver.solve(sat_board, cages, solver.ENGINE_SAT, stats=stats))
+        self.assertListEqual(board, sat_board)
+        self.assertGreater(stats.encoding_time, 0)
+        self.assertGreaterEqual(stats.search_time, stats.encoding_time)
+
+        # Two givens of the same value in a row can never be solved
+        board, cages = solver.load_from_file(EXPERT_2)
+        board[0][0] = board[0][1] = 1
+        self.assertIsNone(solver.solve_cnf(*solver.encode_cnf(solver.initial_candidates(board),
+                                                              index)))
+
+    def test_solve_all(self):
+        board, cages = solver.load_from_file(EXPERT_2)
+        self.assertEqual(solver.count_solutions(board, cages), 1)
+        self.assertEqual(solver.count_solutions(board, cages, limit=2), 1)
+        self.assertListEqual(board, solver.load_from_file(EXPERT_2)[0])
+
+        solution = [row[:] for row in board]
+        self.assertTrue(solver.solve(solution, cages))
+        found = [[row[:] for row in found_board] for found_board in solver.solve_all(board, cages)]
+        self.assertListEqual(found, [solution])
+        # Once every solution has been found, the board holds the givens again
+        self.assertListEqual(board, solver.load_from_file(EXPERT_2)[0])
+
+        # Propagating alone solves expert 1, and the board is reset the same way
+        solved_board, solved_cages = solver.load_from_file(EXPERT_1)
+        candidates = solver.propagate(solved_board, solved_cages)
+        self.assertTrue(all(mask.bit_count() == 1 for row in candidates for mask in row))
+        for engine in (solver.ENGINE_ITERATIVE, solver.ENGINE_DLX):
+            found = [[row[:] for row in found_board] for found_board
+                     in solver.solve_all(solved_board, solved_cages, engine=engine)]
+            self.assertEqual(len(found), 1)
+            self.assertTrue(solver.validate(found[0], solved_cages))
+            self.assertListEqual(solved_board, solver.load_from_file(EXPERT_1)[0])
+            next(solver.solve_all(solved_board, solved_cages, limit=1, engine=engine))
+            self.assertListEqual(solved_board, found[0])
+            solved_board = solver.load_from_file(EXPERT_1)[0]
+
+        # With each row as a cage and the top band left empty, there are plenty of solutions
+        rows = [(45, [(x, y) for x in range(9)]) for y in range(9)]
+        band = [[0] * 9 if y < 3 else row[:] for y, row in enumerate(solution)]
+        for ordering in solver.ORDERINGS:
+            self.assertEqual(solver.count_solutions(band, rows, ordering=ordering), 192)
+            self.assertEqual(solver.count_solutions(band, rows, engine=solver.ENGINE_DLX), 192)
+            found = set()
+            for found_board in solver.solve_all(band, rows, limit=10, ordering=ordering):
+                self.assertTrue(solver.validate(found_board, rows))
+                self.assertIs(found_board, band)
+                found.add(tuple(value for row in found_board for value in row))
+            self.assertEqual(len(found), 10)
+            band = [[0] * 9 if y < 3 else row[:] for y, row in enumerate(solution)]
+
+        # A filled out board is its own single solution
+        self.assertEqual(solver.count_solutions(solution, cages), 1)
+        with self.assertRaises(ValueError):
+            solver.count_solutions(board, cages, limit=0)
+
+    def test_geometry(self):
+        self.assertTupleEqual(solver.box_shape(4), (2, 2))
+        self.assertTupleEqual(solver.box_shape(6), (3, 2))
+        self.assertTupleEqual(solver.box_shape(9), (3, 3))
+        self.assertTupleEqual(solver.box_shape(12), (4, 3))
+        self.assertTupleEqual(solver.box_shape(16), (4, 4))
+        geometry = solver.Geometry.for_size(9)
+        self.assertIs(geometry, solver.Geometry.for_size(9))
+        self.assertEqual(geometry.cell_rows[40], 4)
+        self.assertEqual(geometry.cell_boxes[40], 4)
+        self.assertEqual(geometry.mask_sums[0b100000101], 13)
+        self.assertEqual(geometry.mask_sums[geometry.all_values], 45)
+        self.assertEqual(len(geometry.houses), 27)
+        geometry = solver.Geometry.for_size(6)
+        self.assertEqual(geometry.house_total, 21)
+        # The second box of a 6x6 board covers the right half of the top two rows
+        self.assertTupleEqual(geometry.houses[13], (3, 4, 5, 9, 10, 11))
+        self.assertListEqual(list(solver.find_nonet_range(5, 2, 6)), [4, 5])
+        with self.assertRaises(ValueError):
+            solver.Geometry(17)
+
+    def test_solve_sizes(self):
+        # Every 4x4 board, with each row as a cage
+        board = [[0] * 4 for _ in range(4)]
+        rows = [(10, [(x, y) for x in range(4)]) for y in range(4)]
+        for ordering in solver.ORDERINGS:
+            self.assertEqual(solver.count_solutions(board, rows, ordering=ordering), 288)
+        self.assertEqual(solver.count_solutions(board, rows, engine=solver.ENGINE_DLX), 288)
+
+        for size in (4, 6, 12, 16):
+            board, cages = solver.scaling_puzzle(size)
+            for engine in solver.ENGINES:
+                if size == 16 and engine in (solver.ENGINE_CLASSIC, solver.ENGINE_SAT):
+                    continue
+                solution = [row[:] for row in board]
+                self.assertTrue(solver.solve(solution, cages, engine), (size, engine))
+                self.assertTrue(solver.validate(solution, cages), (size, engine))
+                self.assertNotIn(0, [value for row in solution for value in row])
+
+        board, cages = solver.scaling_puzzle(6, 1)
+        cache = solver.SolutionCache()
+        self.assertTrue(solver.solve([row[:] for row in board], cages, cache=cache))
+        mirrored = [(total, [(5 - x, y) for x, y in fields]) for total, fields in cages]
+        solution = [row[:] for row in board]
+        self.assertTrue(solver.solve(solution, mirrored, cache=cache))
+        self.assertEqual(cache.hits, 1)
+        self.assertTrue(solver.validate(solution, mirrored))
+
+        data = {"size": 6, "box": [3, 2], "board": board, "cages": cages}
+        self.assertListEqual(solver.load_puzzle(data)[0], board)
+        with self.assertRaises(ValueError):
+            solver.load_puzzle(dict(data, box=[2, 3]))
+        with self.assertRaises(ValueError):
+            solver.load_puzzle(dict(data, size=9))
+
+    def test_check_puzzle(self):
+        board, cages = solver.load_from_file(EXPERT_1)
+        solver.check_puzzle(board, cages)
+
+        def assert_error(message, puzzle_board, puzzle_cages):
+            with self.assertRaises(solver.PuzzleError) as context:
+                solver.check_puzzle(puzzle_board, puzzle_cages)
+            self.assertEqual(str(context.exception), message)
+
+        x, y = min(cages[0][1], key=lambda field: (field[1], field[0]))
+        assert_error(f"Cell ({x}, {y}) is not in any cage", board, cages[1:])
+        assert_error(f"Cell ({x}, {y}) is in both cage 0 and cage {len(cages)}", board,
+                     cages + [(1, [(x, y)])])
+        assert_error("Cell (9, 0) of cage 0 is outside the board", board, [(1, [(9, 0)])])
+        assert_error("Cage 0 of 2 cells can not add up to 18, only 3 through 17", board,
+                     [(18, [(0, 0), (1, 0)])])
+        moved = [(total + 1 if index == 0 else total - 1 if index == 1 else total, fields)
+                 for index, (total, fields) in enumerate(cages)]
+        solver.check_puzzle(board, moved)
+        assert_error("The cage totals add up to 406, not 405", board,
+                     [(cages[0][0] + 1, cages[0][1])] + cages[1:])
+        assert_error("Row 8 has 8 values, not 9", board[:8] + [board[8][:8]], cages)
+        assert_error("Cell (2, 0) holds 10, not a value from 0 to 9",
+                     [[0, 0, 10] + [0] * 6] + board[1:], cages)
+
+        # Loading checks the puzzle, unless told not to
+        data = {"board": board, "cages": cages[1:]}
+        with self.assertRaises(solver.PuzzleError):
+            solver.load_puzzle(data)
+        self.assertEqual(len(solver.load_puzzle(data, check=False)[1]), len(cages) - 1)
+        result = next(solver.solve_stream([json.dumps(data)]))
+        self.assertFalse(result["success"])
+        self.assertIn("is not in any cage", result["error"])
+
+    def test_binary_puzzles(self):
+        puzzles = [solver.load_from_file(EXPERT_1), solver.load_from_file(EXPERT_2),
+                   solver.scaling_puzzle(6)]
+        encoded = solver.PUZZLE_HEADER + b"".join(solver.encode_puzzle(board, cages)
+                                                  for board, cages in puzzles)
+        self.assertLess(len(encoded), 3 * 250)
+        self.assertListEqual(list(solver.decode_puzzles(encoded)), puzzles)
+        with self.assertRaises(solver.PuzzleError):
+            list(solver.decode_puzzles(encoded[:-1]))
+        with self.assertRaises(solver.PuzzleError):
+            list(solver.decode_puzzles(b"{}"))
+        with self.assertRaises(solver.PuzzleError):
+            list(solver.decode_puzzles(solver.PUZZLE_MAGIC))
+        self.assertListEqual(list(solver.decode_puzzles(solver.PUZZLE_HEADER)), [])
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "puzzles.bin")
+            with open(filename, "wb") as file:
+                self.assertEqual(solver.write_puzzles(file, puzzles), 3)
+            self.assertListEqual(list(solver.load_puzzles(filename)), puzzles)
+            # A single puzzle loads like a JSON puzzle file
+            with self.assertRaises(solver.PuzzleError):
+                solver.load_from_file(filename)
+            with open(filename, "wb") as file:
+                solver.write_puzzles(file, puzzles[1:2])
+            self.assertEqual(solver.load_from_file(filename), puzzles[1])
+            self.assertEqual(solver.run_packer(filename, [EXPERT_1, EXPERT_2]), 0)
+            self.assertListEqual(list(solver.load_puzzles(filename)), puzzles[:2])
+
+    def test_solve_files(self):
+        filenames = [EXPERT_2, EXPERT_1, EXPERT_2]
+        serial = list(solver.solve_files(filenames, 1, solver.ENGINE_BITMASK, collect_stats=True))
+        parallel = list(solver.solve_files(filenames, 2, solver.ENGINE_BITMASK, collect_stats=True))
+        self.assertListEqual([result.filename for result in parallel], filenames)
+        for serial_result, parallel_result in zip(serial, parallel):
+            self.assertTrue(parallel_result.success)
+            self.assertListEqual(serial_result.solution, parallel_result.solution)
+            self.assertEqual(serial_result.stats.nodes, parallel_result.stats.nodes)
+        self.assertGreater(parallel[0].stats.nodes, 0)
+        self.assertIsNone(next(solver.solve_files([EXPERT_1])).stats)
+        self.assertListEqual(parallel[0].board, [[0] * 9 for _ in range(9)])
+
+    def test_solve_stream(self):
+        with open(EXPERT_2) as file:
+            expert_2 = json.dumps(json.load(file))
+        with open(EXPERT_1) as file:
+            expert_1 = json.dumps(json.load(file))
+        lines = [expert_2 + "\n", "\n", "not json\n", expert_1 + "\n", "{}\n"]
+        serial = list(solver.solve_stream(lines, 1, solver.ENGINE_BITMASK))
+        parallel = list(solver.solve_stream(lines, 2, solver.ENGINE_BITMASK))
+        self.assertListEqual([result["line"] for result in serial], [1, 3, 4, 5])
+        self.assertListEqual([result["success"] for result in serial], [True, False, True, False])
+        self.assertListEqual([result.get("solution") for result in parallel],
+                             [result.get("solution") for result in serial])
+        self.assertGreater(serial[0]["nodes"], 0)
+        self.assertIn("error", serial[1])
+        board, cages = solver.load_from_file(EXPERT_2)
+        self.assertTrue(solver.validate(serial[0]["solution"], cages))
+
+        # The lines are only read as the results are consumed
+        remaining = iter(lines)
+        next(solver.solve_stream(remaining, 1, solver.ENGINE_BITMASK))
+        self.assertEqual(len(list(remaining)), 4)
+
+        output = io.StringIO()
+        self.assertEqual(solver.write_results(serial, output), 2)
+        self.assertListEqual([json.loads(line) for line in output.getvalue().splitlines()], serial)
+
+    def test_serve(self):
+        solver.warm_up(solver.CAGE_PRUNING_MINMAX, 4)
+        self.assertIn((10, 4, 4), sys.modules["solver.combinations"]._minmax_tables)
+
+        with open(EXPERT_2) as file:
+            line = json.dumps(json.load(file))
+        output = io.StringIO()
+        cache = solver.SolutionCache()
+        failed = solver.serve_lines(io.StringIO(f"{line}\n\nnot json\n{line}\n"), output,
+                                    solver.ENGINE_BITMASK, cache=cache)
+        self.assertEqual(failed, 1)
+        results = [json.loads(result) for result in output.getvalue().splitlines()]
+        self.assertListEqual([result["line"] for result in results], [1, 3, 4])
+        self.assertEqual(results[0]["solution"], results[2]["solution"])
+        self.assertEqual(cache.hits, 1)
+
+        cold, warm = solver.measure_latency(EXPERT_2, 1, solver.ENGINE_DLX)
+        self.assertEqual(len(cold), 1)
+        self.assertEqual(len(warm), 1)
+
+    def test_solve_budget(self):
+        board, cages = solver.load_from_file(EXPERT_2)
+        givens = [row[:] for row in board]
+        for engine in solver.ENGINES:
+            if engine == solver.ENGINE_PROPAGATE:
+                continue
+            board = [row[:] for row in givens]
+            stats = solver.SolveStats()
+            self.assertFalse(solver.solve(board, cages, engine, stats=stats, max_nodes=3), engine)
+            self.assertEqual(stats.stopped, solver.STOP_MAX_NODES)
+            self.assertEqual(stats.nodes, 3)
+            # The board is left with the givens and the cells forced by propagating
+            for row, given_row in zip(board, givens):
+                for value, given in zip(row, given_row):
+                    self.assertIn(given, (0, value))
+
+        cancel = threading.Event()
+        cancel.set()
+        stats = solver.SolveStats()
+        cache = solver.SolutionCache()
+        self.assertFalse(solver.solve([row[:] for row in givens], cages, solver.ENGINE_BITMASK,
+                                      stats=stats, cache=cache, cancel_event=cancel))
+        self.assertEqual(stats.stopped, solver.STOP_CANCELLED)
+        self.assertEqual(stats.nodes, 0)
+
+        reports = []
+        budget = solver.SearchBudget(progress=reports.append, progress_interval=0.0)
+        for depth in range(solver.BUDGET_CHECK_INTERVAL + 1):
+            budget.check(depth)
+        self.assertListEqual([report.nodes for report in reports],
+                             [1, solver.BUDGET_CHECK_INTERVAL + 1])
+
+        # A stopped search is not cached, and a finished one clears the reason
+        board = [row[:] for row in givens]
+        self.assertTrue(solver.solve(board, cages, solver.ENGINE_BITMASK, stats=stats, cache=cache,
+                                     timeout=60, progress=reports.append))
+        self.assertIsNone(stats.stopped)
+        self.assertEqual(cache.misses, 2)
+        self.assertNotIn("budget", stats.to_dict())
+
+        with open(EXPERT_2) as file:
+            line = json.dumps(json.load(file))
+        result = next(solver.solve_stream([line], engine=solver.ENGINE_CLASSIC, timeout=0.0))
+        self.assertFalse(result["success"])
+        self.assertEqual(result["stopped"], solver.STOP_TIMEOUT)
+
+    def test_solver_session(self):
+        board, cages = solver.load_from_file(EXPERT_2)
+        solution = [row[:] for row in board]
+        self.assertTrue(solver.solve(solution, cages, solver.ENGINE_DLX))
+        session = solver.SolverSession(cages, board)
+        self.assertListEqual(session.check(), [])
+
+        # Every hint is part of the solution, and filling it out keeps the board free of conflicts
+        hints = 0
+        while (hint := session.hint()) is not None:
+            x, y, value = hint
+            self.assertEqual(value, solution[y][x])
+            session.set_cell(x, y, value)
+            hints += 1
+        self.assertGreater(hints, 0)
+        self.assertListEqual(session.check(), [])
+
+        # A value clashing with a peer is reported on both cells, until it is cleared
+        x, y = next((x, y) for y in range(9) for x in range(9) if session.board[y][x] == 0)
+        peer_x = next(peer_x for peer_x in range(9) if session.board[y][peer_x])
+        session.set_cell(x, y, session.board[y][peer_x])
+        self.assertListEqual(session.check(), sorted([(x, y), (peer_x, y)],
+                                                     key=lambda cell: (cell[1], cell[0])))
+        self.assertIsNone(session.hint())
+        session.clear_cell(x, y)
+        self.assertListEqual(session.check(), [])
+
+        # A full cage with the wrong total is reported, even without a clash
+        session = solver.SolverSession([(3, [(0, 0), (1, 0)]), (7, [(2, 0), (3, 0)]),
+                                        (10, [(x, 1) for x in range(4)]),
+                                        (10, [(x, 2) for x in range(4)]),
+                                        (10, [(x, 3) for x in range(4)])], size=4)
+        session.set_cell(0, 0, 1)
+        self.assertEqual(session.hint(), (1, 0, 2))
+        session.set_cell(1, 0, 3)
+        self.assertListEqual(session.check(), [(0, 0), (1, 0)])
+        session.set_cell(1, 0, 2)
+        self.assertListEqual(session.check(), [])
+        with self.assertRaises(ValueError):
+            session.set_cell(4, 0, 1)
+        with self.assertRaises(solver.PuzzleError):
+            solver.SolverSession([(10, [(0, 0)])])
+
+    def test_generate_puzzle(self):
+        for size in (4, 6):
+            puzzle = solver.generate_puzzle(size, 3)
+            solver.check_puzzle(puzzle.board, puzzle.cages)
+            self.assertEqual(solver.count_solutions(puzzle.board, puzzle.cages, 2), 1)
+            board = [row[:] for row in puzzle.board]
+            self.assertTrue(solver.solve(board, puzzle.cages, solver.ENGINE_DLX))
+            self.assertListEqual(board, puzzle.solution)
+            self.assertIn(puzzle.difficulty, [grade for grade, _ in solver.DIFFICULTY_GRADES])
+            self.assertEqual(solver.generate_puzzle(size, 3), puzzle)
+
+        # Splitting a cage rules out the alternative solution it was split for
+        rng = random.Random(0)
+        solution = [[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]]
+        cages = [(3, [(0, 0), (1, 0)]), (7, [(2, 0), (3, 0)]), (10, [(x, 1) for x in range(4)]),
+                 (10, [(x, 2) for x in range(4)]), (10, [(x, 3) for x in range(4)])]
+        alternative = solver.find_alternative([[0] * 4 for _ in range(4)], cages, solution)
+        self.assertIsNotNone(alternative)
+        self.assertNotEqual(alternative, solution)
+        split = solver.split_cage(cages, solution, alternative, rng)
+        self.assertEqual(len(split), len(cages) + 1)
+        solver.check_puzzle([[0] * 4 for _ in range(4)], split)
+        self.assertNotEqual(solver.find_alternative([[0] * 4 for _ in range(4)], split, solution),
+                            alternative)
+        # A cage whose parts are never both connected can not be split
+        self.assertIsNone(solver.split_cage([(6, [(0, 0), (2, 0), (3, 1)])], solution,
+                                            [[2, 0, 1, 0], [0, 0, 0, 3]], rng))
+
+        puzzles = list(solver.generate_puzzles(2, 4, 5, jobs=2))
+        self.assertListEqual([puzzle.seed for puzzle in puzzles], [5, 6])
+        self.assertEqual(puzzles[1], solver.generate_puzzle(4, 6))
+
+    def test_solve_batch(self):
+        puzzles = [solver.load_from_file(EXPERT_1), solver.load_from_file(EXPERT_2)]
+        puzzles += [(puzzle.board, puzzle.cages) for puzzle in
+                    (solver.generate_puzzle(6, seed, merge_attempts=0) for seed in range(3))]
+        # Two givens of the same value in a row can never be solved
+        board, cages = solver.load_from_file(EXPERT_2)
+        board[0][0] = board[0][1] = 1
+        puzzles.append((board, cages))
+
+        solutions = [([row[:] for row in board], cages) for board, cages in puzzles]
+        solved = [solver.solve(board, cages, solver.ENGINE_DLX) for board, cages in solutions]
+        self.assertListEqual(solved, [True] * 5 + [False])
+        batch = [([row[:] for row in board], cages) for board, cages in puzzles]
+        stats = solver.SolveStats()
+        self.assertListEqual(solver.solve_batch(batch, solver.ENGINE_BITMASK, stats=stats), solved)
+        self.assertListEqual([board for board, _ in batch[:5]],
+                             [board for board, _ in solutions[:5]])
+        self.assertGreater(stats.propagation_time, 0)
+        with self.assertRaises(ValueError):
+            solver.solve_batch(batch, solver.ENGINE_CLASSIC, ordering=solver.ORDERING_MRV)
+
+        if not solver.numpy_available():
+            return
+        with self.assertRaises(ValueError):
+            solver.propagate_batch([puzzles[0], puzzles[2]])
+        nonets = puzzles[:2] + puzzles[5:]
+        propagated = solver.propagate_batch(nonets)
+        self.assertIsNone(propagated[2])
+        for (board, cages), candidates, (solution, _) in zip(nonets[:2], propagated, solutions):
+            # The candidates are never more than those of propagate, and hold the solution
+            expected = [mask for row in solver.propagate(board, cages) for mask in row]
+            self.assertFalse(any(mask & ~other for mask, other in zip(candidates, expected)))
+            for cell, mask in enumerate(candidates):
+                self.assertTrue(mask >> (solution[cell // 9][cell % 9] - 1) & 1)
+
+    def test_canonicalize(self):
+        board, cages = solver.load_from_file(EXPERT_2)
+        board[4][2] = 3
+        key, transform = solver.canonicalize(board, cages)
+
+        # Rotate the puzzle a quarter turn, swap the first two bands and complement the values
+        def move(x, y):
+            x, y = 8 - y, x
+            return x, (y + 3) % 6 if y < 6 else y
+        moved_board = [[0] * 9 for _ in range(9)]
+        for y in range(9):
+            for x in range(9):
+                moved_x, moved_y = move(x, y)
+                moved_board[moved_y][moved_x] = 10 - board[y][x] if board[y][x] else 0
+        moved_cages = [(10 * len(fields) - total, [move(x, y) for x, y in fields])
+                       for total, fields in cages]
+        moved_key, moved_transform = solver.canonicalize(moved_board, moved_cages)
+        self.assertEqual(moved_key, key)
+        self.assertListEqual(moved_transform.from_canonical(moved_transform.to_canonical(board)),
+                             board)
+
+        # A different puzzle has a different canonical form
+        board[4][2] = 0
+        self.assertNotEqual(solver.canonicalize(board, cages)[0], key)
+
+    def test_solution_cache(self):
+        board, cages = solver.load_from_file(EXPERT_2)
+        reflected_board = [row[::-1] for row in board]
+        reflected_cages = [(total, [(8 - x, y) for x, y in fields]) for total, fields in cages]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "solutions.db")
+            cache = solver.SolutionCache(maxsize=1, path=path)
+            self.assertTrue(solver.solve(board, cages, solver.ENGINE_BITMASK, cache=cache))
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+            stats = solver.SolveStats()
+            self.assertTrue(solver.solve(reflected_board, reflected_cages, solver.ENGINE_BITMASK,
+                                         stats=stats, cache=cache))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            self.assertEqual(stats.nodes, 0)
+            self.assertListEqual(reflected_board, [row[::-1] for row in board])
+
+            # Pushing the solution out of memory leaves it in the database
+            unsolvable = [[1] * 9 for _ in range(9)]
+            self.assertFalse(solver.solve([row[:] for row in unsolvable], cages, cache=cache))
+            self.assertFalse(solver.solve([row[:] for row in unsolvable], cages, cache=cache))
+            self.assertEqual(cache.hits, 2)
+            empty_board = [[0] * 9 for _ in range(9)]
+            self.assertTrue(solver.solve(empty_board, cages, cache=cache))
+            self.assertEqual(cache.disk_hits, 1)
+            self.assertListEqual(empty_board, board)
+            cache.close()
+
+            # A new cache, such as one sent to a worker process, shares the database
+            copy = pickle.loads(pickle.dumps(cache))
+            self.assertEqual(copy.get([[0] * 9 for _ in range(9)], cages), (True, board))
+            copy.close()
+
+    def test_split_search(self):
+        # With each row as a cage there are plenty of solutions, and so plenty of subproblems
+        board = [[0] * 9 for _ in range(9)]
+        cages = [(45, [(x, y) for x in range(9)]) for y in range(9)]
+        subproblems = solver.split_search(board, cages, 2)
+        self.assertGreater(len(subproblems), 1)
+        self.assertListEqual(board, [[0] * 9 for _ in range(9)])
+        for subproblem in subproblems:
+            self.assertEqual(len(subproblem), 81)
+            self.assertTrue(solver.validate(solver.board_from_snapshot(subproblem), cages))
+        self.assertTrue(solver.solve_parallel(board, cages, jobs=2, split_depth=2))
+        self.assertTrue(solver.validate(board, cages))
+        self.assertNotIn(0, [value for row in board for value in row])
+
+    def test_undo_trail(self):
+        board, cages = solver.load_from_file(EXPERT_2)
+        layout = solver.PuzzleIndex.for_cages(cages).layout
+        candidates = solver.initial_candidates(board)
+        queue = [cell for cell, mask in enumerate(candidates) if not mask & (mask - 1)]
+        self.assertTrue(solver.reduce_candidates(candidates, layout, queue))
+        before = candidates[:]
+        cell = next(cell for cell, mask in enumerate(candidates) if mask & (mask - 1))
+        trail = array.array("L")
+        for value in range(1, 10):
+            bit = 1 << (value - 1)
+            if not candidates[cell] & bit:
+                continue
+            branch = candidates[:]
+            branch[cell] = bit
+            copied = solver.reduce_candidates(branch, layout, [cell])
+            trail.append(candidates[cell] << solver.TRAIL_CELL_BITS | cell)
+            candidates[cell] = bit
+            self.assertEqual(solver.reduce_candidates(candidates, layout, [cell], trail), copied)
+            if copied:
+                self.assertListEqual(candidates, branch)
+            solver.undo_trail(candidates, trail, 0)
+            self.assertListEqual(candidates, before)
+            self.assertEqual(len(trail), 0)
+
+        # The propagate engine leaves the candidates as they were unless it finds a solution
+        stuck = [0b11, 0b11, 0b11, 0b11] + before[4:]
+        self.assertIsNone(solver.fill_out_next_propagate(stuck, layout))
+        self.assertListEqual(stuck, [0b11, 0b11, 0b11, 0b11] + before[4:])
+        solution = solver.fill_out_next_propagate(candidates, layout, solver.ORDERING_MRV)
+        self.assertIs(solution, candidates)
+        self.assertTrue(all(mask.bit_count() == 1 for mask in solution))
+
+        peak, held = solver.measure_memory(board, cages, solver.ENGINE_PROPAGATE)
+        self.assertGreater(peak, 0)
+        self.assertLessEqual(held, peak)
+        self.assertListEqual(board, solver.load_from_file(EXPERT_2)[0])
+
+    def test_board_snapshot(self):
+        board, cages = solver.load_from_file(EXPERT_2)
+        self.assertTrue(solver.solve(board, cages, solver.ENGINE_DLX))
+        snapshot = solver.board_snapshot(board)
+        self.assertEqual(len(snapshot), 81)
+        self.assertListEqual(solver.board_from_snapshot(snapshot), board)
+        copy = [[0] * 9 for _ in range(9)]
+        solver.restore_board(copy, snapshot)
+        self.assertListEqual(copy, board)
+
+        puzzle = solver.Puzzle.from_board(board, cages)
+        snapshot = puzzle.snapshot()
+        puzzle.board[0] = 0
+        self.assertNotEqual(puzzle.snapshot(), snapshot)
+        puzzle.restore(snapshot)
+        self.assertEqual(puzzle.to_board(), board)
+
+    def test_solve_parallel(self):
+        serial_board, cages = solver.load_from_file(EXPERT_2)
+        self.assertTrue(solver.solve(serial_board, cages, solver.ENGINE_BITMASK))
+        parallel_board, cages = solver.load_from_file(EXPERT_2)
+        self.assertTrue(solver.solve_parallel(parallel_board, cages, jobs=2, split_depth=1))
+        self.assertListEqual(serial_board, parallel_board)
+
+    def test_command_line_ordering(self):
+        # Without an engine, the MRV ordering picks one supporting it rather than the classic one
+        result = subprocess.run([sys.executable, solver.SOLVE_SCRIPT, "--ordering=mrv", EXPERT_1],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("SUCCESS", result.stdout)
+        result = subprocess.run([sys.executable, solver.SOLVE_SCRIPT, "--engine=classic",
+                                 "--ordering=mrv", EXPERT_1], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("the MRV ordering is not supported by the classic engine", result.stderr)
+        self.assertNotIn("Traceback", result.stderr)
+
+    def test_command_line_puzzle_files(self):
+        with open(EXPERT_1) as file:
+            data = json.load(file)
+        data["cages"][0][0] = 100
+        with tempfile.TemporaryDirectory() as directory:
+            invalid = os.path.join(directory, "invalid.json")
+            with open(invalid, "w") as file:
+                json.dump(data, file)
+            packed = os.path.join(directory, "packed.bin")
+            self.assertEqual(solver.run_packer(packed, [EXPERT_1, EXPERT_2]), 0)
+
+            # The packed puzzles are solved one by one, and the puzzle that is not well formed is
+            # reported without a traceback, also when loaded for the worker processes
+            for jobs in ("1", "2"):
+                result = subprocess.run([sys.executable, solver.SOLVE_SCRIPT, "--jobs", jobs,
+                                         invalid, packed], capture_output=True, text=True)
+                self.assertEqual(result.returncode, 1, result.stderr)
+                self.assertIn(f"{invalid}: ", result.stderr)
+                self.assertNotIn("Traceback", result.stderr)
+                self.assertEqual(result.stdout.count("SUCCESS"), 2)
+                self.assertIn(f"{packed} #2", result.stdout)
+
+            self.assertEqual(solver.run_counter([packed], unique=True), 0)
+            self.assertEqual(solver.run_counter([packed, invalid], unique=True), 1)
+
+    def test_benchmark_puzzle(self):
+        self.assertEqual(solver.percentile([3.0, 1.0, 2.0, 4.0], 50), 2.0)
+        self.assertEqual(solver.percentile([3.0, 1.0, 2.0, 4.0], 95), 4.0)
+        self.assertEqual(solver.percentile([5.0], 95), 5.0)
+
+        result = solver.benchmark_puzzle(EXPERT_2, "expert", solver.ENGINE_BITMASK,
+                                         ordering=solver.ORDERING_MRV, warmup=0, repeats=3)
+        self.assertTrue(result.success)
+        self.assertEqual(len(result.times), 3)
+        self.assertLessEqual(result.min, result.median)
+        self.assertLessEqual(result.median, result.p95)
+        self.assertGreater(result.nodes, 0)
+
+        baseline = {"puzzles": [{"filename": EXPERT_2, "median": result.median / 2}]}
+        self.assertEqual(len(solver.compare_to_baseline([result], baseline, 0.1)), 1)
+        self.assertListEqual(solver.compare_to_baseline([result], baseline, 1.5), [])
+        self.assertListEqual(solver.compare_to_baseline([result], {"puzzles": []}, 0), [])
+
+    def test_find_corpus(self):
+        with tempfile.TemporaryDirectory() as corpus:
+            os.mkdir(os.path.join(corpus, "hard"))
+            for name in ("hard/b.json", "hard/a.json", "easy-1.json", "notes.txt"):
+                with open(os.path.join(corpus, name), "w") as file:
+                    file.write("{}")
+            self.assertDictEqual(solver.find_corpus(corpus), {
+                "easy": [os.path.join(corpus, "easy-1.json")],
+                "hard": [os.path.join(corpus, "hard", "a.json"),
+                         os.path.join(corpus, "hard", "b.json")],
+            })
+        with self.assertRaises(ValueError):
+            list(solver.solve_files([EXPERT_2], jobs=2, search_jobs=2))
+
 
 if __name__ == '__main__':
     unittest.main()